@@ -0,0 +1,83 @@
+"""Benchmark: recall@k and latency of the IVF index for several nprobe values.
+
+Usage:
+    python benchmarks/bench_ann_search.py [--size 1000000] [--nprobe 1 4 8 16 32]
+
+Synthetic embeddings are drawn around a few thousand cluster centres, which is
+closer to real screen captures (many near-duplicate frames per app/window)
+than uniform noise.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+_argv, sys.argv = sys.argv, sys.argv[:1]
+from openrelife.ann_index import IVFIndex  # noqa: E402
+from openrelife.vector_index import EmbeddingMatrix, top_k_indices  # noqa: E402
+sys.argv = _argv
+
+DIM = 384
+
+
+def make_matrix(size: int, clusters: int, spread: float) -> EmbeddingMatrix:
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((clusters, DIM), dtype=np.float32)
+    matrix = EmbeddingMatrix(dim=DIM)
+    matrix._reserve(size)
+    chunk = 100_000
+    for start in range(0, size, chunk):
+        n = min(chunk, size - start)
+        block = centers[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, DIM), dtype=np.float32)
+        matrix._vectors[start : start + n] = EmbeddingMatrix._normalize(block)
+        matrix._timestamps[start : start + n] = np.arange(start, start + n)
+    matrix._size = size
+    return matrix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--spread", type=float, default=1.5, help="within-cluster noise; higher is harder")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    matrix = make_matrix(args.size, args.clusters, args.spread)
+    index = IVFIndex()
+    t0 = time.perf_counter()
+    index.build(matrix)
+    print(f"{args.size:,d} rows, build {time.perf_counter() - t0:.1f} s, {index.nlist} lists")
+
+    rng = np.random.default_rng(3)
+    _, queries = matrix.vectors_for(rng.choice(args.size, args.queries, replace=False))
+    # Perturb each query by a vector of norm ~0.5 so it is not an exact row of the matrix
+    queries = queries + 0.5 / np.sqrt(DIM) * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    t0 = time.perf_counter()
+    exact = []
+    for q in queries:
+        ts, sims = matrix.similarities(q)
+        exact.append(set(ts[top_k_indices(sims, args.k)].tolist()))
+    exact_ms = (time.perf_counter() - t0) * 1000 / args.queries
+    print(f"  exact        {exact_ms:8.2f} ms/query  recall@{args.k} 1.000")
+
+    for nprobe in args.nprobe:
+        hits = 0
+        t0 = time.perf_counter()
+        for q, truth in zip(queries, exact):
+            ts, sims = index.search(matrix, q, nprobe)
+            hits += len(truth & set(ts[top_k_indices(sims, args.k)].tolist()))
+        ms = (time.perf_counter() - t0) * 1000 / args.queries
+        print(f"  nprobe={nprobe:<5d} {ms:8.2f} ms/query  recall@{args.k} {hits / (args.k * args.queries):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark: memory traffic of turning a capture into a frame.
+
+Usage:
+    python benchmarks/bench_capture_copies.py [--width 3840] [--height 2160] [--monitors 2] [--ticks 20]
+
+Simulates recorder ticks on mss-like BGRA buffers (mss itself is not
+needed) and compares the previous conversion, np.array(sct_img)[:, :, [2, 1, 0]],
+with the zero-copy RGB view of openrelife.capture. It reports the bytes
+allocated and the CPU time per tick for change detection alone (most ticks
+are discarded as similar) and for the conversion to a PIL image of a frame
+that gets saved.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+_argv, sys.argv = sys.argv, sys.argv[:1]
+from openrelife.capture import rgb_view, to_image  # noqa: E402
+from openrelife.change_detection import get_change_detector  # noqa: E402
+sys.argv = _argv
+
+
+def copy_path(raw: bytearray, width: int, height: int) -> np.ndarray:
+    """The previous behaviour: a BGRA copy, then a fancy-indexed RGB copy."""
+    return np.array(np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4))[:, :, [2, 1, 0]]
+
+
+def measure(label, fn, ticks):
+    fn()  # warm-up
+    tracemalloc.start()
+    t0 = time.process_time()
+    for _ in range(ticks):
+        tracemalloc.reset_peak()
+        fn()
+    cpu = (time.process_time() - t0) / ticks
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>28s}: {cpu * 1000:8.2f} ms CPU/tick, peak {peak / 1e6:8.1f} MB allocated")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--monitors", type=int, default=2)
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    size = args.width * args.height * 4
+    # mss hands out a fresh bytearray per grab; the buffers are prepared up front
+    # so that only the conversion is measured
+    raws = [bytearray(rng.integers(0, 256, size=size, dtype=np.uint8).tobytes()) for _ in range(args.monitors)]
+    w, h = args.width, args.height
+    print(f"{args.monitors} x {w}x{h} monitors, {size * args.monitors / 1e6:.0f} MB of BGRA per tick\n")
+
+    for name, convert in (("copy", copy_path), ("view", rgb_view)):
+        detector = get_change_detector("fast")
+        last = [convert(raw, w, h) for raw in raws]
+
+        def detect_tick():
+            for i, raw in enumerate(raws):
+                detector.is_similar(convert(raw, w, h), last[i])
+
+        def save_tick():
+            for raw in raws:
+                to_image(convert(raw, w, h)) if name == "view" else Image.fromarray(convert(raw, w, h))
+
+        measure(f"{name}: capture + detect", detect_tick, args.ticks)
+        measure(f"{name}: capture + to PIL", save_tick, max(1, args.ticks // 4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark: change detectors on synthetic screen transitions.
+
+Usage:
+    python benchmarks/bench_change_detection.py [--width 3840] [--height 2160] [--repeat 5]
+
+Renders a text-heavy screen and a set of follow-up frames (identical, caret
+blink, a few typed words, a new paragraph, scrolling, a notification, a
+different window) and, for every registered change detector, reports the
+CPU time per comparison and the decision for each transition, alongside
+its agreement with the original full-resolution MSSIM.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+_argv, sys.argv = sys.argv, sys.argv[:1]
+from openrelife.change_detection import CHANGE_DETECTORS, get_change_detector  # noqa: E402
+sys.argv = _argv
+
+WORDS = ["invoice", "meeting", "project", "deadline", "budget", "report", "email", "review", "python"]
+
+
+def render(width: int, height: int, seed: int, offset: int = 0, background=(245, 245, 245)) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 40), fill=(60, 60, 90))
+    for y in range(60 - offset, height, 28):
+        line = " ".join(rng.choice(WORDS, size=int(rng.integers(3, 30))))
+        draw.text((40, y), line, fill=(20, 20, 20))
+    return image
+
+
+def transitions(width: int, height: int):
+    base = render(width, height, 0)
+    frames = {"identical": base.copy()}
+
+    caret = base.copy()
+    ImageDraw.Draw(caret).rectangle((400, 200, 401, 214), fill=(0, 0, 0))
+    frames["caret blink"] = caret
+
+    typed = base.copy()
+    ImageDraw.Draw(typed).text((40, height - 80), "budget review meeting", fill=(20, 20, 20))
+    frames["typed words"] = typed
+
+    paragraph = base.copy()
+    draw = ImageDraw.Draw(paragraph)
+    draw.rectangle((0, height // 2, width, height // 2 + 300), fill=(245, 245, 245))
+    for y in range(height // 2, height // 2 + 300, 28):
+        draw.text((40, y), "new paragraph " * 20, fill=(20, 20, 20))
+    frames["new paragraph"] = paragraph
+
+    frames["scroll"] = render(width, height, 0, offset=28 * 10)
+
+    notification = base.copy()
+    ImageDraw.Draw(notification).rectangle((width - 420, 60, width - 20, 160), fill=(40, 40, 40))
+    frames["notification"] = notification
+
+    frames["other window"] = render(width, height, 1, background=(30, 30, 30))
+    return np.array(base), {name: np.array(frame) for name, frame in frames.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    base, frames = transitions(args.width, args.height)
+    print(f"{args.width}x{args.height}, {len(frames)} transitions\n")
+
+    decisions = {}
+    for name in CHANGE_DETECTORS:
+        timings = []
+        decisions[name] = {}
+        for transition, frame in frames.items():
+            # A fresh detector per run, so the fast detector's thumbnail cache does not hide work
+            for _ in range(args.repeat):
+                detector = get_change_detector(name)
+                t0 = time.process_time()
+                similar = detector.is_similar(base, frame)
+                timings.append(time.process_time() - t0)
+            decisions[name][transition] = (similar, detector.similarity(base, frame))
+        print(f"{name:>6s}: {np.mean(timings) * 1000:8.2f} ms CPU/comparison")
+
+    print(f"\n{'transition':>14s} " + " ".join(f"{name:>16s}" for name in CHANGE_DETECTORS))
+    for transition in frames:
+        cells = []
+        for name in CHANGE_DETECTORS:
+            similar, score = decisions[name][transition]
+            cells.append(f"{'similar' if similar else 'RECORD':>7s} ({score:6.3f})")
+        print(f"{transition:>14s} " + " ".join(f"{cell:>16s}" for cell in cells))
+
+    for name in CHANGE_DETECTORS:
+        if name == "mssim":
+            continue
+        agree = sum(decisions[name][t][0] == decisions["mssim"][t][0] for t in frames)
+        print(f"\n{name}: agrees with mssim on {agree}/{len(frames)} transitions")
+
+
+if __name__ == "__main__":
+    main()
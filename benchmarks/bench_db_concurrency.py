@@ -0,0 +1,110 @@
+"""Benchmark: recorder inserts and UI reads running at the same time.
+
+Usage:
+    python benchmarks/bench_db_concurrency.py [--seconds 10] [--readers 6]
+
+One writer thread inserts frames as the recorder does while reader threads
+mimic the waitress workers (/api/sync polls, /api/entry prefetches). Runs
+twice: with a fresh rollback-journal connection per call (the previous
+behaviour) and with the per-thread WAL connections of openrelife.database.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+_argv, sys.argv = sys.argv, sys.argv[:1]
+import openrelife.database as database  # noqa: E402
+sys.argv = _argv
+
+_pooled_get_connection = database.get_connection
+
+
+def _fresh_connection() -> sqlite3.Connection:
+    """The previous behaviour: a new default-journal connection for every call."""
+    conn = sqlite3.connect(database.db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def run(mode: str, seconds: float, readers: int, seed_rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.db_path = os.path.join(tmp, f"{mode}.db")
+        database.get_connection = _pooled_get_connection
+        database.create_db()
+        if mode == "fresh":
+            database.close_connection()
+            with sqlite3.connect(database.db_path) as conn:
+                conn.execute("PRAGMA journal_mode=DELETE")
+            database.get_connection = _fresh_connection
+
+        coords = [{"text": "w", "x1": 0.1, "y1": 0.1, "x2": 0.2, "y2": 0.2}] * 200
+        embedding = np.zeros(384, dtype=np.float32)
+        for ts in range(1, seed_rows + 1):
+            database.insert_entry("seed text", ts, embedding, "App", "Title", coords)
+
+        stop = threading.Event()
+        next_ts = [seed_rows + 1]
+        writes = []
+        reads = []
+        errors = [0]
+
+        def writer():
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                if database.insert_entry("new text", next_ts[0], embedding, "App", "Title", coords) is None:
+                    errors[0] += 1
+                writes.append(time.perf_counter() - t0)
+                next_ts[0] += 1
+
+        def reader(seed: int):
+            rng = random.Random(seed)
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                if rng.random() < 0.2:
+                    database.get_all_entries(min_timestamp=next_ts[0] - 20, columns=database.METADATA_COLUMNS)
+                else:
+                    database.get_entry_by_timestamp(rng.randint(1, next_ts[0] - 1), columns=database.METADATA_COLUMNS)
+                reads.append(time.perf_counter() - t0)
+
+        threads = [threading.Thread(target=writer)] + [
+            threading.Thread(target=reader, args=(i,)) for i in range(readers)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        database.close_connection()
+
+        read_ms = np.array(reads) * 1000
+        write_ms = np.array(writes) * 1000
+        print(
+            f"{mode:>6s}: writes {len(writes) / seconds:7.0f}/s (p99 {np.percentile(write_ms, 99):6.2f} ms, "
+            f"{errors[0]} failed) | reads {len(reads) / seconds:7.0f}/s "
+            f"(p50 {np.percentile(read_ms, 50):5.2f} ms, p99 {np.percentile(read_ms, 99):6.2f} ms)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=6)
+    parser.add_argument("--seed-rows", type=int, default=2000)
+    args = parser.parse_args()
+    for mode in ("fresh", "pooled"):
+        run(mode, args.seconds, args.readers, args.seed_rows)
+
+
+if __name__ == "__main__":
+    main()
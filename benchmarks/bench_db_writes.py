@@ -0,0 +1,67 @@
+"""Benchmark: recorder write throughput, one transaction per row vs batched.
+
+Usage:
+    python benchmarks/bench_db_writes.py [--rows 4000] [--words 300] [--batch-sizes 1 4 16 64 256]
+
+Inserts frames with a realistic payload (384-dim embedding, a few hundred
+OCR word boxes) into a fresh database: first one insert_entry call (and
+commit) per row, as the recorder used to, then insert_entries with each
+batch size. Reports rows/s. Encoding the word boxes as JSON costs about as
+much as the commit, so --words 0 shows the transaction overhead alone.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+_argv, sys.argv = sys.argv, sys.argv[:1]
+import openrelife.database as database  # noqa: E402
+sys.argv = _argv
+
+
+def make_rows(count: int, start: int, words: int):
+    rng = np.random.default_rng(start)
+    coords = [{"text": "word", "x1": 0.1, "y1": 0.1, "x2": 0.2, "y2": 0.2}] * words
+    return [
+        ("some recognised text " * 40, start + i, rng.standard_normal(384).astype(np.float32), "App", "Title", coords)
+        for i in range(count)
+    ]
+
+
+def run(label: str, rows, batch_size: int = 0) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.db_path = os.path.join(tmp, "bench.db")
+        database.create_db()
+        t0 = time.perf_counter()
+        if batch_size:
+            for start in range(0, len(rows), batch_size):
+                database.insert_entries(rows[start : start + batch_size])
+        else:
+            for row in rows:
+                database.insert_entry(*row)
+        elapsed = time.perf_counter() - t0
+        database.close_connection()
+    print(f"{label:>22s}: {len(rows) / elapsed:9.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, 1, args.words)
+    run("insert_entry per row", rows)
+    for batch_size in args.batch_sizes:
+        run(f"insert_entries x{batch_size}", rows, batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark: load time, encode latency, memory and retrieval agreement of the embedding backends.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py [--backends torch int8 onnx] [--frames 200] [--queries 50]
+
+Each backend runs in its own process so that its peak RSS is measured
+alone, including the libraries it imports (PyTorch is not loaded by the
+onnx backend once its export exists; the first onnx run exports the model
+to the models folder of the local store and is slower to load). The processes
+embed the same synthetic OCR frames, one call per frame like
+nlp.get_embedding without the line cache, then the same search queries. The
+report compares each backend with torch, the reference:
+- cosine similarity between the frame embeddings of both backends;
+- overlap of the top 10 frames returned for each query (1.0 = same results).
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+TOPICS = {
+    "email": "inbox reply forward meeting invitation quarterly report attached regards thanks",
+    "code": "def return import class function error traceback pull request merge branch test",
+    "travel": "flight booking hotel check-in departure gate boarding pass itinerary baggage",
+    "finance": "invoice payment due balance transfer account statement tax receipt amount",
+    "recipes": "preheat oven flour sugar butter eggs whisk bake minutes serve garnish",
+    "music": "playlist album track artist shuffle repeat volume lyrics concert tickets",
+}
+TOP_K = 10
+
+
+def synthetic_frames(frames: int, seed: int = 0):
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    for _ in range(frames):
+        words = TOPICS[rng.choice(topics)].split()
+        yield "\n".join(" ".join(rng.choices(words, k=rng.randint(3, 12))) for _ in range(rng.randint(10, 40)))
+
+
+def synthetic_queries(queries: int, seed: int = 1):
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    return [" ".join(rng.sample(TOPICS[rng.choice(topics)].split(), 3)) for _ in range(queries)]
+
+
+def peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def worker(backend_name: str, frames: int, queries: int, out: str) -> None:
+    # openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+    _argv, sys.argv = sys.argv, sys.argv[:1]
+    from openrelife.config import models_path
+    from openrelife.embedding_backends import create_backend
+    from openrelife.nlp import MODEL_NAME
+    sys.argv = _argv
+
+    t0 = time.perf_counter()
+    backend = create_backend(backend_name, MODEL_NAME, models_path)
+    load = time.perf_counter() - t0
+    backend.encode(["warm-up"])
+
+    texts = list(synthetic_frames(frames))
+    samples, embeddings = [], []
+    for text in texts:
+        t0 = time.perf_counter()
+        embeddings.append(backend.encode(text.split("\n")).mean(axis=0))
+        samples.append(time.perf_counter() - t0)
+    query_embeddings = np.stack([backend.encode([q])[0] for q in synthetic_queries(queries)])
+    samples.sort()
+    np.savez(out, frames=np.stack(embeddings), queries=query_embeddings)
+    with open(out + ".json", "w") as f:
+        json.dump({
+            "load": load,
+            "lines": sum(text.count("\n") + 1 for text in texts) / len(texts),
+            "mean": float(np.mean(samples)),
+            "p95": samples[int(len(samples) * 0.95)],
+            "rss": peak_rss_mb(),
+        }, f)
+
+
+def top_k(frames: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    frames = frames / np.linalg.norm(frames, axis=1, keepdims=True)
+    return np.argsort(-(queries @ frames.T), axis=1)[:, :TOP_K]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.frames, args.queries, args.out)
+        return
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for backend in backends:
+            out = os.path.join(scratch, f"{backend}.npz")
+            process = subprocess.run([
+                sys.executable, __file__, "--worker", backend, "--out", out,
+                "--frames", str(args.frames), "--queries", str(args.queries),
+            ])
+            if process.returncode != 0:
+                print(f"{backend}: failed (exit code {process.returncode})")
+                continue
+            with open(out + ".json") as f:
+                results[backend] = json.load(f)
+            results[backend].update(np.load(out))
+
+    if "torch" not in results:
+        sys.exit("The torch reference backend failed")
+    reference = results["torch"]
+    reference_top = top_k(reference["frames"], reference["queries"])
+    print(f"{args.frames} frames ({reference['lines']:.1f} lines each), {args.queries} queries")
+    for backend, result in results.items():
+        frames = result["frames"]
+        cosine = np.sum(frames * reference["frames"], axis=1) / (
+            np.linalg.norm(frames, axis=1) * np.linalg.norm(reference["frames"], axis=1)
+        )
+        overlap = np.mean([
+            len(set(a) & set(b)) / TOP_K for a, b in zip(top_k(frames, result["queries"]), reference_top)
+        ])
+        print(
+            f"{backend:>6s}: load {result['load']:5.1f} s, encode {result['mean'] * 1000:6.1f} ms/frame "
+            f"(p95 {result['p95'] * 1000:6.1f}), peak RSS {result['rss']:6.0f} MB, "
+            f"cosine vs torch {cosine.mean():.4f} (min {cosine.min():.4f}), top-{TOP_K} overlap {overlap:.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
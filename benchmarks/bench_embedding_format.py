@@ -0,0 +1,109 @@
+"""Benchmark: memory, disk, search latency and recall of the embedding formats.
+
+Usage:
+    python benchmarks/bench_embedding_format.py [--rows 200000] [--queries 50]
+    python benchmarks/bench_embedding_format.py --db path/to/recall.db
+
+Fills a scratch store with --rows synthetic embeddings (clustered, with a
+shared component like sentence embeddings) or with the embeddings of an
+existing database. For each --embedding-format, the stored blobs are converted
+with migrate_embeddings, the search matrix is loaded, and hybrid_search is run
+as an exact scan with recency disabled. The report gives the resident matrix
+size, the database bytes per embedding, the search latency, and the recall of
+the top 10 against float32 (binary codes include the re-ranking of their best
+candidates from the database).
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import: point it at a scratch store instead
+_storage = tempfile.mkdtemp(prefix="openrelife-bench-")
+_argv, sys.argv = sys.argv, [sys.argv[0], "--storage-path", _storage]
+from openrelife import ann_index, database, search, vector_index  # noqa: E402
+from openrelife.embedding_format import EMBEDDING_FORMATS, decode_blob, encode_blob  # noqa: E402
+sys.argv = _argv
+
+DIM = 384
+TOP_K = 10
+
+
+def synthetic_embeddings(rows: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    common = rng.standard_normal(DIM).astype(np.float32)
+    centers = rng.standard_normal((rows // 200 + 1, DIM)).astype(np.float32)
+    vectors = np.empty((rows, DIM), dtype=np.float32)
+    for start in range(0, rows, 50000):
+        n = min(50000, rows - start)
+        block = centers[rng.integers(0, centers.shape[0], n)] + 0.6 * common
+        vectors[start:start + n] = block + 0.7 * rng.standard_normal((n, DIM), dtype=np.float32)
+    return vectors
+
+
+def recorded_embeddings(path: str) -> np.ndarray:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        vectors = [decode_blob(blob) for (blob,) in conn.execute("SELECT embedding FROM entries") if blob]
+    finally:
+        conn.close()
+    return np.vstack([v for v in vectors if v.shape[0] == DIM and v.any()])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--db", help="use the embeddings of this database instead of synthetic ones")
+    args = parser.parse_args()
+
+    vectors = recorded_embeddings(args.db) if args.db else synthetic_embeddings(args.rows)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, vectors.shape[0], args.queries)]
+    queries = queries + 0.5 * queries.std() * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    database.create_db()
+    conn = database.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO entries (text, timestamp, embedding, app, title, words_coords) VALUES ('', ?, ?, '', '', '[]')",
+            ((ts, encode_blob(vector, "float32")) for ts, vector in enumerate(vectors)),
+        )
+    # Exact scans only, and similarity alone decides the ranking
+    ann_index.MIN_TRAIN_ROWS = sys.maxsize
+    search.RECENCY_DIVISOR = float("inf")
+
+    print(f"{vectors.shape[0]} embeddings of {DIM} dimensions, {args.queries} queries, top {TOP_K}")
+    reference = None
+    for fmt in EMBEDDING_FORMATS:
+        t0 = time.perf_counter()
+        converted = database.migrate_embeddings(fmt, pause=0)
+        migration = time.perf_counter() - t0
+        disk = conn.execute("SELECT AVG(LENGTH(embedding)) FROM entries").fetchone()[0]
+
+        matrix = vector_index.EmbeddingMatrix(fmt=fmt)
+        matrix.load(database.iter_embeddings())
+        vector_index._matrix_cache = matrix
+        samples, results = [], []
+        for query in queries:
+            t0 = time.perf_counter()
+            results.append(search.hybrid_search("", query, TOP_K, nprobe=0))
+            samples.append(time.perf_counter() - t0)
+        if reference is None:
+            reference = results
+        recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(results, reference)])
+        print(
+            f"{fmt:>8s}: matrix {matrix.nbytes / 2**20:7.1f} MiB, {disk:6.0f} B/row on disk, "
+            f"search {np.mean(samples) * 1000:6.1f} ms, recall@{TOP_K} {recall:6.1%}"
+            + (f", migrated {converted} rows in {migration:.1f} s" if converted else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark: per-row cost of loading entries with and without projection.
+
+Usage:
+    python benchmarks/bench_entry_decode.py [--rows 20000] [--words 300]
+
+Fills a temporary database with rows shaped like real captures (a 384-dim
+embedding and a few hundred OCR words with coordinates) and times
+get_all_entries() for the column sets the endpoints use.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+_argv, sys.argv = sys.argv, sys.argv[:1]
+import openrelife.database as database  # noqa: E402
+sys.argv = _argv
+
+
+def fill(rows: int, words: int) -> None:
+    rng = random.Random(0)
+    for i in range(rows):
+        coords = [
+            {"text": f"word{j}", "x1": rng.random(), "y1": rng.random(), "x2": rng.random(), "y2": rng.random()}
+            for j in range(words)
+        ]
+        text = " ".join(c["text"] for c in coords)
+        embedding = np.random.default_rng(i).standard_normal(384).astype(np.float32)
+        database.insert_entry(text, i + 1, embedding, "App", "Title", coords)
+
+
+def timed(label: str, rows: int, fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    us = (time.perf_counter() - t0) * 1e6 / rows
+    print(f"  {label:<46s} {us:8.1f} us/row")
+    return us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--words", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.db_path = os.path.join(tmp, "bench.db")
+        database.create_db()
+        fill(args.rows, args.words)
+        print(f"{args.rows:,d} rows, {args.words} OCR words per row")
+
+        def eager():
+            # What every caller paid before: all columns, everything decoded
+            for e in database.get_all_entries():
+                e.embedding, e.words_coords, e.ai_words_coords
+
+        full = timed("all columns, eager decode (old behaviour)", args.rows, eager)
+        lazy = timed("all columns, nothing accessed", args.rows, database.get_all_entries)
+        timed(
+            "METADATA_COLUMNS (/classic, /api/sync)",
+            args.rows,
+            lambda: [e.words_coords for e in database.get_all_entries(columns=database.METADATA_COLUMNS)],
+        )
+        text = timed(
+            "(timestamp, text) (search results)",
+            args.rows,
+            lambda: database.get_all_entries(columns=("timestamp", "text")),
+        )
+        print(f"  decode cost removed: {full - lazy:.1f} us/row (lazy), {full - text:.1f} us/row (search projection)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark: hit rate of the OCR line embedding cache on a capture stream.
+
+Usage:
+    python benchmarks/bench_line_cache.py [--db path/to/recall.db] [--limit 20000] [--max-lines 50000]
+    python benchmarks/bench_line_cache.py --synthetic 2000
+
+Replays the OCR text of recorded entries, oldest first, through a fresh
+LineEmbeddingCache the way nlp.get_embedding uses it, with placeholder
+vectors (the hit rate does not depend on the model, so it is not needed). By
+default the stream is read from the database of the local OpenReLife
+store. --synthetic generates a stream of editor/browser-like frames instead.
+The report gives the share of line lookups served from the cache and the
+number of lines the model still has to encode, against encoding every line
+of every frame as before.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+_argv, sys.argv = sys.argv, sys.argv[:1]
+from openrelife.config import db_path  # noqa: E402
+from openrelife.embedding_cache import LINE_CACHE_MAX_LINES, LineEmbeddingCache  # noqa: E402
+sys.argv = _argv
+
+WORDS = "file edit view the quick brown fox jumps over lazy dog inbox meeting notes invoice".split()
+
+
+def recorded_stream(path: str, limit: int):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for (text,) in conn.execute(
+            "SELECT text FROM entries WHERE text != '' ORDER BY timestamp ASC LIMIT ?", (limit,)
+        ):
+            yield text
+    finally:
+        conn.close()
+
+
+def synthetic_stream(frames: int, seed: int = 0):
+    """Two apps with fixed chrome; the document is edited, scrolled and switched."""
+    rng = random.Random(seed)
+
+    def line():
+        return " ".join(rng.choices(WORDS, k=rng.randint(2, 10)))
+
+    chrome = {app: [line() for _ in range(12)] for app in ("editor", "browser")}
+    documents = {app: [line() for _ in range(300)] for app in chrome}
+    tops = {app: 0 for app in chrome}
+    app = "editor"
+    for _ in range(frames):
+        event = rng.random()
+        if event < 0.1:
+            app = "browser" if app == "editor" else "editor"
+        elif event < 0.15:
+            documents[app] = [line() for _ in range(300)]
+            tops[app] = 0
+        elif event < 0.4:
+            tops[app] = (tops[app] + rng.randint(1, 10)) % 250
+        else:
+            row = tops[app] + rng.randint(0, 39)
+            documents[app][row] += " " + rng.choice(WORDS)
+        yield "\n".join(chrome[app] + documents[app][tops[app]:tops[app] + 40])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=db_path)
+    parser.add_argument("--limit", type=int, default=20000, help="entries replayed from --db")
+    parser.add_argument("--synthetic", type=int, default=0, help="replay this many synthetic frames instead")
+    parser.add_argument("--max-lines", type=int, default=LINE_CACHE_MAX_LINES)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        stream, source = synthetic_stream(args.synthetic), f"{args.synthetic} synthetic frames"
+    elif os.path.exists(args.db):
+        stream, source = recorded_stream(args.db, args.limit), args.db
+    else:
+        sys.exit(f"No database at {args.db}; pass --db or --synthetic")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        cache = LineEmbeddingCache(os.path.join(scratch, "lines.db"), "benchmark", max_lines=args.max_lines)
+        frames = lines_total = encoded = 0
+        t0 = time.perf_counter()
+        for text in stream:
+            sentences = [line for line in text.split("\n") if line.strip()]
+            if not sentences:
+                continue
+            known = cache.get_many(sentences)
+            missing = list(dict.fromkeys(line for line in sentences if line not in known))
+            cache.put_many({line: np.zeros(384, dtype=np.float32) for line in missing})
+            frames += 1
+            lines_total += len(sentences)
+            encoded += len(missing)
+        elapsed = time.perf_counter() - t0
+        stats = cache.stats()
+        stored = len(cache)
+        cache.close()
+
+    if not frames:
+        sys.exit(f"No OCR text in {source}")
+    print(f"Source: {source}")
+    print(f"{frames} frames, {lines_total} lines ({lines_total / frames:.1f} per frame)")
+    print(f"Unique-line lookups: {stats['hits'] + stats['misses']}, hit rate {stats['hit_rate']:.1%}")
+    print(
+        f"Lines encoded by the model: {encoded} instead of {lines_total} "
+        f"({encoded / lines_total:.1%}); {stored} lines cached"
+    )
+    print(f"Cache overhead: {elapsed / frames * 1000:.2f} ms per frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark: doctr OCR throughput per frame against batch size (CPU).
+
+Usage:
+    python benchmarks/bench_ocr_batch.py [--frames 16] [--batch-sizes 1 2 4 8]
+                                         [--width 1920] [--height 1080]
+
+Renders synthetic screen-like frames (lines of text on a light background)
+and times openrelife.ocr.extract_text_from_images with different batch sizes.
+Requires python-doctr and its pretrained weights.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def render_frame(width: int, height: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    words = ["invoice", "meeting", "project", "deadline", "budget", "report", "email", "review", "python"]
+    for y in range(20, height - 20, 28):
+        line = " ".join(rng.choice(words, size=int(rng.integers(3, 12))))
+        draw.text((int(rng.integers(10, 200)), y), line, fill=(20, 20, 20))
+    return np.array(image)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    # openrelife.config parses sys.argv on import, so hide the benchmark's own flags from it
+    sys.argv = sys.argv[:1]
+    from openrelife.ocr import extract_text_from_images
+
+    frames = [render_frame(args.width, args.height, i) for i in range(args.frames)]
+    extract_text_from_images(frames[:1])  # warm-up
+
+    baseline = None
+    for batch_size in args.batch_sizes:
+        t0 = time.perf_counter()
+        for start in range(0, len(frames), batch_size):
+            extract_text_from_images(frames[start : start + batch_size])
+        per_frame = (time.perf_counter() - t0) / len(frames)
+        baseline = baseline or per_frame
+        print(
+            f"batch {batch_size:>2d}: {per_frame * 1000:8.1f} ms/frame, "
+            f"{1 / per_frame:6.2f} frames/s ({baseline / per_frame:4.2f}x vs batch {args.batch_sizes[0]})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Benchmark: disk usage and random access of one file per frame vs packed segments.
+
+Usage:
+    python benchmarks/bench_segment_storage.py [--width 2560] [--height 1440] [--frames 120] [--reads 200]
+
+Records a synthetic session of text-heavy screens: typing, scrolling and
+occasional window switches. The frames are rendered with PIL, downscaled and
+encoded like the default 'low' quality preset (80% size, WebP quality 80), then
+stored twice in a temporary directory:
+- as one sharded WebP file per frame plus its two rendition files, as the
+  recorder writes them (--storage-engine files);
+- packed into a segment of keyframes and deltas (--storage-engine segments),
+  whose renditions are built on demand and never written.
+The benchmark reports the bytes written and the disk space allocated, the
+write time per frame, and the latency of reading frames back:
+- random reads, which decode a keyframe for most delta frames;
+- sequential reads, like scrubbing the timeline, which reuse the cached keyframe.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# openrelife.config parses sys.argv on import: point it at a scratch store instead
+_storage = tempfile.mkdtemp(prefix="openrelife-bench-")
+_argv, sys.argv = sys.argv, [sys.argv[0], "--storage-path", _storage]
+from openrelife import database, segments, storage, thumbnails  # noqa: E402
+from openrelife.image_cache import read_file  # noqa: E402
+sys.argv = _argv
+
+SAVE_KWARGS = {"lossless": False, "quality": 80}
+WORDS = "the quick brown fox jumps over lazy dog lorem ipsum dolor sit amet screen recall".split()
+
+
+def session(width: int, height: int, frames: int, seed: int = 0):
+    """Yields screenshots of a text editor that is typed in, scrolled and sometimes switched."""
+    rng = random.Random(seed)
+    line_height = 18
+    font = ImageFont.load_default(size=15)
+    lines = [" ".join(rng.choices(WORDS, k=rng.randint(4, 30))) for _ in range(400)]
+    top, cursor = 0, 30
+    for index in range(frames):
+        event = rng.random()
+        if event < 0.08:
+            # Window switch: a different document
+            lines = [" ".join(rng.choices(WORDS, k=rng.randint(4, 30))) for _ in range(400)]
+            top, cursor = 0, 30
+        elif event < 0.3:
+            top += rng.randint(3, 20)
+        else:
+            lines[top + cursor] += " " + rng.choice(WORDS)
+        image = Image.new("RGB", (width, height), (250, 250, 250))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, width, 40), fill=(40, 44, 52))
+        draw.text((20, 12), f"editor - document {index // 20}", fill=(220, 220, 220), font=font)
+        for row in range((height - 60) // line_height):
+            text = lines[(top + row) % len(lines)]
+            draw.text((60, 50 + row * line_height), text, fill=(30, 30, 30), font=font)
+        yield image.resize((int(width * 0.8), int(height * 0.8)), Image.LANCZOS)
+
+
+def disk_usage(paths):
+    written = allocated = 0
+    for path in paths:
+        stat = os.stat(path)
+        written += stat.st_size
+        allocated += getattr(stat, "st_blocks", 0) * 512 or stat.st_size
+    return written, allocated
+
+
+def walk(root):
+    for folder, _, names in os.walk(root):
+        for name in names:
+            yield os.path.join(folder, name)
+
+
+def read_latency(read, timestamps):
+    samples = []
+    for timestamp in timestamps:
+        t0 = time.perf_counter()
+        read(timestamp)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return np.mean(samples) * 1000, samples[int(len(samples) * 0.95)] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    database.create_db()
+    frames = list(session(args.width, args.height, args.frames))
+    timestamps = [1700000000000000 + i * 2000000 for i in range(len(frames))]
+
+    storage.args.storage_engine = "files"
+    t0 = time.perf_counter()
+    for timestamp, image in zip(timestamps, frames):
+        storage.save_screenshot(image, SAVE_KWARGS, timestamp, 1)
+        thumbnails.save_renditions(image, timestamp)
+    files_write = (time.perf_counter() - t0) / len(frames)
+
+    writer = segments.get_writer()
+    t0 = time.perf_counter()
+    for timestamp, image in zip(timestamps, frames):
+        writer.append(1, timestamp, image, SAVE_KWARGS)
+    segments_write = (time.perf_counter() - t0) / len(frames)
+    writer.close()
+    keyframes = sum(database.get_frame_segment(t)["base_offset"] is None for t in timestamps)
+
+    files = list(walk(storage.screenshots_path)) + list(walk(thumbnails.thumbnails_path))
+    packed = list(walk(segments.segments_path))
+    print(f"{len(frames)} frames of {frames[0].width}x{frames[0].height}, {keyframes} stored as keyframes")
+    for label, paths, write in (("files", files, files_write), ("segments", packed, segments_write)):
+        written, allocated = disk_usage(paths)
+        print(
+            f"{label:>9s}: {len(paths):5d} files, {written / 1e6:7.2f} MB written, "
+            f"{allocated / 1e6:7.2f} MB allocated, {write * 1000:6.1f} ms/frame to store"
+        )
+
+    rng = random.Random(1)
+    random_reads = [rng.choice(timestamps) for _ in range(args.reads)]
+    sequential_reads = timestamps[: args.reads]
+    files_read = lambda t: read_file(storage.find_screenshot(t))  # noqa: E731
+    for label, read in (("files", files_read), ("segments", segments.read_frame)):
+        for order, sample in (("random", random_reads), ("sequential", sequential_reads)):
+            segments._keyframes.clear()
+            mean, p95 = read_latency(read, sample)
+            print(f"{label:>9s} {order:>10s} reads: {mean:6.2f} ms mean, {p95:6.2f} ms p95")
+
+
+if __name__ == "__main__":
+    main()
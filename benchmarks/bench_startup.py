@@ -0,0 +1,109 @@
+"""Benchmark: how long the backend takes to serve the UI, and to have its models loaded.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 3] [--timeout 300]
+
+Starts `python -m openrelife.app` on a scratch store and a free port, as
+Electron does, then polls it every 50 ms. It reports:
+- the time until GET / answers, which is what Electron's loadApp() waits for
+  before showing the window;
+- the time until /api/ready reports every component ready (versions without
+  the endpoint answer 404, and only the first time is reported).
+The first run also pays for cold file system caches, so it is reported apart.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url: str):
+    """Returns (status, JSON body or None), or None if nothing answers yet."""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        body, status = e.read(), e.code
+    except OSError:
+        return None
+    try:
+        return status, json.loads(body)
+    except ValueError:
+        return status, None
+
+
+def run(timeout: float):
+    storage = tempfile.mkdtemp(prefix="openrelife-bench-")
+    port = free_port()
+    with open(os.path.join(storage, "settings.json"), "w") as f:
+        json.dump({"server_port": port}, f)
+    base = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "openrelife.app", "--storage-path", storage],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    serving = ready = exit_code = None
+    components = {}
+    try:
+        while time.monotonic() - started < timeout and process.poll() is None:
+            if serving is None:
+                answer = get(base + "/")
+                if answer is not None and answer[0] == 200:
+                    serving = time.monotonic() - started
+            if serving is not None:
+                answer = get(base + "/api/ready")
+                if answer is None or answer[0] == 404:
+                    break
+                components = (answer[1] or {}).get("components", {})
+                if answer[0] == 200:
+                    ready = time.monotonic() - started
+                    break
+            time.sleep(0.05)
+    finally:
+        exit_code = process.poll()
+        process.terminate()
+        process.wait(timeout=30)
+    return serving, ready, components, exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    for index in range(args.runs):
+        serving, ready, components, exit_code = run(args.timeout)
+        label = "cold" if index == 0 else "warm"
+        if serving is None:
+            failure = "timed out" if exit_code is None else f"backend exited with code {exit_code}"
+            print(f"run {index + 1} ({label}): UI not served ({failure})")
+            continue
+        line = f"run {index + 1} ({label}): UI served after {serving:.2f} s"
+        if ready is not None:
+            line += f", ready after {ready:.2f} s"
+        print(line)
+        for name, status in components.items():
+            print(f"    {name}: {status.get('state')} at {status.get('seconds')} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: per-row cosine loop vs. the resident embedding matrix.
+
+Usage:
+    python benchmarks/bench_vector_search.py [--sizes 100000 1000000 5000000]
+
+The per-row loop mirrors what /api/search did before the embedding matrix
+(one `nlp.cosine_similarity` call per entry). It is timed on a sample of rows
+and extrapolated, since running it on millions of rows takes minutes.
+Note that 5M x 384 float32 rows need ~7.7 GB of RAM.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openrelife.vector_index import EmbeddingMatrix, top_k_indices  # noqa: E402
+
+DIM = 384
+LOOP_SAMPLE = 20_000
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Same arithmetic as openrelife.nlp.cosine_similarity."""
+    norm_a = np.linalg.norm(a)
+    norm_b = np.linalg.norm(b)
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return float(np.clip(np.dot(a, b) / (norm_a * norm_b), -1.0, 1.0))
+
+
+def bench(size: int, queries: int, k: int) -> None:
+    rng = np.random.default_rng(42)
+    matrix = EmbeddingMatrix(dim=DIM)
+    # Fill in chunks to keep peak memory close to the matrix itself
+    chunk = 100_000
+    matrix._reserve(size)
+    for start in range(0, size, chunk):
+        n = min(chunk, size - start)
+        block = rng.standard_normal((n, DIM), dtype=np.float32)
+        matrix._vectors[start : start + n] = EmbeddingMatrix._normalize(block)
+        matrix._timestamps[start : start + n] = np.arange(start, start + n)
+    matrix._size = size
+
+    query_vectors = rng.standard_normal((queries, DIM), dtype=np.float32)
+
+    sample = matrix._vectors[: min(size, LOOP_SAMPLE)]
+    t0 = time.perf_counter()
+    [cosine_similarity(query_vectors[0], row) for row in sample]
+    loop_s = (time.perf_counter() - t0) * size / sample.shape[0]
+
+    t0 = time.perf_counter()
+    for q in query_vectors:
+        _, sims = matrix.similarities(q)
+        top_k_indices(sims, k)
+    matrix_s = (time.perf_counter() - t0) / queries
+
+    print(
+        f"{size:>10,d} rows | per-row loop ~{loop_s * 1000:10.1f} ms (extrapolated) "
+        f"| matrix + argpartition {matrix_s * 1000:8.1f} ms | {loop_s / matrix_s:6.0f}x "
+        f"| matrix {size * DIM * 4 / 2**20:8.0f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
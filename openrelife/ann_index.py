@@ -0,0 +1,346 @@
+import logging
+import os
+import threading
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from openrelife.config import ann_index_path
+from openrelife.vector_index import EmbeddingMatrix, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Below this many rows an exact scan is fast enough and the index stays untrained
+MIN_TRAIN_ROWS: int = 20_000
+# Retrain the coarse quantizer once the history has grown by this factor
+RETRAIN_GROWTH: float = 4.0
+# Training sample size per inverted list, and k-means iterations
+SAMPLES_PER_LIST: int = 64
+KMEANS_ITERATIONS: int = 10
+# Default number of inverted lists probed per query (0 = exact search)
+DEFAULT_NPROBE: int = 8
+# Persist assignments after this many incremental changes
+SAVE_EVERY: int = 500
+# Rows assigned per matrix product while (re)building
+_ASSIGN_CHUNK: int = 65_536
+# Spare room, in rows, of the assignment arrays that new entries are appended to
+_MIN_GROWTH: int = 1024
+
+
+def _num_lists(rows: int) -> int:
+    """Returns the number of inverted lists for a history of `rows` entries (~sqrt(N))."""
+    return int(np.clip(np.sqrt(rows), 16, 4096))
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Trains a spherical k-means coarse quantizer.
+
+    Args:
+        vectors: L2-normalized training vectors (rows).
+        nlist: Number of centroids.
+        seed: Random seed for initialization and re-seeding of empty clusters.
+
+    Returns:
+        np.ndarray: (nlist, dim) float32 matrix of unit-length centroids.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, vectors.shape[0])
+    centroids = vectors[rng.choice(vectors.shape[0], nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(vectors.shape[0], int(empty.sum()), replace=False)]
+        centroids = EmbeddingMatrix._normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over the embedding matrix.
+
+    A spherical k-means quantizer splits the embedding space into `nlist`
+    cells and every entry is labelled with its nearest centroid. A query only
+    scores the entries of the `nprobe` cells closest to it, read straight from
+    the resident EmbeddingMatrix, so vectors are never held twice.
+
+    Only centroids and (timestamp, label) assignments are persisted.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.RLock()
+        # Serializes writes of the index file, outside `_lock` so queries are not held up
+        self._save_lock = threading.Lock()
+        self._path = path
+        self._centroids: Optional[np.ndarray] = None
+        self._timestamps: np.ndarray = np.empty(0, dtype=np.int64)
+        self._labels: np.ndarray = np.empty(0, dtype=np.int32)
+        # Over-allocated arrays that `_timestamps` and `_labels` are views of, while only appended to
+        self._timestamp_buffer: Optional[np.ndarray] = None
+        self._label_buffer: Optional[np.ndarray] = None
+        self._trained_rows: int = 0
+        self._dirty: int = 0
+        self._training: bool = False
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self._centroids is None else self._centroids.shape[0]
+
+    def __len__(self) -> int:
+        return self._timestamps.shape[0]
+
+    @staticmethod
+    def _assign(
+        centroids: np.ndarray, matrix: EmbeddingMatrix, timestamps: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Labels the given rows of `matrix` with their nearest centroid.
+
+        Returns:
+            A (timestamps, labels) pair for the rows that were found in `matrix`.
+        """
+        found = []
+        labels = []
+        for start in range(0, timestamps.shape[0], _ASSIGN_CHUNK):
+            chunk_ts, block = matrix.vectors_for(timestamps[start : start + _ASSIGN_CHUNK])
+            found.append(chunk_ts)
+            labels.append(np.argmax(block @ centroids.T, axis=1).astype(np.int32))
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        return np.concatenate(found), np.concatenate(labels)
+
+    def build(self, matrix: EmbeddingMatrix) -> None:
+        """Trains the quantizer on a sample of `matrix` and assigns every row."""
+        timestamps = matrix.timestamps()
+        if timestamps.shape[0] < MIN_TRAIN_ROWS:
+            return
+        nlist = _num_lists(timestamps.shape[0])
+        rng = np.random.default_rng(0)
+        sample_size = min(timestamps.shape[0], nlist * SAMPLES_PER_LIST)
+        _, sample = matrix.vectors_for(np.sort(rng.choice(timestamps, sample_size, replace=False)))
+        centroids = train_centroids(sample, nlist)
+        # Assign outside the lock so queries keep using the previous quantizer meanwhile
+        assigned_ts, labels = self._assign(centroids, matrix, timestamps)
+        with self._lock:
+            self._centroids = centroids
+            self._timestamps, self._labels = assigned_ts, labels
+            self._trained_rows = timestamps.shape[0]
+            self._dirty = 0
+        logger.info(f"Trained ANN index: {timestamps.shape[0]} rows in {nlist} lists.")
+        # Pick up rows inserted or deleted while the quantizer was training
+        self.sync(matrix)
+        self.save()
+
+    def sync(self, matrix: EmbeddingMatrix) -> None:
+        """Reconciles persisted assignments with the rows currently in `matrix`.
+
+        Rows inserted after the last save are assigned; rows deleted since are dropped.
+        """
+        if not self.is_trained:
+            return
+        timestamps = matrix.timestamps()
+        with self._lock:
+            known = np.isin(timestamps, self._timestamps)
+            stale = ~np.isin(self._timestamps, timestamps)
+            if known.all() and not stale.any():
+                return
+            new_ts, new_labels = self._assign(self._centroids, matrix, timestamps[~known])
+            merged_ts = np.concatenate([self._timestamps[~stale], new_ts])
+            merged_labels = np.concatenate([self._labels[~stale], new_labels])
+            order = np.argsort(merged_ts, kind="stable")
+            self._timestamps = merged_ts[order]
+            self._labels = merged_labels[order]
+            self._dirty += int(new_ts.shape[0] + stale.sum())
+        self.save()
+
+    def add(self, timestamp: int, embedding: np.ndarray) -> None:
+        """Assigns a newly inserted embedding to its inverted list."""
+        with self._lock:
+            if not self.is_trained:
+                return
+            vector = EmbeddingMatrix._normalize(np.asarray(embedding, dtype=np.float32).ravel())
+            if vector.shape[0] != self._centroids.shape[1]:
+                return
+            label = int(np.argmax(self._centroids @ vector))
+            size = self._timestamps.shape[0]
+            if not size or timestamp > self._timestamps[-1]:
+                # The usual case: the entry is the newest one
+                self._append(timestamp, label)
+            else:
+                pos = int(np.searchsorted(self._timestamps, timestamp))
+                if pos < size and self._timestamps[pos] == timestamp:
+                    self._labels[pos] = label
+                else:
+                    self._timestamps = np.insert(self._timestamps, pos, timestamp)
+                    self._labels = np.insert(self._labels, pos, label)
+            self._dirty += 1
+            dirty = self._dirty
+        if dirty >= SAVE_EVERY:
+            self.save()
+
+    def _append(self, timestamp: int, label: int) -> None:
+        """Appends an assignment in amortized constant time. Call with `_lock` held."""
+        size = self._timestamps.shape[0]
+        buffer = self._timestamp_buffer
+        # The arrays are replaced wholesale by build, sync, remove and load; start a new buffer then
+        if buffer is None or self._timestamps.base is not buffer or size == buffer.shape[0]:
+            capacity = size + max(size, _MIN_GROWTH)
+            self._timestamp_buffer = np.empty(capacity, dtype=np.int64)
+            self._label_buffer = np.empty(capacity, dtype=np.int32)
+            self._timestamp_buffer[:size] = self._timestamps
+            self._label_buffer[:size] = self._labels
+        self._timestamp_buffer[size] = timestamp
+        self._label_buffer[size] = label
+        self._timestamps = self._timestamp_buffer[:size + 1]
+        self._labels = self._label_buffer[:size + 1]
+
+    def remove(self, timestamps: Iterable[int]) -> None:
+        """Drops deleted entries from their inverted lists."""
+        targets = np.asarray(list(timestamps), dtype=np.int64)
+        with self._lock:
+            if not self.is_trained or not targets.size:
+                return
+            keep = ~np.isin(self._timestamps, targets)
+            removed = int((~keep).sum())
+            if not removed:
+                return
+            self._timestamps = self._timestamps[keep]
+            self._labels = self._labels[keep]
+            self._dirty += removed
+            dirty = self._dirty
+        if dirty >= SAVE_EVERY:
+            self.save()
+
+    def needs_training(self, rows: int) -> bool:
+        """Whether the quantizer should be (re)trained for a history of `rows` entries."""
+        if self._training or rows < MIN_TRAIN_ROWS:
+            return False
+        return not self.is_trained or rows > self._trained_rows * RETRAIN_GROWTH
+
+    def build_in_background(self, matrix: EmbeddingMatrix) -> None:
+        """Runs `build` on a daemon thread; queries fall back to exact search meanwhile."""
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+
+        def run():
+            try:
+                self.build(matrix)
+            finally:
+                self._training = False
+
+        threading.Thread(target=run, daemon=True, name="ann-index-build").start()
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Returns the timestamps stored in the `nprobe` lists closest to `query`."""
+        query = EmbeddingMatrix._normalize(np.asarray(query, dtype=np.float32).ravel())
+        with self._lock:
+            if not self.is_trained or query.shape[0] != self._centroids.shape[1]:
+                return self._timestamps.copy()
+            probes = top_k_indices(self._centroids @ query, nprobe)
+            probed = np.zeros(self.nlist, dtype=bool)
+            probed[probes] = True
+            return self._timestamps[probed[self._labels]]
+
+    def search(
+        self, matrix: EmbeddingMatrix, query: np.ndarray, nprobe: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores the entries of the probed lists against `query`.
+
+        Returns:
+            A (timestamps, similarities) pair for the candidate entries, sorted by timestamp.
+        """
+        return matrix.similarities_for(query, self.candidates(query, nprobe))
+
+    def save(self) -> None:
+        """Atomically persists centroids and assignments to `path`.
+
+        Concurrent saves are serialized, and each writes the state as of when
+        it got its turn, so the last file written is the most recent state.
+        """
+        if not self._path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self.is_trained:
+                    return
+                # Copies: appends and label updates write into the arrays in place
+                centroids, timestamps, labels = self._centroids, self._timestamps.copy(), self._labels.copy()
+                trained_rows = self._trained_rows
+                self._dirty = 0
+            tmp_path = f"{self._path}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    np.savez(
+                        f,
+                        centroids=centroids,
+                        timestamps=timestamps,
+                        labels=labels,
+                        trained_rows=np.int64(trained_rows),
+                    )
+                os.replace(tmp_path, self._path)
+            except OSError as e:
+                logger.error(f"Failed to save ANN index to {self._path}: {e}")
+
+    def load(self) -> bool:
+        """Loads persisted centroids and assignments from `path`.
+
+        Returns:
+            True if a valid index was loaded.
+        """
+        if not self._path or not os.path.exists(self._path):
+            return False
+        try:
+            with np.load(self._path) as data:
+                centroids = data["centroids"].astype(np.float32)
+                timestamps = data["timestamps"].astype(np.int64)
+                labels = data["labels"].astype(np.int32)
+                trained_rows = int(data["trained_rows"])
+        except (OSError, KeyError, ValueError) as e:
+            logger.error(f"Ignoring unreadable ANN index {self._path}: {e}")
+            return False
+        order = np.argsort(timestamps, kind="stable")
+        with self._lock:
+            self._centroids = centroids
+            self._timestamps = timestamps[order]
+            self._labels = labels[order]
+            self._trained_rows = trained_rows
+        return True
+
+
+# Global index cache, loaded and reconciled on first use
+_index_cache: Optional[IVFIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_ann_index(matrix: EmbeddingMatrix) -> IVFIndex:
+    """Lazy load the ANN index, reconciling it with `matrix` and training it if needed."""
+    global _index_cache
+    if _index_cache is None:
+        with _index_lock:
+            if _index_cache is None:
+                index = IVFIndex(ann_index_path)
+                if index.load():
+                    index.sync(matrix)
+                _index_cache = index
+    if _index_cache.needs_training(len(matrix)):
+        _index_cache.build_in_background(matrix)
+    return _index_cache
+
+
+def on_entry_inserted(timestamp: int, embedding: np.ndarray) -> None:
+    """Keeps the ANN index in sync with a newly inserted entry."""
+    if _index_cache is not None:
+        _index_cache.add(timestamp, embedding)
+
+
+def on_entries_deleted(timestamps: Iterable[int]) -> None:
+    """Keeps the ANN index in sync with deleted entries."""
+    if _index_cache is not None:
+        _index_cache.remove(timestamps)
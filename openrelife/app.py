@@ -1,17 +1,35 @@
 from threading import Thread
 import os
 import base64
+import gzip
+import json
+import queue
+
+# Imported first, so that the startup times it reports cover loading the rest
+from openrelife.readiness import get_readiness, load_in_background, mark_ready
 
 import numpy as np
-from flask import Flask, render_template_string, request, send_from_directory, jsonify
+from flask import Flask, Response, render_template_string, request, send_from_directory, jsonify
 from jinja2 import BaseLoader
-from PIL import Image
 
-from openrelife.config import appdata_folder, screenshots_path
-from openrelife.database import create_db, get_all_entries, get_timestamps, update_ai_ocr, delete_entries, get_entry_by_timestamp
-from openrelife.nlp import cosine_similarity, get_embedding
+from openrelife.config import appdata_folder, args, screenshots_path
+from openrelife.database import (
+    METADATA_COLUMNS,
+    create_db,
+    get_all_entries,
+    get_timestamps_page,
+    get_timeline_summary,
+    update_ai_ocr,
+    delete_entries,
+    get_entry_by_timestamp,
+    get_entries_by_timestamps,
+    migrate_embeddings,
+)
+from openrelife import nlp, ocr, segments
+from openrelife.nlp import get_query_cache_stats, get_query_embedding
 from openrelife.screenshot import (
     record_screenshots_thread,
+    stop_recording,
     get_recording_paused,
     set_recording_paused,
     get_screenshot_interval,
@@ -21,9 +39,53 @@ from openrelife.screenshot import (
 )
 from openrelife.utils import human_readable_time, timestamp_to_human_readable
 from openrelife.ai_ocr import get_ai_provider
+from openrelife.ann_index import DEFAULT_NPROBE, get_ann_index
+from openrelife.events import get_broker
+from openrelife.image_cache import ImageCache
+from openrelife.retention import run_retention, stop_retention, wake_retention
+from openrelife.search import hybrid_search
+from openrelife.vector_index import get_embedding_matrix
+from openrelife.storage import (
+    delete_screenshots,
+    migrate_to_sharded_layout,
+    open_screenshot,
+    read_screenshot,
+)
+from openrelife.thumbnails import RENDITION_SIZES, delete_renditions, read_rendition
 
 app = Flask(__name__)
 
+# Number of results returned by /api/search and rendered by /search
+API_SEARCH_LIMIT = 20
+SEARCH_PAGE_LIMIT = 100
+# Timestamps per /api/timeline page (and in the first timeline render), and the most a client may ask for
+TIMELINE_PAGE_SIZE = 1000
+TIMELINE_MAX_LIMIT = 5000
+# Seconds between keep-alive comments on an idle /api/events stream (also how soon a closed client is noticed)
+EVENTS_KEEPALIVE = 15
+# Waitress worker threads; open /api/events streams hold at most events.MAX_SUBSCRIBERS of them
+SERVER_THREADS = 6
+# Fields /api/entries can return (and the entry columns they map to), and the most entries per request
+ENTRY_FIELDS = ('id', 'timestamp', 'app', 'title', 'text', 'words_coords', 'ai_text', 'ai_words_coords')
+BULK_ENTRIES_LIMIT = 500
+# JSON responses at least this large are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = 1024
+# The classic view has no paging and embeds its entries, so it shows the most recent ones
+CLASSIC_ENTRIES_LIMIT = 1000
+# Screenshots never change once written, so browsers may keep them without revalidating
+IMAGE_MAX_AGE = 365 * 24 * 3600
+
+def get_retention_days() -> int:
+    """The retention setting in days; -1 (the default) keeps everything."""
+    settings_path = os.path.join(appdata_folder, "settings.json")
+    try:
+        with open(settings_path, 'r') as f:
+            content = f.read().strip()
+        return int(json.loads(content).get('retention_days', -1)) if content else -1
+    except (OSError, ValueError, AttributeError):
+        return -1
+
+
 def load_settings():
     settings_path = os.path.join(appdata_folder, "settings.json")
     if os.path.exists(settings_path):
@@ -404,18 +466,15 @@ app.jinja_env.loader = StringLoader()
 @app.route("/timeline-v2")
 def timeline_v2():
     """New Rewind.ai style interface"""
-    all_timestamps = get_timestamps()
+    # Only the most recent page of timestamps is embedded; the slider pages older
+    # (and, after a jump, newer) ones in through /api/timeline as it moves.
+    timestamps = get_timestamps_page(limit=TIMELINE_PAGE_SIZE + 1)
+    has_older = len(timestamps) > TIMELINE_PAGE_SIZE
+    timestamps = timestamps[:TIMELINE_PAGE_SIZE]
     # Optimization: Loading too many entries causes slow page rendering.
     # We limit initial load to 50 items. The user will see the most recent ones.
     # The frontend will fetch older entries on demand.
-    limit = 50
-    if len(all_timestamps) > limit:
-        # We still need all timestamps for the slider
-        partial_timestamps = all_timestamps[:limit]
-        entries = get_all_entries(limit=limit)
-    else:
-        partial_timestamps = all_timestamps
-        entries = get_all_entries()
+    entries = get_all_entries(limit=50, columns=METADATA_COLUMNS)
 
     entries_dict = {
         entry.timestamp: {
@@ -1181,7 +1240,7 @@ def timeline_v2():
             <option value="365">1 Year</option>
           </select>
           <small class="form-text text-muted" style="margin-top: 8px;">
-            Screenshots older than this period will be automatically deleted daily.
+            Screenshots older than this period will be automatically deleted in the background.
             <br><span style="color: #ffc107;"><i class="bi bi-exclamation-triangle"></i> Changing this will permanently delete old data.</span>
           </small>
         </div>
@@ -1287,7 +1346,10 @@ def timeline_v2():
 
 
   <script>
+    // A contiguous window of the timeline, newest first; older and newer pages load on demand
     let timestamps = {{timestamps|tojson}};
+    let hasOlder = {{has_older|tojson}};
+    let hasNewer = false;
     let entriesData = {{entries_dict|tojson}};
     const slider = document.getElementById('timelineSlider');
     const dateEl = document.getElementById('timelineDate');
@@ -1306,7 +1368,7 @@ def timeline_v2():
     
     function updateJumpButtonVisibility() {
       const sliderVal = parseInt(slider.value);
-      const isAtLatest = sliderVal === parseInt(slider.max);
+      const isAtLatest = !hasNewer && sliderVal === parseInt(slider.max);
       
       if (!isAtLatest) {
         jumpBtn.classList.add('show');
@@ -1315,7 +1377,8 @@ def timeline_v2():
       }
     }
     
-    function jumpToLatest() {
+    async function jumpToLatest() {
+      if (hasNewer) await loadLatestPage();
       slider.value = slider.max;
       // Manually trigger input event to update display
       slider.dispatchEvent(new Event('input'));
@@ -1397,70 +1460,182 @@ def timeline_v2():
       }
     }
 
-    // Smart Sync Logic
-    let syncInterval = null;
+    // Timeline paging (keyset, through /api/timeline)
+    const TIMELINE_PAGE = {{page_size}};
+    const PAGE_EDGE = 200; // Load the next page when the slider gets this close to an end of the window
+    let loadingPage = false;
 
-    async function syncData() {
-      if (timestamps.length === 0) return;
-      const lastKnown = timestamps[0];
+    async function fetchTimelinePage(params) {
+      const res = await fetch(`/api/timeline?${new URLSearchParams(params)}`);
+      return res.json();
+    }
+
+    async function loadOlder() {
+      if (!hasOlder || loadingPage || timestamps.length === 0) return;
+      loadingPage = true;
       try {
-        // Smart Resume: Check if we are currently at the latest timestamp BEFORE syncing
-        const wasAtLatest = parseInt(slider.value) === parseInt(slider.max);
+        const data = await fetchTimelinePage({before: timestamps[timestamps.length - 1], limit: TIMELINE_PAGE});
+        hasOlder = data.has_more;
+        if (data.timestamps.length > 0) {
+          const value = parseInt(slider.value);
+          timestamps = [...timestamps, ...data.timestamps];
+          slider.max = timestamps.length - 1;
+          // Slider values count from the oldest frame, so the same frame now has a higher value
+          slider.value = value + data.timestamps.length;
+        }
+      } catch (e) { console.error("Loading older frames failed", e); }
+      finally { loadingPage = false; }
+    }
 
-        const response = await fetch(`/api/sync?since=${lastKnown}`);
-        const data = await response.json();
-        if (data.timestamps && data.timestamps.length > 0) {
+    async function loadNewer() {
+      if (!hasNewer || loadingPage || timestamps.length === 0) return;
+      loadingPage = true;
+      try {
+        const data = await fetchTimelinePage({after: timestamps[0], limit: TIMELINE_PAGE});
+        hasNewer = data.has_more;
+        if (data.timestamps.length > 0) {
+          const value = parseInt(slider.value);
           timestamps = [...data.timestamps, ...timestamps];
-          entriesData = {...entriesData, ...data.entries};
           slider.max = timestamps.length - 1;
-          console.log(`Synced ${data.timestamps.length} new entries.`);
-          
-          // If we were at the latest, stay at the latest (which is now a new timestamp)
-          if (wasAtLatest) {
-             slider.value = slider.max;
-             updateDisplay(timestamps[0]); // timestamps[0] is the new latest
+          slider.value = value;
+          // Indices count from the newest frame, so a pending delete range moves down
+          if (isDeleteMode) {
+            deleteStartIndex += data.timestamps.length;
+            deleteEndIndex += data.timestamps.length;
           }
-          
-          updateJumpButtonVisibility();
         }
-      } catch (e) { console.error("Sync failed", e); }
+        updateJumpButtonVisibility();
+      } catch (e) { console.error("Loading newer frames failed", e); }
+      finally { loadingPage = false; }
     }
 
-    function startSync() {
-      syncData();
-      if (!syncInterval) syncInterval = setInterval(syncData, 2000);
+    function loadPagesNearSlider() {
+      const value = parseInt(slider.value);
+      if (value < PAGE_EDGE) loadOlder();
+      if (parseInt(slider.max) - value < PAGE_EDGE) loadNewer();
+    }
+
+    // Replaces the window with the pages around `ts` (used when jumping to a frame not loaded yet)
+    async function loadWindowAround(ts) {
+      const half = Math.ceil(TIMELINE_PAGE / 2);
+      try {
+        const [older, newer] = await Promise.all([
+          fetchTimelinePage({before: ts + 1, limit: half}),
+          fetchTimelinePage({after: ts, limit: half}),
+        ]);
+        if (isDeleteMode) exitDeleteMode();
+        timestamps = [...newer.timestamps, ...older.timestamps];
+        hasOlder = older.has_more;
+        hasNewer = newer.has_more;
+        slider.max = timestamps.length - 1;
+      } catch (e) { console.error("Loading frames failed", e); }
     }
 
-    function stopSync() {
-      if (syncInterval) {
-        clearInterval(syncInterval);
-        syncInterval = null;
+    async function loadLatestPage() {
+      try {
+        const data = await fetchTimelinePage({limit: TIMELINE_PAGE});
+        if (isDeleteMode) exitDeleteMode();
+        timestamps = data.timestamps;
+        hasOlder = data.has_more;
+        hasNewer = false;
+        slider.max = timestamps.length - 1;
+      } catch (e) { console.error("Loading latest frames failed", e); }
+    }
+
+    // Live updates: the server pushes frames over SSE (/api/events) as soon as they are stored
+    function mergeNewEntries(data) {
+      // New frames are only appended while the window reaches the latest one
+      if (hasNewer || !data.timestamps) return;
+      // A push may overlap a catch-up sync; keep only frames newer than the window
+      const latest = timestamps.length > 0 ? timestamps[0] : 0;
+      const fresh = data.timestamps.filter(ts => ts > latest);
+      if (fresh.length === 0) return;
+
+      // Smart Resume: Check if we are currently at the latest timestamp BEFORE merging
+      const wasAtLatest = parseInt(slider.value) === parseInt(slider.max);
+      timestamps = [...fresh, ...timestamps];
+      fresh.forEach(ts => { entriesData[ts] = data.entries[ts]; });
+      slider.max = timestamps.length - 1;
+      if (isDeleteMode) {
+        deleteStartIndex += fresh.length;
+        deleteEndIndex += fresh.length;
+      }
+      console.log(`Synced ${fresh.length} new entries.`);
+
+      // If we were at the latest, stay at the latest (which is now a new timestamp)
+      if (wasAtLatest) {
+         slider.value = slider.max;
+         updateDisplay(timestamps[0]); // timestamps[0] is the new latest
       }
+
+      updateJumpButtonVisibility();
+    }
+
+    // Catch-up after (re)connecting or when the server asks for it
+    async function syncData() {
+      if (hasNewer) return;
+      try {
+        const since = timestamps.length > 0 ? timestamps[0] : 0;
+        const response = await fetch(`/api/sync?since=${since}`);
+        mergeNewEntries(await response.json());
+      } catch (e) { console.error("Sync failed", e); }
+    }
+
+    let eventSource = null;
+
+    function startLiveUpdates() {
+      if (!window.EventSource) {
+        // No SSE support: fall back to polling
+        setInterval(syncData, 2000);
+        return;
+      }
+      eventSource = new EventSource('/api/events');
+      // Fired on every (re)connection, so frames stored while disconnected are fetched once
+      eventSource.onopen = syncData;
+      // A refused stream (503: too many open) is not retried by the browser: poll instead
+      eventSource.onerror = () => {
+        if (eventSource.readyState === EventSource.CLOSED) {
+          eventSource = null;
+          setInterval(syncData, 2000);
+        }
+      };
+      eventSource.addEventListener('entries', e => mergeNewEntries(JSON.parse(e.data)));
+      eventSource.addEventListener('resync', syncData);
     }
 
-    document.addEventListener("visibilitychange", () => {
-      if (document.visibilityState === 'visible') startSync();
-      else stopSync();
-    });
-    window.addEventListener("focus", startSync);
-    window.addEventListener("blur", stopSync);
     let currentAbortController = null;
 
-    if (document.visibilityState === 'visible') startSync();
+    startLiveUpdates();
     updateJumpButtonVisibility();
     
+    // While scrubbing, frames are shown as medium renditions; the full-resolution
+    // screenshot replaces the rendition once the slider has settled on a frame
+    const SETTLE_DELAY = 250;
+    let settleTimeout = null;
+
+    function showScreenshot(timestamp, scrubbing) {
+      clearTimeout(settleTimeout);
+      if (!scrubbing) {
+        screenshot.src = `/static/${timestamp}.webp`;
+        return;
+      }
+      screenshot.src = `/static/${timestamp}.webp?size=medium`;
+      settleTimeout = setTimeout(() => {
+        screenshot.src = `/static/${timestamp}.webp`;
+      }, SETTLE_DELAY);
+    }
+
     // Update display
-    // Update display
-    async function updateDisplay(timestamp) {
+    async function updateDisplay(timestamp, scrubbing = false) {
       // Update basic UI immediately
-      screenshot.src = `/static/${timestamp}.webp`;
+      showScreenshot(timestamp, scrubbing);
       dateEl.textContent = new Date(timestamp / 1000).toLocaleString('en-US', {
         month: 'short', day: 'numeric', year: 'numeric',
         hour: 'numeric', minute: '2-digit', hour12: true
       });
       
-      // Check if we have data
-      if (entriesData[timestamp]) {
+      // Check if we have data (prefetched neighbours have their text but no coordinates yet)
+      if (entriesData[timestamp] && entriesData[timestamp].words_coords) {
           currentEntry = entriesData[timestamp];
           
           // If image already loaded, render immediately, otherwise wait for onload
@@ -1472,9 +1647,13 @@ def timeline_v2():
           updateExtractedText();
       } else {
           // Loading state
-          currentEntry = null;
+          currentEntry = entriesData[timestamp] || null;
           renderOverlay(); // Clears overlay
-          document.getElementById('extractedText').innerHTML = '<span class="text-muted"><i class="bi bi-arrow-clockwise spinner-border spinner-border-sm"></i> Loading info...</span>';
+          if (currentEntry) {
+              updateExtractedText();
+          } else {
+              document.getElementById('extractedText').innerHTML = '<span class="text-muted"><i class="bi bi-arrow-clockwise spinner-border spinner-border-sm"></i> Loading info...</span>';
+          }
           
           try {
               if (currentAbortController) currentAbortController.abort();
@@ -1523,8 +1702,9 @@ def timeline_v2():
         updateDeleteInfo();
       }
       
-      updateDisplay(timestamps[idx]);
+      updateDisplay(timestamps[idx], true);
       updateJumpButtonVisibility();
+      loadPagesNearSlider();
     });
 
     // Prefetching Logic
@@ -1546,38 +1726,43 @@ def timeline_v2():
         }
 
         // Filter: only fetch what we don't have and aren't already fetching
-        const toFetch = neighbors.filter(idx => {
-            const ts = timestamps[idx];
-            return !entriesData[ts] && !fetchingMetadata.has(ts);
-        });
+        const toFetch = neighbors
+            .map(idx => timestamps[idx])
+            .filter(ts => !entriesData[ts] && !fetchingMetadata.has(ts));
+
+        // The shown frame needs its word coordinates for the overlay; the neighbours
+        // only get their text until they are shown. One request each, however many frames.
+        const currentTs = timestamps[currentIndex];
+        if (!(entriesData[currentTs] && entriesData[currentTs].words_coords) && !fetchingMetadata.has(currentTs)) {
+            fetchEntries([currentTs], null);
+        }
+        const lightFetch = toFetch.filter(ts => ts !== currentTs);
+        if (lightFetch.length > 0) fetchEntries(lightFetch, 'timestamp,text,ai_text');
+    }
 
-        // Loop and fetch sequentially (or parallel-limit) to avoid flooding
-        for (const idx of toFetch) {
-            const ts = timestamps[idx];
-            fetchingMetadata.add(ts);
-            
-            // We fetch without await inside the loop to allow some parallelism, 
-            // but we might want to respect browser limits. 
-            // For now, let's just trigger them.
-            fetch(`/api/entry/${ts}`)
-                .then(r => r.json())
-                .then(data => {
-                    if (data.success) {
-                        entriesData[ts] = data;
-                        // If user happened to scroll to this one while it was loading in background:
-                        const currentSliderVal = parseInt(slider.value);
-                        const currentIdx = timestamps.length - 1 - currentSliderVal;
-                        if (timestamps[currentIdx] === ts) {
-                            currentEntry = data;
-                            if (screenshot.complete) renderOverlay();
-                            updateExtractedText();
-                        }
-                    }
-                })
-                .catch(err => console.error("Prefetch error", err))
-                .finally(() => {
-                    fetchingMetadata.delete(ts);
-                });
+    async function fetchEntries(list, fields) {
+        list.forEach(ts => fetchingMetadata.add(ts));
+        try {
+            const params = new URLSearchParams({timestamps: list.join(',')});
+            if (fields) params.set('fields', fields);
+            const res = await fetch(`/api/entries?${params}`);
+            const data = await res.json();
+            const currentTs = timestamps[timestamps.length - 1 - parseInt(slider.value)];
+            for (const ts of data.timestamps) {
+                const entry = data.entries[ts];
+                // Never replace a full entry with a partial one
+                if (!entriesData[ts] || entry.words_coords) entriesData[ts] = entry;
+                // If user happened to scroll to this one while it was loading in background:
+                if (ts === currentTs && (!currentEntry || entry.words_coords)) {
+                    currentEntry = entriesData[ts];
+                    if (screenshot.complete) renderOverlay();
+                    updateExtractedText();
+                }
+            }
+        } catch (err) {
+            console.error("Prefetch error", err);
+        } finally {
+            list.forEach(ts => fetchingMetadata.delete(ts));
         }
     }
     
@@ -1629,14 +1814,17 @@ def timeline_v2():
               month: 'short', day: 'numeric', year: 'numeric',
               hour: 'numeric', minute: '2-digit', hour12: true
             });
-            screenshot.src = `/static/${ts}.webp`;
+            showScreenshot(ts, true);
             currentEntry = entriesData[ts];
           }
           
           clearTimeout(scrollTimeout);
           scrollTimeout = setTimeout(() => {
             isScrolling = false;
-            renderOverlay();
+            const shownTs = timestamps[timestamps.length - 1 - slider.value];
+            if (entriesData[shownTs] && entriesData[shownTs].words_coords) renderOverlay();
+            else updateDisplay(shownTs); // Loads the coordinates of a prefetched frame
+            loadPagesNearSlider();
             
             // Trigger prefetch for neighbors with debounce
             clearTimeout(prefetchTimeout);
@@ -1667,6 +1855,8 @@ def timeline_v2():
           }
           
           updateDisplay(timestamps[idx]);
+          updateJumpButtonVisibility();
+          loadPagesNearSlider();
           
           // Trigger prefetch for neighbors with debounce
           clearTimeout(prefetchTimeout);
@@ -1830,7 +2020,7 @@ def timeline_v2():
           searchResults.innerHTML = '<div class="results-grid">' + 
             results.map(r => `
               <div class="result-card" onclick="goToTimestamp(${r.timestamp})">
-                <img src="/static/${r.timestamp}.webp" alt="">
+                <img src="/static/${r.timestamp}.webp?size=small" alt="" loading="lazy">
                 <div class="result-time">${new Date(r.timestamp/1000).toLocaleString('en-US', {
                   month: 'short', day: 'numeric', hour: 'numeric', minute: '2-digit'
                 })}</div>
@@ -1844,8 +2034,12 @@ def timeline_v2():
       }
     }
     
-    function goToTimestamp(ts) {
-      const idx = timestamps.indexOf(ts);
+    async function goToTimestamp(ts) {
+      let idx = timestamps.indexOf(ts);
+      if (idx === -1) {
+        await loadWindowAround(ts);
+        idx = timestamps.indexOf(ts);
+      }
       if (idx !== -1) {
         slider.value = timestamps.length - 1 - idx;
         updateDisplay(ts);
@@ -2104,17 +2298,22 @@ def timeline_v2():
     // Pre-process active days for faster lookup
     const activeDays = new Set();
     const dayToTimestampMap = {}; 
+    const daySummaries = {};
     
-    function initCalendar() {
-      // Populate active days from timestamps
-      timestamps.forEach(ts => {
-        const date = new Date(ts / 1000);
-        const key = `${date.getFullYear()}-${date.getMonth()}-${date.getDate()}`;
-        if (!activeDays.has(key)) {
+    async function initCalendar() {
+      // Populate active days from the per-day summary
+      try {
+        const res = await fetch('/api/timeline/summary');
+        const data = await res.json();
+        data.periods.forEach(p => {
+          const [year, month, day] = p.period.split('-').map(Number);
+          const key = `${year}-${month - 1}-${day}`;
           activeDays.add(key);
-          dayToTimestampMap[key] = ts; // Store first timestamp of the day
-        }
-      });
+          dayToTimestampMap[key] = p.last; // Most recent timestamp of the day
+          daySummaries[key] = `${p.count} screenshot${p.count > 1 ? 's' : ''}` +
+            (p.apps && p.apps.length ? ` · ${p.apps.map(a => a.app).join(', ')}` : '');
+        });
+      } catch (e) { console.error("Loading calendar failed", e); }
       renderCalendar();
     }
     
@@ -2188,6 +2387,7 @@ def timeline_v2():
         
         el.className = className;
         el.textContent = day;
+        if (hasRecording) el.title = daySummaries[key];
         
         if (hasRecording) {
             el.onclick = () => {
@@ -2259,12 +2459,72 @@ def timeline_v2():
   </script>
 </body>
 </html>
-    """, timestamps=all_timestamps, entries_dict=entries_dict)
+    """, timestamps=timestamps, has_older=has_older, page_size=TIMELINE_PAGE_SIZE, entries_dict=entries_dict)
+
+
+def _int_arg(name, default=None):
+    try:
+        return int(request.args[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _json_response(payload):
+    """Like jsonify, but gzip-compressed when the body is large and the client accepts it."""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    response = Response(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@app.route("/api/entries")
+def api_entries():
+    """Several entries in one query and one response.
+
+    Selects ?timestamps=1,2,3 or a range ?before=&after=&limit= (newest first,
+    bounds exclusive). ?fields=text,ai_text,... limits the returned fields, so
+    prefetching can skip the word coordinates; only the needed columns are read.
+    """
+    requested = request.args.get("fields")
+    fields = tuple(f for f in requested.split(',') if f) if requested else ENTRY_FIELDS
+    unknown = [f for f in fields if f not in ENTRY_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    columns = tuple(dict.fromkeys(('timestamp',) + fields))
+
+    if 'timestamps' in request.args:
+        try:
+            timestamps = [int(t) for t in request.args['timestamps'].split(',') if t]
+        except ValueError:
+            return jsonify({'error': 'timestamps must be integers'}), 400
+        entries = get_entries_by_timestamps(timestamps[:BULK_ENTRIES_LIMIT], columns=columns)
+    else:
+        limit = max(1, min(_int_arg("limit", 100), BULK_ENTRIES_LIMIT))
+        entries = get_all_entries(
+            limit=limit,
+            min_timestamp=_int_arg("after", 0),
+            max_timestamp=_int_arg("before"),
+            columns=columns,
+        )
+
+    def entry_fields(entry):
+        data = {field: getattr(entry, field) for field in fields}
+        if 'ai_words_coords' in data and not data['ai_words_coords']:
+            data['ai_words_coords'] = []
+        return data
+
+    return _json_response({
+        'timestamps': [entry.timestamp for entry in entries],
+        'entries': {entry.timestamp: entry_fields(entry) for entry in entries},
+    })
 
 
 @app.route("/api/entry/<int:timestamp>")
 def api_get_entry(timestamp):
-    entry = get_entry_by_timestamp(timestamp)
+    entry = get_entry_by_timestamp(timestamp, columns=METADATA_COLUMNS)
     if entry:
         return jsonify({
             'success': True,
@@ -2286,44 +2546,39 @@ def api_search():
     if not q:
         return jsonify([])
     
-    entries = get_all_entries()
-    embeddings = [entry.embedding for entry in entries]
-    query_embedding = get_embedding(q)
-    similarities = [cosine_similarity(query_embedding, emb) for emb in embeddings]
-    
-    query_lower = q.lower()
-    scores = []
-    for i, entry in enumerate(entries):
-        semantic_score = similarities[i]
-        text_lower = entry.text.lower()
-        keyword_boost = 0
-        
-        if query_lower in text_lower:
-            keyword_boost = 0.5
-        else:
-            query_words = query_lower.split()
-            matched = sum(1 for word in query_words if word in text_lower)
-            if matched > 0:
-                keyword_boost = 0.3 * (matched / len(query_words))
-        
-        # Add recency bias (approx 0.003 points per year)
-        recency_score = entry.timestamp / 1e10
-        
-        scores.append((i, semantic_score + keyword_boost + recency_score, keyword_boost > 0))
+    # Recall-vs-latency knob: ANN lists to probe (0 = exact search)
+    try:
+        nprobe = max(0, int(request.args.get("nprobe", DEFAULT_NPROBE)))
+    except ValueError:
+        nprobe = DEFAULT_NPROBE
     
-    scores.sort(key=lambda x: (x[2], x[1]), reverse=True)
+    ranked = hybrid_search(q, get_query_embedding(q), API_SEARCH_LIMIT, nprobe=nprobe)
+    entries = get_entries_by_timestamps(ranked, columns=('timestamp', 'text'))
     
     results = [
         {
-            'timestamp': entries[idx].timestamp,
-            'text': entries[idx].text[:200]
+            'timestamp': entry.timestamp,
+            'text': (entry.text or '')[:200]
         }
-        for idx, score, has_keyword in scores[:20]
+        for entry in entries
     ]
     
     return jsonify(results)
 
 
+@app.route("/api/ready")
+def api_ready():
+    """Readiness of the backend: 200 once the database and the models are loaded, 503 while loading"""
+    status = get_readiness()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route("/api/search/stats")
+def api_search_stats():
+    """Hit and miss counters of the query embedding cache"""
+    return jsonify(get_query_cache_stats())
+
+
 @app.route("/api/sync")
 def api_sync():
     """API endpoint to fetch new entries since a timestamp"""
@@ -2335,7 +2590,7 @@ def api_sync():
     
     # Efficiently fetch only new entries using SQL filtering
     # This optimization prevents the server from reading the entire DB every 2 seconds
-    new_entries = get_all_entries(min_timestamp=since)
+    new_entries = get_all_entries(min_timestamp=since, columns=METADATA_COLUMNS)
     
     if not new_entries:
         return jsonify({'timestamps': [], 'entries': {}})
@@ -2363,6 +2618,70 @@ def api_sync():
 
 
 
+@app.route("/api/timeline")
+def api_timeline():
+    """One page of timestamps, newest first: ?before=&after=&limit= (keyset pagination)"""
+    before = _int_arg("before")
+    after = _int_arg("after")
+    limit = max(1, min(_int_arg("limit", TIMELINE_PAGE_SIZE), TIMELINE_MAX_LIMIT))
+
+    # One extra row tells whether another page follows in the paging direction
+    timestamps = get_timestamps_page(before=before, after=after, limit=limit + 1)
+    has_more = len(timestamps) > limit
+    if after is not None and before is None:
+        # Paging towards newer entries: the page is the oldest `limit` ones above `after`
+        timestamps = timestamps[-limit:]
+    else:
+        timestamps = timestamps[:limit]
+    return jsonify({'timestamps': timestamps, 'has_more': has_more})
+
+
+@app.route("/api/timeline/summary")
+def api_timeline_summary():
+    """Activity rollup per local day (or ?granularity=hour): frame count, first and last
+    timestamp and, for days, the ?apps= most recorded apps (default 3)"""
+    granularity = request.args.get("granularity", "day")
+    if granularity not in ("day", "hour"):
+        return jsonify({'error': 'granularity must be day or hour'}), 400
+    top_apps = max(0, min(_int_arg("apps", 3), 20))
+    return jsonify({'granularity': granularity, 'periods': get_timeline_summary(granularity, top_apps)})
+
+
+@app.route("/api/events")
+def api_events():
+    """Server-sent events: new entries are pushed as they are stored, replacing /api/sync polling.
+
+    Each 'entries' event carries the same {'timestamps', 'entries'} payload as
+    /api/sync. A 'resync' event asks the client to catch up with /api/sync.
+    An idle stream costs no database queries. Each stream holds a server
+    thread, so past events.MAX_SUBSCRIBERS streams the answer is 503 and the
+    client polls /api/sync instead.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe()
+    if subscription is None:
+        return jsonify({'error': 'Too many live update streams; poll /api/sync'}), 503
+
+    def stream():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    event_type, data = subscription.get(timeout=EVENTS_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @app.route("/api/recording-status", methods=["GET"])
 def get_recording_status():
     return jsonify({"paused": get_recording_paused()})
@@ -2390,13 +2709,16 @@ def api_delete():
     count = delete_entries(timestamps)
     
     # Also delete screenshots from disk
+    try:
+        delete_screenshots([int(ts) for ts in timestamps])
+    except Exception as e:
+        print(f"Error removing screenshots: {e}")
     for ts in timestamps:
         try:
-            file_path = os.path.join(screenshots_path, f"{ts}.webp")
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            delete_renditions(int(ts))
         except Exception as e:
             print(f"Error removing file {ts}.webp: {e}")
+    _discard_images(int(ts) for ts in timestamps)
             
     return jsonify({"deleted": count})
 
@@ -2404,8 +2726,8 @@ def api_delete():
 @app.route("/classic")
 def timeline():
     # connect to db
-    timestamps = get_timestamps()
-    entries = get_all_entries()
+    entries = get_all_entries(limit=CLASSIC_ENTRIES_LIMIT, columns=METADATA_COLUMNS)
+    timestamps = [entry.timestamp for entry in entries]
     # Convert entries to dict without embedding (numpy array)
     entries_dict = {
         entry.timestamp: {
@@ -2956,54 +3278,22 @@ def search():
 {% endblock %}
 """)
     
-    entries = get_all_entries()
-    embeddings = [entry.embedding for entry in entries]
-    query_embedding = get_embedding(q)
-    similarities = [cosine_similarity(query_embedding, emb) for emb in embeddings]
-    
-    # Create a hybrid score: semantic similarity + keyword match boost
-    query_lower = q.lower()
-    scores = []
-    for i, entry in enumerate(entries):
-        semantic_score = similarities[i]
-        
-        # Boost score if query keywords are found in text
-        text_lower = entry.text.lower()
-        keyword_boost = 0
-        
-        # Exact phrase match gets highest boost
-        if query_lower in text_lower:
-            keyword_boost = 0.5
-        else:
-            # Check individual words
-            query_words = query_lower.split()
-            matched_words = sum(1 for word in query_words if word in text_lower)
-            if matched_words > 0:
-                keyword_boost = 0.3 * (matched_words / len(query_words))
-        
-        # Add recency bias (approx 0.003 points per year)
-        recency_score = entry.timestamp / 1e10
-        
-        # Combined score
-        final_score = semantic_score + keyword_boost + recency_score
-        scores.append((i, final_score, keyword_boost > 0))
-    
-    # Sort by score, prioritizing entries with keyword matches
-    scores.sort(key=lambda x: (x[2], x[1]), reverse=True)
+    ranked = hybrid_search(q, get_query_embedding(q), SEARCH_PAGE_LIMIT)
+    entries = get_entries_by_timestamps(ranked, columns=METADATA_COLUMNS)
     
     # Convert entries to dict without embedding (numpy array)
     sorted_entries = [
         {
-            'id': entries[idx].id,
-            'app': entries[idx].app,
-            'title': entries[idx].title,
-            'text': entries[idx].text,
-            'timestamp': entries[idx].timestamp,
-            'words_coords': entries[idx].words_coords,
-            'ai_text': entries[idx].ai_text,
-            'ai_words_coords': entries[idx].ai_words_coords if entries[idx].ai_words_coords else []
+            'id': entry.id,
+            'app': entry.app,
+            'title': entry.title,
+            'text': entry.text,
+            'timestamp': entry.timestamp,
+            'words_coords': entry.words_coords,
+            'ai_text': entry.ai_text,
+            'ai_words_coords': entry.ai_words_coords if entry.ai_words_coords else []
         }
-        for idx, score, has_keyword in scores
+        for entry in entries
     ]
 
     return render_template_string(
@@ -3016,7 +3306,7 @@ def search():
                 <div class="col-md-3 mb-4">
                     <div class="card">
                         <a href="#" data-toggle="modal" data-target="#modal-{{ loop.index0 }}">
-                            <img src="/static/{{ entry['timestamp'] }}.webp" alt="Image" class="card-img-top">
+                            <img src="/static/{{ entry['timestamp'] }}.webp?size=small" alt="Image" class="card-img-top" loading="lazy">
                         </a>
                     </div>
                 </div>
@@ -3181,9 +3471,43 @@ def search():
     )
 
 
+# Bytes of recently served screenshots and renditions, keyed by (timestamp, size or None)
+_image_cache = ImageCache()
+
+
+def _discard_images(timestamps):
+    """Drops deleted screenshots and their renditions from the image cache."""
+    for ts in timestamps:
+        for size in (None, *RENDITION_SIZES):
+            _image_cache.discard((ts, size))
+
+
 @app.route("/static/<filename>")
 def serve_image(filename):
-    return send_from_directory(screenshots_path, filename)
+    """Serves a screenshot, or with ?size=small|medium one of its renditions.
+
+    Hot files are served from memory, with a strong ETag and a long-lived
+    immutable Cache-Control; conditional and range requests are honoured.
+    """
+    stem, extension = os.path.splitext(filename)
+    if not stem.isdigit() or extension != ".webp":
+        return send_from_directory(screenshots_path, filename)
+    timestamp = int(stem)
+    size = request.args.get("size")
+    try:
+        if size in RENDITION_SIZES:
+            data, etag = _image_cache.load((timestamp, size), lambda: read_rendition(timestamp, size))
+        else:
+            data, etag = _image_cache.load((timestamp, None), lambda: read_screenshot(timestamp))
+    except OSError:
+        return jsonify({"error": "Screenshot not found"}), 404
+    # Packed delta frames are rebuilt as JPEG (see segments.read_frame)
+    response = Response(data, mimetype="image/jpeg" if data[:2] == b"\xff\xd8" else "image/webp")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
 
 
 @app.route("/api/ai-ocr", methods=["POST"])
@@ -3199,28 +3523,21 @@ def ai_ocr():
             return jsonify({'error': 'Missing timestamp or api_key'}), 400
         
         # Find the entry
-        entries = get_all_entries()
-        entry = next((e for e in entries if e.timestamp == timestamp), None)
+        entry = get_entry_by_timestamp(timestamp, columns=('timestamp', 'text'))
         
         if not entry:
             return jsonify({'error': 'Entry not found'}), 404
         
         # Load the screenshot image
-        image_path = os.path.join(screenshots_path, f"{timestamp}.webp")
-        if not os.path.exists(image_path):
+        img = open_screenshot(int(timestamp))
+        if img is None:
             return jsonify({'error': 'Screenshot file not found'}), 404
         
         # Convert image to base64
-        with Image.open(image_path) as img:
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Save to bytes
-            import io
-            buffer = io.BytesIO()
-            img.save(buffer, format='JPEG', quality=95)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        import io
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=95)
+        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
         
         # Get AI provider
         ai_provider = get_ai_provider(provider, api_key)
@@ -3301,6 +3618,7 @@ def api_settings_retention():
         settings['retention_days'] = int(days)
         with open(settings_path, 'w') as f:
             json.dump(settings, f)
+        wake_retention()
         return jsonify({'success': True})
 
 
@@ -3436,7 +3754,7 @@ def api_update_settings():
         set_screenshot_interval(interval)
         settings['screenshot_interval'] = interval
         
-    # Update Retention
+    # Update Retention (the worker is woken once the settings are saved)
     if 'retention_days' in data:
         settings['retention_days'] = int(data['retention_days'])
         
@@ -3465,6 +3783,8 @@ def api_update_settings():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+    if 'retention_days' in data:
+        wake_retention()
     return jsonify({'success': True, 'restart_required': restart_required})
 
 
@@ -3491,6 +3811,17 @@ if __name__ == "__main__":
     port_in_use = sock.connect_ex(('127.0.0.1', configured_port)) == 0
     sock.close()
     
+    if args.migrate_screenshots:
+        # Can run alongside a running instance, so it goes before the port check
+        print(f"Moved {migrate_to_sharded_layout()} files into the sharded screenshot layout")
+        sys.exit(0)
+
+    if args.migrate_embeddings:
+        # Short transactions, so this too can run alongside a running instance
+        create_db()
+        print(f"Converted {migrate_embeddings(args.embedding_format)} embeddings to {args.embedding_format}")
+        sys.exit(0)
+
     if port_in_use:
         print(f"❌ Port {configured_port} is already in use. OpenReLife is already running.")
         print("💡 Use the hotkey (Cmd+Shift+Space) to open the interface.")
@@ -3498,6 +3829,12 @@ if __name__ == "__main__":
     
     create_db()
     load_settings()
+    mark_ready("database")
+
+    # The server answers right away; the models and the search index load meanwhile (see /api/ready)
+    load_in_background("ocr", ocr.warm_up)
+    load_in_background("embeddings", nlp.warm_up)
+    load_in_background("search_index", lambda: get_ann_index(get_embedding_matrix()))
 
     print(f"Appdata folder: {appdata_folder}")
     print(f"🚀 Starting OpenReLife on port {configured_port} (Production Mode)...")
@@ -3506,6 +3843,16 @@ if __name__ == "__main__":
     t = Thread(target=record_screenshots_thread)
     t.start()
 
+    # Delete data older than the retention setting in the background
+    Thread(target=run_retention, args=(get_retention_days, _discard_images), daemon=True).start()
+
     # Use Waitress for production
     from waitress import serve
-    serve(app, host='127.0.0.1', port=configured_port, threads=6)
+    try:
+        serve(app, host='127.0.0.1', port=configured_port, threads=SERVER_THREADS)
+    finally:
+        # Write the frames still in the recording pipeline before exiting
+        stop_retention()
+        stop_recording()
+        t.join(timeout=30)
+        segments.close_writer()
@@ -0,0 +1,38 @@
+import numpy as np
+from PIL import Image
+
+
+def rgb_view(raw, width: int, height: int) -> np.ndarray:
+    """Wraps a BGRA capture buffer (as returned by mss) as an RGB array without copying.
+
+    The result is a strided view: channels are read in reverse order from the
+    buffer and the padding byte is skipped. It keeps `raw` alive.
+
+    Args:
+        raw: The BGRA pixel buffer, `width * height * 4` bytes.
+        width: Width of the capture in pixels.
+        height: Height of the capture in pixels.
+
+    Returns:
+        A (height, width, 3) uint8 array (RGB) backed by `raw`.
+    """
+    bgra = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)
+    return bgra[..., 2::-1]
+
+
+def to_image(image: np.ndarray) -> Image.Image:
+    """Converts a frame to an RGB PIL image.
+
+    A view made by `rgb_view` is decoded by PIL straight from its BGRA
+    buffer ('BGRX' raw mode) in a single pass; any other array goes through
+    `Image.fromarray`.
+    """
+    height, width = image.shape[:2]
+    base = image.base
+    if (
+        base is not None
+        and image.strides == (width * 4, 4, -1)
+        and memoryview(base).nbytes == width * height * 4
+    ):
+        return Image.frombuffer("RGB", (width, height), base, "raw", "BGRX", 0, 1)
+    return Image.fromarray(image)
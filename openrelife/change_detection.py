@@ -0,0 +1,295 @@
+import weakref
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+# Pixel rectangle (x1, y1, x2, y2), end-exclusive
+Rect = Tuple[int, int, int, int]
+
+# Similarity at or above which a new frame is not recorded, for the global MSSIM
+SIMILARITY_THRESHOLD: float = 0.9
+# The same for the block-wise SSIM, which scores a local change lower than the global
+# MSSIM does and is calibrated with benchmarks/bench_change_detection.py
+FAST_SIMILARITY_THRESHOLD: float = 0.95
+# Longest side of the grayscale thumbnail the fast detector works on
+THUMBNAIL_SIDE: int = 256
+# Edge length of the SSIM blocks on the thumbnail, in pixels
+SSIM_BLOCK_SIZE: int = 8
+# Number of pyramid levels the block SSIM is averaged over
+PYRAMID_LEVELS: int = 2
+# Difference hashes further apart than this (of 64 bits) are a change without SSIM
+HASH_DISTANCE_CHANGED: int = 24
+
+# Edge length of the tiles compared between frames, in pixels
+DIRTY_TILE_SIZE: int = 32
+# Above this fraction of changed tiles, a region-wise update is not worth it
+MAX_DIRTY_FRACTION: float = 0.4
+
+
+def _dilate(mask: np.ndarray) -> np.ndarray:
+    """Grows a boolean grid by one cell in all 8 directions."""
+    grown = mask.copy()
+    grown[1:, :] |= mask[:-1, :]
+    grown[:-1, :] |= mask[1:, :]
+    grown[:, 1:] |= grown[:, :-1].copy()
+    grown[:, :-1] |= grown[:, 1:].copy()
+    return grown
+
+
+def _components(mask: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Returns the bounding boxes (row1, col1, row2, col2), end-exclusive, of 4-connected groups."""
+    seen = np.zeros_like(mask)
+    boxes = []
+    rows, cols = mask.shape
+    for r0, c0 in zip(*np.nonzero(mask)):
+        if seen[r0, c0]:
+            continue
+        seen[r0, c0] = True
+        stack = [(r0, c0)]
+        r1, c1, r2, c2 = r0, c0, r0, c0
+        while stack:
+            r, c = stack.pop()
+            r1, c1, r2, c2 = min(r1, r), min(c1, c), max(r2, r), max(c2, c)
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if 0 <= nr < rows and 0 <= nc < cols and mask[nr, nc] and not seen[nr, nc]:
+                    seen[nr, nc] = True
+                    stack.append((nr, nc))
+        boxes.append((int(r1), int(c1), int(r2) + 1, int(c2) + 1))
+    return boxes
+
+
+def dirty_regions(
+    previous: np.ndarray,
+    current: np.ndarray,
+    tile_size: int = DIRTY_TILE_SIZE,
+    max_fraction: float = MAX_DIRTY_FRACTION,
+) -> Optional[List[Rect]]:
+    """Finds the rectangles of `current` that differ from `previous`.
+
+    Screen captures are pixel-exact where nothing was redrawn, so any changed
+    value marks its tile dirty. Dirty tiles are grown by one tile (to keep
+    words at a tile border whole) and merged into bounding rectangles.
+
+    Args:
+        previous: The previous frame, (H, W, C) uint8.
+        current: The new frame, same shape.
+        tile_size: Tile edge length in pixels.
+        max_fraction: Maximum dirty tile fraction for a region-wise result.
+
+    Returns:
+        A list of pixel rectangles (empty if the frames are identical), or
+        None if the frames differ in shape or too much of the screen changed.
+    """
+    if previous is None or previous.shape != current.shape:
+        return None
+    height, width = current.shape[:2]
+    changed = previous != current
+    if changed.ndim == 3:
+        changed = changed.any(axis=2)
+
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+    padded = np.zeros((rows * tile_size, cols * tile_size), dtype=bool)
+    padded[:height, :width] = changed
+    tiles = padded.reshape(rows, tile_size, cols, tile_size).any(axis=(1, 3))
+
+    if tiles.mean() > max_fraction:
+        return None
+    tiles = _dilate(tiles)
+    return [
+        (c1 * tile_size, r1 * tile_size, min(c2 * tile_size, width), min(r2 * tile_size, height))
+        for r1, c1, r2, c2 in _components(tiles)
+    ]
+
+
+def mean_structured_similarity_index(
+    img1: np.ndarray, img2: np.ndarray, L: int = 255
+) -> float:
+    """Calculates the Mean Structural Similarity Index (MSSIM) between two images.
+
+    Args:
+        img1: The first image as a NumPy array (RGB).
+        img2: The second image as a NumPy array (RGB).
+        L: The dynamic range of the pixel values (default is 255).
+
+    Returns:
+        The MSSIM value between the two images (float between -1 and 1).
+    """
+    K1, K2 = 0.01, 0.03
+    C1, C2 = (K1 * L) ** 2, (K2 * L) ** 2
+
+    def rgb2gray(img: np.ndarray) -> np.ndarray:
+        """Converts an RGB image to grayscale."""
+        return 0.2989 * img[..., 0] + 0.5870 * img[..., 1] + 0.1140 * img[..., 2]
+
+    img1_gray: np.ndarray = rgb2gray(img1)
+    img2_gray: np.ndarray = rgb2gray(img2)
+    mu1: float = np.mean(img1_gray)
+    mu2: float = np.mean(img2_gray)
+    sigma1_sq = np.var(img1_gray)
+    sigma2_sq = np.var(img2_gray)
+    sigma12 = np.mean((img1_gray - mu1) * (img2_gray - mu2))
+    ssim_index = ((2 * mu1 * mu2 + C1) * (2 * sigma12 + C2)) / (
+        (mu1**2 + mu2**2 + C1) * (sigma1_sq + sigma2_sq + C2)
+    )
+    return ssim_index
+
+
+_GRAY_WEIGHTS = np.array([0.2989, 0.5870, 0.1140], dtype=np.float32)
+
+
+def gray_thumbnail(image: np.ndarray, max_side: int = THUMBNAIL_SIDE) -> np.ndarray:
+    """Downsamples an RGB frame to a float32 grayscale thumbnail.
+
+    The frame is first sampled with an integer stride (a view, so the full
+    frame is never converted), then 2x2 box-averaged, which smooths the
+    sampling so a one-pixel shift does not look like a new screen.
+    """
+    height, width = image.shape[:2]
+    step = max(1, -(-max(height, width) // (2 * max_side)))
+    sampled = image[::step, ::step]
+    rows, cols = (sampled.shape[0] // 2) * 2, (sampled.shape[1] // 2) * 2
+    sampled = sampled[:rows, :cols]
+    if sampled.ndim == 3:
+        gray = sampled[..., :3].astype(np.float32) @ _GRAY_WEIGHTS
+    else:
+        gray = sampled.astype(np.float32)
+    return gray.reshape(rows // 2, 2, cols // 2, 2).mean(axis=(1, 3))
+
+
+def difference_hash(thumbnail: np.ndarray) -> np.ndarray:
+    """64-bit perceptual difference hash (as 64 booleans) of a grayscale thumbnail."""
+    rows = np.linspace(0, thumbnail.shape[0], 9, dtype=int)
+    cols = np.linspace(0, thumbnail.shape[1], 10, dtype=int)
+    cells = np.add.reduceat(np.add.reduceat(thumbnail, rows[:-1], axis=0), cols[:-1], axis=1)
+    cells /= np.outer(np.diff(rows), np.diff(cols))
+    return (cells[:, 1:] > cells[:, :-1]).ravel()
+
+
+def block_ssim(gray1: np.ndarray, gray2: np.ndarray, block: int = SSIM_BLOCK_SIZE, L: int = 255) -> float:
+    """Mean of the SSIM of non-overlapping `block` x `block` tiles of two grayscale images."""
+    K1, K2 = 0.01, 0.03
+    C1, C2 = (K1 * L) ** 2, (K2 * L) ** 2
+    block = max(1, min(block, *gray1.shape[:2]))
+    rows, cols = (gray1.shape[0] // block) * block, (gray1.shape[1] // block) * block
+    shape = (rows // block, block, cols // block, block)
+    a = gray1[:rows, :cols].reshape(shape)
+    b = gray2[:rows, :cols].reshape(shape)
+    mu1 = a.mean(axis=(1, 3))
+    mu2 = b.mean(axis=(1, 3))
+    sigma1_sq = (a * a).mean(axis=(1, 3)) - mu1 * mu1
+    sigma2_sq = (b * b).mean(axis=(1, 3)) - mu2 * mu2
+    sigma12 = (a * b).mean(axis=(1, 3)) - mu1 * mu2
+    ssim = ((2 * mu1 * mu2 + C1) * (2 * sigma12 + C2)) / (
+        (mu1**2 + mu2**2 + C1) * (sigma1_sq + sigma2_sq + C2)
+    )
+    return float(ssim.mean())
+
+
+class ChangeDetector(ABC):
+    """Decides whether a new frame differs enough from the last recorded one."""
+
+    name = ""
+    default_threshold = SIMILARITY_THRESHOLD
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = self.default_threshold if threshold is None else threshold
+
+    @abstractmethod
+    def similarity(self, previous: np.ndarray, current: np.ndarray) -> float:
+        """Returns how similar two frames are, from 0 (unrelated) to 1 (identical)."""
+
+    def is_similar(self, previous: np.ndarray, current: np.ndarray) -> bool:
+        return self.similarity(previous, current) >= self.threshold
+
+
+class MSSIMDetector(ChangeDetector):
+    """The original detector: one global MSSIM over the full-resolution frames."""
+
+    name = "mssim"
+
+    def similarity(self, previous: np.ndarray, current: np.ndarray) -> float:
+        return mean_structured_similarity_index(previous, current)
+
+
+class FastChangeDetector(ChangeDetector):
+    """Thumbnail-based detector.
+
+    Both frames are reduced to a small float32 grayscale thumbnail. Identical
+    thumbnails are similar and thumbnails whose difference hashes are far
+    apart are a change, both without further work. Otherwise the score is
+    the block-wise SSIM averaged over a small pyramid of the thumbnails,
+    which responds to a local change (a new line of text) that a single
+    global MSSIM averages away. Thumbnails are cached per live frame, since
+    the recorder compares each monitor against its last recorded frame
+    repeatedly.
+    """
+
+    name = "fast"
+    default_threshold = FAST_SIMILARITY_THRESHOLD
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        max_side: int = THUMBNAIL_SIDE,
+        levels: int = PYRAMID_LEVELS,
+        hash_distance: int = HASH_DISTANCE_CHANGED,
+    ):
+        super().__init__(threshold)
+        self.max_side = max_side
+        self.levels = max(1, levels)
+        self.hash_distance = hash_distance
+        # id(frame) -> (weak reference to the frame, its thumbnail); an entry is removed
+        # when its frame is freed, so the cache never keeps a frame alive
+        self._thumbnails: Dict[int, Tuple[weakref.ref, np.ndarray]] = {}
+
+    def _thumbnail(self, image: np.ndarray) -> np.ndarray:
+        cached = self._thumbnails.get(id(image))
+        if cached is not None and cached[0]() is image:
+            return cached[1]
+        thumbnail = gray_thumbnail(image, self.max_side)
+        key = id(image)
+        self._thumbnails[key] = (weakref.ref(image, lambda _: self._thumbnails.pop(key, None)), thumbnail)
+        return thumbnail
+
+    def similarity(self, previous: np.ndarray, current: np.ndarray) -> float:
+        if previous.shape != current.shape:
+            return 0.0
+        thumb1 = self._thumbnail(previous)
+        thumb2 = self._thumbnail(current)
+
+        if np.array_equal(thumb1, thumb2):
+            return 1.0
+        distance = int(np.count_nonzero(difference_hash(thumb1) != difference_hash(thumb2)))
+        if distance > self.hash_distance:
+            return 0.0
+
+        scores = []
+        for level in range(self.levels):
+            if level:
+                rows, cols = (thumb1.shape[0] // 2) * 2, (thumb1.shape[1] // 2) * 2
+                if rows < SSIM_BLOCK_SIZE or cols < SSIM_BLOCK_SIZE:
+                    break
+                thumb1 = thumb1[:rows, :cols].reshape(rows // 2, 2, cols // 2, 2).mean(axis=(1, 3))
+                thumb2 = thumb2[:rows, :cols].reshape(rows // 2, 2, cols // 2, 2).mean(axis=(1, 3))
+            scores.append(block_ssim(thumb1, thumb2))
+        return float(np.mean(scores))
+
+
+CHANGE_DETECTORS: Dict[str, Type[ChangeDetector]] = {
+    MSSIMDetector.name: MSSIMDetector,
+    FastChangeDetector.name: FastChangeDetector,
+}
+
+
+def get_change_detector(name: str, threshold: Optional[float] = None) -> ChangeDetector:
+    """Creates the change detector registered under `name`, with its default threshold if None.
+
+    Raises:
+        ValueError: If no detector is registered under `name`.
+    """
+    try:
+        return CHANGE_DETECTORS[name](threshold)
+    except KeyError:
+        raise ValueError(f"Unknown change detector: {name}") from None
@@ -17,6 +17,54 @@ parser.add_argument(
     default=False,
 )
 
+parser.add_argument(
+    "--change-detector",
+    choices=["fast", "mssim"],
+    default="fast",
+    help="How new frames are compared to the last recorded one: thumbnail-based "
+    "(fast) or the full-resolution MSSIM (mssim)",
+)
+
+parser.add_argument(
+    "--storage-engine",
+    choices=["files", "segments"],
+    default="files",
+    help="How screenshots are stored: one WebP file each (files) or packed as "
+    "keyframes and deltas into append-only segment files (segments)",
+)
+
+parser.add_argument(
+    "--embedding-backend",
+    choices=["torch", "int8", "onnx"],
+    default="torch",
+    help="How the embedding model runs: PyTorch (torch), PyTorch with int8 dynamic "
+    "quantization (int8) or exported to ONNX Runtime (onnx, needs onnxruntime)",
+)
+
+parser.add_argument(
+    "--embedding-format",
+    choices=["float32", "float16", "int8", "binary"],
+    default="float32",
+    help="How text embeddings are stored and held in memory for search: float32, "
+    "float16 (2x smaller), per-vector scaled int8 (4x), or binary sign codes in "
+    "memory (32x) with int8 on disk to re-rank the best matches",
+)
+
+parser.add_argument(
+    "--migrate-embeddings",
+    action="store_true",
+    default=False,
+    help="Convert the stored embeddings to --embedding-format, then exit",
+)
+
+parser.add_argument(
+    "--migrate-screenshots",
+    action="store_true",
+    default=False,
+    help="Move screenshots stored flat by older versions into the sharded "
+    "<year>/<month>/<day>/<hour> layout, then exit (safe while OpenReLife is running)",
+)
+
 args = parser.parse_args()
 
 
@@ -46,6 +94,18 @@ else:
     db_path = os.path.join(appdata_folder, "recall.db")
     screenshots_path = os.path.join(appdata_folder, "screenshots")
 
+# Approximate nearest-neighbour index for semantic search, kept next to the DB
+ann_index_path = os.path.join(appdata_folder, "recall_ann.npz")
+
+# Downscaled renditions of the screenshots (one sub-folder per size), see thumbnails.py
+thumbnails_path = os.path.join(appdata_folder, "thumbnails")
+# Persistent cache of OCR line embeddings (see embedding_cache.py); safe to delete
+line_cache_path = os.path.join(appdata_folder, "line_embeddings.db")
+# Append-only files of packed screenshots, for --storage-engine segments (see segments.py)
+segments_path = os.path.join(appdata_folder, "segments")
+# Models converted for --embedding-backend onnx (see embedding_backends.py); safe to delete
+models_path = os.path.join(appdata_folder, "models")
+
 if not os.path.exists(screenshots_path):
     try:
         os.makedirs(screenshots_path)
@@ -1,13 +1,153 @@
 import sqlite3
-from collections import namedtuple
+import threading
+import time
 import numpy as np
 import json
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterator, List, Optional, Set, Tuple
 
-from openrelife.config import db_path
+from openrelife import ann_index, events, vector_index
+from openrelife.config import args, db_path
+from openrelife.embedding_format import blob_format, decode_blob, encode_blob, storage_format
 
-# Define the structure of a database entry using namedtuple
-Entry = namedtuple("Entry", ["id", "app", "title", "text", "timestamp", "embedding", "words_coords", "ai_text", "ai_words_coords"])
+# Connection tuning applied to every connection; WAL lets readers proceed while the recorder writes
+_PRAGMAS: Tuple[str, ...] = (
+    # Lets deletions shrink the file (see reclaim_free_pages); only applies to a new, empty database,
+    # so it must precede journal_mode, which writes the header
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # Durable across app crashes; only an OS crash can lose the last commits
+    "PRAGMA cache_size=-32000",  # 32 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+# Prepared statements kept per connection (sqlite3's statement cache)
+_STATEMENT_CACHE_SIZE: int = 256
+# Free pages returned to the file system per incremental_vacuum step (4 MB with 4 KB pages)
+VACUUM_STEP_PAGES: int = 1024
+# Entries re-encoded per transaction by migrate_embeddings, and the pause after each batch
+EMBEDDING_MIGRATION_BATCH_SIZE: int = 2000
+EMBEDDING_MIGRATION_PAUSE: float = 0.05
+
+_local = threading.local()
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns this thread's connection to the database, opening it on first use.
+
+    Each thread (recorder, waitress workers) keeps one long-lived connection,
+    so prepared statements are reused across calls. Use it as a context
+    manager to commit on success and roll back on error; it is not closed.
+    A new connection is opened if `db_path` has changed since.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == db_path:
+        return conn
+    if conn is not None:
+        conn.close()
+    conn = sqlite3.connect(db_path, cached_statements=_STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row  # Rows support both index and column-name access
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    _local.conn = conn
+    _local.path = db_path
+    return conn
+
+
+def close_connection() -> None:
+    """Closes this thread's connection, if any (e.g. on shutdown or in tests)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+# Columns of the `entries` table that can be projected into an Entry
+ENTRY_COLUMNS: Tuple[str, ...] = (
+    "id", "app", "title", "text", "timestamp", "embedding", "words_coords", "ai_text", "ai_words_coords"
+)
+# Everything the UI shows for a frame; skips the embedding blob
+METADATA_COLUMNS: Tuple[str, ...] = tuple(c for c in ENTRY_COLUMNS if c != "embedding")
+
+
+def _decode_coords(value: Any) -> List:
+    """Parses a stored words_coords JSON string, returning [] when empty or invalid."""
+    if not isinstance(value, str):
+        return value if value is not None else []
+    try:
+        return json.loads(value or "[]")
+    except (json.JSONDecodeError, TypeError):
+        return []
+
+
+class Entry:
+    """
+    A row of the `entries` table.
+
+    Only the columns a query selected are populated; the others are None. The
+    embedding blob and the word coordinate JSON are kept in their stored form
+    and decoded on first access, so callers only pay for what they read.
+    """
+
+    __slots__ = ("id", "app", "title", "text", "timestamp", "ai_text", "_embedding", "_words_coords", "_ai_words_coords")
+
+    def __init__(
+        self,
+        id: Optional[int] = None,
+        app: Optional[str] = None,
+        title: Optional[str] = None,
+        text: Optional[str] = None,
+        timestamp: Optional[int] = None,
+        embedding: Any = None,
+        words_coords: Any = None,
+        ai_text: Optional[str] = None,
+        ai_words_coords: Any = None,
+    ):
+        self.id = id
+        self.app = app
+        self.title = title
+        self.text = text
+        self.timestamp = timestamp
+        self.ai_text = ai_text
+        self._embedding = embedding
+        self._words_coords = words_coords
+        self._ai_words_coords = ai_words_coords
+
+    @property
+    def embedding(self) -> Optional[np.ndarray]:
+        if isinstance(self._embedding, (bytes, memoryview)):
+            # Deserialize the embedding blob back into a NumPy array
+            self._embedding = decode_blob(self._embedding)
+        return self._embedding
+
+    @property
+    def words_coords(self) -> List:
+        if not isinstance(self._words_coords, list):
+            self._words_coords = _decode_coords(self._words_coords)
+        return self._words_coords
+
+    @property
+    def ai_words_coords(self) -> List:
+        if not isinstance(self._ai_words_coords, list):
+            self._ai_words_coords = _decode_coords(self._ai_words_coords)
+        return self._ai_words_coords
+
+    def __repr__(self) -> str:
+        return f"Entry(id={self.id!r}, timestamp={self.timestamp!r}, app={self.app!r}, title={self.title!r})"
+
+
+def _select_columns(columns: Tuple[str, ...]) -> str:
+    """Validates a column projection and returns it as a SELECT list."""
+    unknown = set(columns) - set(ENTRY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown entry columns: {sorted(unknown)}")
+    return ", ".join(columns)
+
+
+def _row_to_entry(row: sqlite3.Row) -> Entry:
+    """Builds an Entry from a (possibly projected) `entries` row without decoding anything."""
+    return Entry(**{key: row[key] for key in row.keys()})
 
 
 def create_db() -> None:
@@ -18,7 +158,7 @@ def create_db() -> None:
     window title, extracted text, timestamp, and text embedding.
     """
     try:
-        with sqlite3.connect(db_path) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """CREATE TABLE IF NOT EXISTS entries (
@@ -48,30 +188,338 @@ def create_db() -> None:
             if "ai_words_coords" not in columns:
                 cursor.execute("ALTER TABLE entries ADD COLUMN ai_words_coords TEXT")
             
+            _create_fts(cursor)
+            _local.fts_conn = None  # Look the FTS table up again (see _fts_trigram)
+            _create_activity_rollup(cursor)
+            _create_frame_segments(cursor)
+            
             conn.commit()
     except sqlite3.Error as e:
         print(f"Database error during table creation: {e}")
 
 
-def get_all_entries(limit: int = None, min_timestamp: int = 0) -> List[Entry]:
+def _create_fts(cursor: sqlite3.Cursor) -> None:
+    """
+    Creates the FTS5 index over `entries.text` and `entries.ai_text` and its sync triggers.
+
+    The trigram tokenizer is preferred because it matches arbitrary substrings,
+    like the keyword boost does; older SQLite builds fall back to unicode61.
+    Existing rows are indexed the first time the table is created.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entries_fts'")
+    if cursor.fetchone():
+        return
+    for tokenizer in ("trigram", "unicode61 remove_diacritics 2"):
+        try:
+            cursor.execute(
+                f"""CREATE VIRTUAL TABLE entries_fts USING fts5(
+                       text, ai_text, content='entries', content_rowid='id', tokenize='{tokenizer}'
+                   )"""
+            )
+            break
+        except sqlite3.OperationalError:
+            continue
+    else:
+        print("SQLite FTS5 is not available; keyword search will scan the entries table.")
+        return
+
+    cursor.executescript(
+        """CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+               INSERT INTO entries_fts(rowid, text, ai_text) VALUES (new.id, new.text, new.ai_text);
+           END;
+           CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+               INSERT INTO entries_fts(entries_fts, rowid, text, ai_text)
+               VALUES ('delete', old.id, old.text, old.ai_text);
+           END;
+           CREATE TRIGGER IF NOT EXISTS entries_fts_update AFTER UPDATE OF text, ai_text ON entries BEGIN
+               INSERT INTO entries_fts(entries_fts, rowid, text, ai_text)
+               VALUES ('delete', old.id, old.text, old.ai_text);
+               INSERT INTO entries_fts(rowid, text, ai_text) VALUES (new.id, new.text, new.ai_text);
+           END;"""
+    )
+    cursor.execute("INSERT INTO entries_fts(entries_fts) VALUES ('rebuild')")
+
+
+# Rollup tables kept by triggers: table -> strftime format of its period (local time)
+_ROLLUP_PERIODS = {"activity_days": "%Y-%m-%d", "activity_hours": "%Y-%m-%d %H:00"}
+
+
+def _local_offset_sql(row: str) -> str:
+    """The current UTC offset, in seconds, of the local time zone at the row's timestamp."""
+    seconds = f"{row}.timestamp / 1000000"
+    return f"(CAST(strftime('%s', {seconds}, 'unixepoch', 'localtime') AS INTEGER) - {seconds})"
+
+
+def _offset_sql(row: str) -> str:
+    """The UTC offset the row's periods were assigned with (see _create_activity_rollup)."""
+    return (
+        f"(SELECT utc_offset FROM activity_offsets WHERE since <= {row}.timestamp "
+        f"ORDER BY since DESC LIMIT 1)"
+    )
+
+
+def _period_sql(table: str, row: str) -> str:
+    return f"strftime('{_ROLLUP_PERIODS[table]}', {row}.timestamp / 1000000 + {_offset_sql(row)}, 'unixepoch')"
+
+
+def _create_activity_offsets_trigger(cursor: sqlite3.Cursor) -> None:
+    """(Re)creates the trigger recording the UTC offset of each new frame in `activity_offsets`.
+
+    It runs before the rollup triggers, which read the offset it records, and
+    skips frames whose timestamp is already stored: those inserts are ignored.
+    """
+    offset = _local_offset_sql("new")
+    cursor.executescript(
+        f"""DROP TRIGGER IF EXISTS activity_offsets_insert;
+           CREATE TRIGGER activity_offsets_insert BEFORE INSERT ON entries
+           WHEN NOT EXISTS (SELECT 1 FROM entries WHERE timestamp = new.timestamp) BEGIN
+               -- A frame inserted before newer ones must not change the offset of those
+               INSERT OR IGNORE INTO activity_offsets (since, utc_offset)
+                   SELECT new.timestamp + 1, {_offset_sql("new")}
+                   WHERE {offset} IS NOT {_offset_sql("new")}
+                     AND EXISTS (SELECT 1 FROM entries WHERE timestamp > new.timestamp);
+               INSERT OR REPLACE INTO activity_offsets (since, utc_offset)
+                   SELECT new.timestamp, {offset} WHERE {offset} IS NOT {_offset_sql("new")};
+           END;"""
+    )
+
+
+def _create_activity_rollup(cursor: sqlite3.Cursor) -> None:
+    """
+    Creates the per-day and per-hour activity rollups and the triggers that maintain them.
+
+    `activity_days` and `activity_hours` hold, per local period, the first and
+    last timestamp and the number of frames; `activity_day_apps` counts the
+    frames of each app per day. Inserts and deletes on `entries` update them
+    in the same transaction, so the calendar costs O(days) instead of a scan
+    of every frame. Existing rows are rolled up the first time they are created.
+
+    A frame's periods are in the local time of when it was recorded.
+    `activity_offsets` keeps the UTC offset in effect from each timestamp on
+    (a row per time zone or DST change), so a deletion finds the periods its
+    frame was counted in even after the time zone has changed.
+    """
+    cursor.execute(
+        """SELECT COUNT(*) FROM sqlite_master
+           WHERE type = 'table' AND name IN ('activity_offsets', 'activity_day_apps')"""
+    )
+    if cursor.fetchone()[0] == 2:
+        # Earlier versions of the trigger also ran for inserts ignored as duplicates
+        _create_activity_offsets_trigger(cursor)
+        return
+    # Rollups of earlier versions used the time zone of the moment of each change; rebuild them
+    for table in (*_ROLLUP_PERIODS, "activity_day_apps"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_insert")
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_delete")
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute("DROP TABLE IF EXISTS activity_offsets")
+
+    cursor.executescript(
+        f"""CREATE TABLE activity_offsets (
+               since INTEGER PRIMARY KEY,
+               utc_offset INTEGER NOT NULL
+           );
+           INSERT INTO activity_offsets (since, utc_offset)
+               SELECT timestamp, utc_offset FROM (
+                   SELECT timestamp, utc_offset, LAG(utc_offset) OVER (ORDER BY timestamp) AS previous
+                   FROM (SELECT timestamp, {_local_offset_sql("entries")} AS utc_offset FROM entries)
+               ) WHERE previous IS NOT utc_offset;"""
+    )
+    _create_activity_offsets_trigger(cursor)
+
+    statements = []
+    for table in _ROLLUP_PERIODS:
+        new_period, old_period = _period_sql(table, "new"), _period_sql(table, "old")
+        statements.append(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                   period TEXT PRIMARY KEY,
+                   first_timestamp INTEGER,
+                   last_timestamp INTEGER,
+                   frames INTEGER
+               );
+               CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON entries BEGIN
+                   INSERT INTO {table} (period, first_timestamp, last_timestamp, frames)
+                   VALUES ({new_period}, new.timestamp, new.timestamp, 1)
+                   ON CONFLICT(period) DO UPDATE SET
+                       first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+                       last_timestamp = MAX(last_timestamp, excluded.last_timestamp),
+                       frames = frames + 1;
+               END;
+               CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON entries BEGIN
+                   -- A period's frames all lie between its first and last timestamp,
+                   -- so a deleted bound is replaced through an index range lookup
+                   UPDATE {table} SET
+                       frames = frames - 1,
+                       first_timestamp = CASE WHEN first_timestamp = old.timestamp THEN
+                           (SELECT MIN(timestamp) FROM entries
+                            WHERE timestamp > old.timestamp AND timestamp <= {table}.last_timestamp)
+                           ELSE first_timestamp END,
+                       last_timestamp = CASE WHEN last_timestamp = old.timestamp THEN
+                           (SELECT MAX(timestamp) FROM entries
+                            WHERE timestamp < old.timestamp AND timestamp >= {table}.first_timestamp)
+                           ELSE last_timestamp END
+                   WHERE period = {old_period};
+                   DELETE FROM {table} WHERE period = {old_period} AND frames <= 0;
+               END;
+               INSERT INTO {table} (period, first_timestamp, last_timestamp, frames)
+                   SELECT {_period_sql(table, "entries")} AS p, MIN(timestamp), MAX(timestamp), COUNT(*)
+                   FROM entries GROUP BY p;"""
+        )
+
+    new_day, old_day = _period_sql("activity_days", "new"), _period_sql("activity_days", "old")
+    statements.append(
+        f"""CREATE TABLE IF NOT EXISTS activity_day_apps (
+               period TEXT,
+               app TEXT,
+               frames INTEGER,
+               PRIMARY KEY (period, app)
+           );
+           CREATE TRIGGER IF NOT EXISTS activity_day_apps_insert AFTER INSERT ON entries BEGIN
+               INSERT INTO activity_day_apps (period, app, frames)
+               VALUES ({new_day}, COALESCE(new.app, ''), 1)
+               ON CONFLICT(period, app) DO UPDATE SET frames = frames + 1;
+           END;
+           CREATE TRIGGER IF NOT EXISTS activity_day_apps_delete AFTER DELETE ON entries BEGIN
+               UPDATE activity_day_apps SET frames = frames - 1
+               WHERE period = {old_day} AND app = COALESCE(old.app, '');
+               DELETE FROM activity_day_apps
+               WHERE period = {old_day} AND app = COALESCE(old.app, '') AND frames <= 0;
+           END;
+           INSERT INTO activity_day_apps (period, app, frames)
+               SELECT {_period_sql("activity_days", "entries")} AS p, COALESCE(app, ''), COUNT(*)
+               FROM entries GROUP BY p, COALESCE(app, '');"""
+    )
+    for statement in statements:
+        cursor.executescript(statement)
+
+
+def _create_frame_segments(cursor: sqlite3.Cursor) -> None:
+    """
+    Creates the offset index of the screenshots packed into segment files (see segments.py).
+
+    A delta frame stores the offset and length of its keyframe, which is
+    always in the same segment, so it stays readable if the keyframe's own
+    row is deleted.
+    """
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS frame_segments (
+               timestamp INTEGER PRIMARY KEY,
+               segment TEXT NOT NULL,
+               offset INTEGER NOT NULL,
+               length INTEGER NOT NULL,
+               base_offset INTEGER,
+               base_length INTEGER
+           )"""
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_frame_segments_segment ON frame_segments (segment)"
+    )
+
+
+def insert_frame_segment(
+    timestamp: int,
+    segment: str,
+    offset: int,
+    length: int,
+    base_offset: Optional[int] = None,
+    base_length: Optional[int] = None,
+) -> None:
+    """Records where a packed screenshot is stored; base_* locate the keyframe of a delta frame."""
+    try:
+        with get_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO frame_segments VALUES (?, ?, ?, ?, ?, ?)",
+                (timestamp, segment, offset, length, base_offset, base_length),
+            )
+    except sqlite3.Error as e:
+        print(f"Database error during frame segment insertion: {e}")
+
+
+def get_frame_segment(timestamp: int) -> Optional[sqlite3.Row]:
+    """Returns the (segment, offset, length, base_offset, base_length) row of a packed screenshot."""
+    try:
+        with get_connection() as conn:
+            return conn.execute(
+                "SELECT segment, offset, length, base_offset, base_length "
+                "FROM frame_segments WHERE timestamp = ?",
+                (timestamp,),
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Database error during frame segment retrieval: {e}")
+    return None
+
+
+def delete_frame_segments(timestamps: List[int]) -> List[sqlite3.Row]:
+    """
+    Removes packed screenshots from the index.
+
+    Returns:
+        List[sqlite3.Row]: The (segment, offset, length, base_offset, base_length) of every removed frame.
+    """
+    removed: List[sqlite3.Row] = []
+    try:
+        with get_connection() as conn:
+            for start in range(0, len(timestamps), 500):
+                chunk = list(timestamps[start:start + 500])
+                placeholders = ','.join('?' * len(chunk))
+                removed.extend(
+                    conn.execute(
+                        "SELECT segment, offset, length, base_offset, base_length "
+                        f"FROM frame_segments WHERE timestamp IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                )
+                conn.execute(f"DELETE FROM frame_segments WHERE timestamp IN ({placeholders})", chunk)
+    except sqlite3.Error as e:
+        print(f"Database error during frame segment deletion: {e}")
+        return []
+    return removed
+
+
+def get_segment_offsets(segment: str) -> Set[int]:
+    """Returns the offsets of a segment's records still in use, as a frame or as a keyframe."""
+    try:
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT offset, base_offset FROM frame_segments WHERE segment = ?", (segment,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error during frame segment retrieval: {e}")
+        # Unknown: report the segment as in use so nothing is erased
+        return {-1}
+    return {row[0] for row in rows} | {row[1] for row in rows if row[1] is not None}
+
+
+def get_all_entries(
+    limit: int = None,
+    min_timestamp: int = 0,
+    columns: Tuple[str, ...] = ENTRY_COLUMNS,
+    max_timestamp: Optional[int] = None,
+) -> List[Entry]:
     """
     Retrieves entries from the database.
 
     Args:
         limit (int, optional): Maximum number of entries to return. Defaults to None (all).
         min_timestamp (int, optional): Only return entries newer than this timestamp. Defaults to 0.
+        max_timestamp (int, optional): Only return entries older than this timestamp. Defaults to None.
+        columns (Tuple[str, ...], optional): Columns to load. Defaults to all of them.
 
     Returns:
-        List[Entry]: A list of entries as Entry namedtuples.
+        List[Entry]: A list of entries, newest first.
     """
+    select = _select_columns(columns)
     entries: List[Entry] = []
     try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Return rows as dictionary-like objects
+        with get_connection() as conn:
             cursor = conn.cursor()
             
-            query = "SELECT id, app, title, text, timestamp, embedding, words_coords, ai_text, ai_words_coords FROM entries WHERE timestamp > ? ORDER BY timestamp DESC"
+            query = f"SELECT {select} FROM entries WHERE timestamp > ?"
             params = [min_timestamp]
+            if max_timestamp is not None:
+                query += " AND timestamp < ?"
+                params.append(max_timestamp)
+            query += " ORDER BY timestamp DESC"
             
             if limit:
                 query += " LIMIT ?"
@@ -79,34 +527,7 @@ def get_all_entries(limit: int = None, min_timestamp: int = 0) -> List[Entry]:
             
             cursor.execute(query, tuple(params))
             results = cursor.fetchall()
-            for row in results:
-                # Deserialize the embedding blob back into a NumPy array
-                embedding = np.frombuffer(row["embedding"], dtype=np.float32)
-                words_coords_str = row["words_coords"] if row["words_coords"] else "[]"
-                try:
-                    words_coords = json.loads(words_coords_str)
-                except (json.JSONDecodeError, TypeError):
-                    words_coords = []
-                
-                ai_words_coords_str = row["ai_words_coords"] if row["ai_words_coords"] else "[]"
-                try:
-                    ai_words_coords = json.loads(ai_words_coords_str)
-                except (json.JSONDecodeError, TypeError):
-                    ai_words_coords = []
-                    
-                entries.append(
-                    Entry(
-                        id=row["id"],
-                        app=row["app"],
-                        title=row["title"],
-                        text=row["text"],
-                        timestamp=row["timestamp"],
-                        embedding=embedding,
-                        words_coords=words_coords,
-                        ai_text=row["ai_text"],
-                        ai_words_coords=ai_words_coords,
-                    )
-                )
+            entries = [_row_to_entry(row) for row in results]
     except sqlite3.Error as e:
         print(f"Database error while fetching all entries: {e}")
     return entries
@@ -122,7 +543,7 @@ def get_timestamps() -> List[int]:
     """
     timestamps: List[int] = []
     try:
-        with sqlite3.connect(db_path) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             # Use the index for potentially faster retrieval
             cursor.execute("SELECT timestamp FROM entries ORDER BY timestamp DESC")
@@ -133,6 +554,106 @@ def get_timestamps() -> List[int]:
     return timestamps
 
 
+def get_timestamps_page(
+    before: Optional[int] = None, after: Optional[int] = None, limit: int = 1000
+) -> List[int]:
+    """
+    Retrieves one page of timestamps, ordered descending (keyset pagination).
+
+    With `before`, returns the `limit` newest timestamps older than it; with
+    only `after`, the `limit` timestamps immediately newer than it; with both,
+    the newest `limit` of the range in between; with neither, the newest ones.
+    Each page is one range scan of the timestamp index, however deep it is.
+
+    Args:
+        before (Optional[int]): Exclusive upper bound.
+        after (Optional[int]): Exclusive lower bound.
+        limit (int): Maximum number of timestamps returned.
+
+    Returns:
+        List[int]: The timestamps, newest first.
+                   Returns an empty list if an error occurs.
+    """
+    conditions = []
+    params: List[Any] = []
+    if before is not None:
+        conditions.append("timestamp < ?")
+        params.append(before)
+    if after is not None:
+        conditions.append("timestamp > ?")
+        params.append(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Paging forward from `after` reads upwards from it, then returns the page newest first
+    order = "ASC" if after is not None and before is None else "DESC"
+    timestamps: List[int] = []
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT timestamp FROM entries {where} ORDER BY timestamp {order} LIMIT ?",
+                (*params, limit),
+            )
+            timestamps = [row[0] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database error while fetching timestamps page: {e}")
+    if order == "ASC":
+        timestamps.reverse()
+    return timestamps
+
+
+def get_timeline_summary(granularity: str = "day", top_apps: int = 3) -> List[dict]:
+    """
+    Reads the activity rollup: entry counts per local day or hour.
+
+    Args:
+        granularity (str): 'day' or 'hour'.
+        top_apps (int): For days, how many of the most recorded apps to include.
+
+    Returns:
+        List[dict]: One {'period', 'count', 'first', 'last'} dict per period
+                    with entries, newest first. 'period' is 'YYYY-MM-DD' or
+                    'YYYY-MM-DD HH:00'; 'first' and 'last' are its oldest and
+                    newest timestamps. Days also have 'apps', a list of
+                    {'app', 'count'} dicts, most frames first.
+                    Returns an empty list if an error occurs.
+
+    Raises:
+        ValueError: If `granularity` is not 'day' or 'hour'.
+    """
+    tables = {"day": "activity_days", "hour": "activity_hours"}
+    if granularity not in tables:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    summary: List[dict] = []
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT period, frames, first_timestamp, last_timestamp
+                    FROM {tables[granularity]} ORDER BY period DESC"""
+            )
+            summary = [
+                {'period': period, 'count': count, 'first': first, 'last': last}
+                for period, count, first, last in cursor.fetchall()
+            ]
+            if granularity == "day" and top_apps > 0:
+                apps: dict = {}
+                cursor.execute(
+                    """SELECT period, app, frames FROM (
+                           SELECT period, app, frames,
+                                  ROW_NUMBER() OVER (PARTITION BY period ORDER BY frames DESC, app) AS rank
+                           FROM activity_day_apps
+                       ) WHERE rank <= ? ORDER BY period, rank""",
+                    (top_apps,),
+                )
+                for period, app, count in cursor.fetchall():
+                    apps.setdefault(period, []).append({'app': app, 'count': count})
+                for day in summary:
+                    day['apps'] = apps.get(day['period'], [])
+    except sqlite3.Error as e:
+        print(f"Database error while summarizing the timeline: {e}")
+    return summary
+
+
 def update_ai_ocr(timestamp: int, ai_text: str, ai_words_coords: List) -> bool:
     """
     Updates AI OCR data for an existing entry.
@@ -147,7 +668,7 @@ def update_ai_ocr(timestamp: int, ai_text: str, ai_words_coords: List) -> bool:
     """
     ai_words_coords_json: str = json.dumps(ai_words_coords) if ai_words_coords else "[]"
     try:
-        with sqlite3.connect(db_path) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """UPDATE entries 
@@ -180,11 +701,11 @@ def insert_entry(
         Optional[int]: The ID of the newly inserted row, or None if insertion fails.
                        Prints an error message to stderr on failure.
     """
-    embedding_bytes: bytes = embedding.astype(np.float32).tobytes() # Ensure consistent dtype
+    embedding_bytes: bytes = encode_blob(embedding, args.embedding_format)
     words_coords_json: str = json.dumps(words_coords) if words_coords else "[]"
     last_row_id: Optional[int] = None
     try:
-        with sqlite3.connect(db_path) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """INSERT INTO entries (text, timestamp, embedding, app, title, words_coords)
@@ -195,6 +716,9 @@ def insert_entry(
             conn.commit()
             if cursor.rowcount > 0: # Check if insert actually happened
                 last_row_id = cursor.lastrowid
+                vector_index.on_entry_inserted(timestamp, embedding)
+                ann_index.on_entry_inserted(timestamp, embedding)
+                events.on_entries_inserted([events.entry_metadata(last_row_id, text, timestamp, words_coords)])
             # else:
                 # Optionally log that a duplicate timestamp was encountered
                 # print(f"Skipped inserting entry with duplicate timestamp: {timestamp}")
@@ -205,6 +729,76 @@ def insert_entry(
     return last_row_id
 
 
+def insert_entries(entries: List[Tuple[str, int, np.ndarray, str, str, List]]) -> int:
+    """
+    Inserts several entries in a single transaction.
+
+    One commit (and so one WAL sync) covers the whole batch, which is how the
+    recorder stores the frames of a tick. Entries whose timestamp already
+    exists, in the table or earlier in the batch, are skipped.
+
+    Args:
+        entries (List[Tuple]): (text, timestamp, embedding, app, title, words_coords)
+            tuples, in the order of `insert_entry`'s arguments.
+
+    Returns:
+        int: Number of inserted entries (0 if the transaction failed).
+             Prints an error message to stderr on failure.
+    """
+    if not entries:
+        return 0
+    rows = {}
+    embeddings = {}
+    coords = {}
+    for text, timestamp, embedding, app, title, words_coords in entries:
+        if timestamp in rows:
+            continue
+        embeddings[timestamp] = embedding
+        coords[timestamp] = words_coords
+        rows[timestamp] = (
+            text,
+            timestamp,
+            encode_blob(embedding, args.embedding_format),
+            app,
+            title,
+            json.dumps(words_coords) if words_coords else "[]",
+        )
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            existing = set()
+            timestamps = list(rows)
+            for start in range(0, len(timestamps), 500):
+                chunk = timestamps[start : start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"SELECT timestamp FROM entries WHERE timestamp IN ({placeholders})", chunk)
+                existing.update(row[0] for row in cursor.fetchall())
+            new_rows = [row for ts, row in rows.items() if ts not in existing]
+            cursor.executemany(
+                """INSERT INTO entries (text, timestamp, embedding, app, title, words_coords)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(timestamp) DO NOTHING""",
+                new_rows,
+            )
+            ids = {}
+            for start in range(0, len(new_rows), 500):
+                chunk = [row[1] for row in new_rows[start : start + 500]]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"SELECT timestamp, id FROM entries WHERE timestamp IN ({placeholders})", chunk)
+                ids.update(cursor.fetchall())
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error during batch insertion: {e}")
+        return 0
+    inserted = []
+    for text, timestamp, _, _, _, _ in new_rows:
+        vector_index.on_entry_inserted(timestamp, embeddings[timestamp])
+        ann_index.on_entry_inserted(timestamp, embeddings[timestamp])
+        inserted.append(events.entry_metadata(ids.get(timestamp), text, timestamp, coords[timestamp]))
+    events.on_entries_inserted(inserted)
+    return len(new_rows)
+
+
 def delete_entries(timestamps: List[int]) -> int:
     """
     Deletes entries with the specified timestamps from the database.
@@ -217,64 +811,311 @@ def delete_entries(timestamps: List[int]) -> int:
     """
     deleted_count = 0
     try:
-        with sqlite3.connect(db_path) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             placeholders = ','.join('?' * len(timestamps))
             sql = f"DELETE FROM entries WHERE timestamp IN ({placeholders})"
             cursor.execute(sql, timestamps)
             conn.commit()
             deleted_count = cursor.rowcount
+        vector_index.on_entries_deleted(timestamps)
+        ann_index.on_entries_deleted(timestamps)
     except sqlite3.Error as e:
         print(f"Database error during deletion: {e}")
     return deleted_count
 
 
+def get_expired_timestamps(before: int, limit: int) -> List[int]:
+    """
+    Returns the oldest entry timestamps earlier than `before`, ascending.
+
+    Args:
+        before (int): Exclusive upper bound, in microseconds.
+        limit (int): Maximum number of timestamps.
+
+    Returns:
+        List[int]: The timestamps, oldest first.
+    """
+    try:
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT timestamp FROM entries WHERE timestamp < ? ORDER BY timestamp ASC LIMIT ?",
+                (before, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+    except sqlite3.Error as e:
+        print(f"Database error during expired entry retrieval: {e}")
+        return []
+
+
+def enable_incremental_vacuum() -> bool:
+    """
+    Switches a database created without auto_vacuum to incremental auto_vacuum.
+
+    This rebuilds the whole file once (VACUUM), which blocks every other
+    writer meanwhile, so it runs on the retention worker rather than at
+    startup. Until it has, `reclaim_free_pages` does nothing. Databases
+    created since incremental vacuum was introduced already use it.
+
+    Returns:
+        bool: True if the database was rebuilt.
+    """
+    try:
+        conn = get_connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error during vacuum: {e}")
+        return False
+
+
+def reclaim_free_pages(
+    step_pages: int = VACUUM_STEP_PAGES, pause: float = 0.0, stop: Optional[threading.Event] = None
+) -> int:
+    """
+    Returns the pages freed by deletions to the file system, a few at a time.
+
+    Each step is a short write transaction, so the recorder and the UI are
+    never blocked for long. Does nothing unless the database uses incremental
+    auto_vacuum. The WAL is truncated afterwards.
+
+    Args:
+        step_pages (int): Pages released per step.
+        pause (float): Seconds to wait between steps.
+        stop (Optional[threading.Event]): Stops early when set.
+
+    Returns:
+        int: The number of pages released.
+    """
+    released = 0
+    stop = stop or threading.Event()
+    try:
+        conn = get_connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        while True:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # executescript steps the pragma to completion; execute() would release a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({int(step_pages)});")
+            released += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if stop.wait(pause):
+                break
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error during vacuum: {e}")
+    return released
+
+
+def iter_embeddings() -> Iterator[Tuple[int, bytes]]:
+    """
+    Streams the raw embedding blob of every entry, ordered by timestamp ascending.
+
+    Used to build the in-memory search matrix without decoding any other column.
+
+    Yields:
+        Tuple[int, bytes]: (timestamp, embedding blob) pairs; see embedding_format.decode_blob.
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT timestamp, embedding FROM entries ORDER BY timestamp ASC")
+            for row in cursor:
+                yield row[0], row[1]
+    except sqlite3.Error as e:
+        print(f"Database error while fetching embeddings: {e}")
+
+
+def migrate_embeddings(
+    fmt: str, batch_size: int = EMBEDDING_MIGRATION_BATCH_SIZE, pause: float = EMBEDDING_MIGRATION_PAUSE
+) -> int:
+    """
+    Re-encodes the stored embeddings in the storage format of an --embedding-format.
+
+    Works in short transactions of `batch_size` entries, so it can run while
+    OpenReLife is recording; entries already in the format are left as they
+    are. The freed pages are then returned to the file system if the database
+    uses incremental vacuum. Converting to a more precise format keeps the
+    precision of the stored values.
+
+    Args:
+        fmt (str): The target --embedding-format.
+        batch_size (int): Entries read and rewritten per transaction.
+        pause (float): Seconds to wait after each batch.
+
+    Returns:
+        int: The number of entries re-encoded.
+    """
+    target = storage_format(fmt)
+    converted = 0
+    last_id = 0
+    try:
+        conn = get_connection()
+        while True:
+            rows = conn.execute(
+                "SELECT id, embedding FROM entries WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = [
+                (encode_blob(decode_blob(blob), target), row_id)
+                for row_id, blob in rows
+                if blob and blob_format(blob) != target
+            ]
+            if updates:
+                with conn:
+                    conn.executemany("UPDATE entries SET embedding = ? WHERE id = ?", updates)
+                converted += len(updates)
+                time.sleep(pause)
+    except sqlite3.Error as e:
+        print(f"Database error during embedding migration: {e}")
+    if converted:
+        reclaim_free_pages()
+    return converted
+
+
+def _fts_query(query: str, trigram: bool) -> str:
+    """
+    Builds an FTS5 MATCH expression that matches any word of `query`.
+
+    Each word is quoted so FTS5 operators in user input are taken literally.
+    Trigram tokens need at least 3 characters, so shorter words are dropped;
+    with word tokenizers each word is used as a prefix.
+    """
+    terms = []
+    for word in query.lower().split():
+        if trigram and len(word) < 3:
+            continue
+        quoted = '"' + word.replace('"', '""') + '"'
+        terms.append(quoted if trigram else quoted + "*")
+    return " OR ".join(terms)
+
 
+def _fts_trigram(conn: sqlite3.Connection) -> Optional[bool]:
+    """Whether the FTS index uses the trigram tokenizer, or None without FTS; looked up once per connection."""
+    if getattr(_local, "fts_conn", None) is not conn:
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'entries_fts'"
+        ).fetchone()
+        _local.fts_trigram = "trigram" in row[0] if row else None
+        _local.fts_conn = conn
+    return _local.fts_trigram
 
-def get_entry_by_timestamp(timestamp: int) -> Optional[Entry]:
+
+def search_text(query: str, limit: int) -> List[Tuple[int, str, str]]:
+    """
+    Finds the entries whose text or AI text contains any word of `query`.
+
+    Uses the FTS5 index ranked by BM25. Queries made only of words too short
+    for the index, or databases without FTS5, fall back to a LIKE scan of the
+    most recent entries.
+
+    Args:
+        query (str): The raw search query.
+        limit (int): Maximum number of candidates to return.
+
+    Returns:
+        List[Tuple[int, str, str]]: (timestamp, text, ai_text) of the candidates,
+                                    best match first. Missing texts are "".
+    """
+    words = query.lower().split()
+    if not words:
+        return []
+    rows = []
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            trigram = _fts_trigram(conn)
+            match = _fts_query(query, trigram) if trigram is not None else ""
+            if match:
+                cursor.execute(
+                    """SELECT e.timestamp, e.text, e.ai_text
+                       FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid
+                       WHERE entries_fts MATCH ?
+                       ORDER BY entries_fts.rank
+                       LIMIT ?""",
+                    (match, limit),
+                )
+            else:
+                conditions = " OR ".join(["text LIKE ? OR ai_text LIKE ?"] * len(words))
+                params = [f"%{word}%" for word in words for _ in range(2)]
+                cursor.execute(
+                    f"SELECT timestamp, text, ai_text FROM entries WHERE {conditions} "
+                    "ORDER BY timestamp DESC LIMIT ?",
+                    (*params, limit),
+                )
+            rows = [(row[0], row[1] or "", row[2] or "") for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database error during text search: {e}")
+    return rows
+
+
+def get_entries_by_timestamps(
+    timestamps: List[int], columns: Tuple[str, ...] = ENTRY_COLUMNS
+) -> List[Entry]:
+    """
+    Retrieves the entries with the given timestamps, in the order requested.
+
+    Args:
+        timestamps (List[int]): Timestamps to look up. Unknown ones are skipped.
+        columns (Tuple[str, ...], optional): Columns to load. Defaults to all of them.
+
+    Returns:
+        List[Entry]: The matching entries.
+    """
+    if not timestamps:
+        return []
+    # The timestamp is needed to restore the requested order
+    select = _select_columns(tuple(dict.fromkeys(("timestamp",) + tuple(columns))))
+    found = {}
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # Stay well below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds
+            for start in range(0, len(timestamps), 500):
+                chunk = list(timestamps[start:start + 500])
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(
+                    f"SELECT {select} FROM entries WHERE timestamp IN ({placeholders})",
+                    chunk,
+                )
+                for row in cursor.fetchall():
+                    found[row["timestamp"]] = _row_to_entry(row)
+    except sqlite3.Error as e:
+        print(f"Database error while fetching entries by timestamp: {e}")
+    return [found[ts] for ts in timestamps if ts in found]
+
+
+
+
+def get_entry_by_timestamp(
+    timestamp: int, columns: Tuple[str, ...] = ENTRY_COLUMNS
+) -> Optional[Entry]:
     """
     Retrieves a single entry by its timestamp.
 
     Args:
         timestamp (int): The timestamp of the entry to retrieve.
+        columns (Tuple[str, ...], optional): Columns to load. Defaults to all of them.
 
     Returns:
-        Optional[Entry]: The entry as an Entry namedtuple, or None if not found.
+        Optional[Entry]: The entry, or None if not found.
     """
+    select = _select_columns(columns)
     try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with get_connection() as conn:
             cursor = conn.cursor()
-            query = "SELECT id, app, title, text, timestamp, embedding, words_coords, ai_text, ai_words_coords FROM entries WHERE timestamp = ?"
+            query = f"SELECT {select} FROM entries WHERE timestamp = ?"
             cursor.execute(query, (timestamp,))
             row = cursor.fetchone()
             
             if row:
-                # Deserialize the embedding blob back into a NumPy array
-                embedding = np.frombuffer(row["embedding"], dtype=np.float32)
-                words_coords_str = row["words_coords"] if row["words_coords"] else "[]"
-                try:
-                    words_coords = json.loads(words_coords_str)
-                except (json.JSONDecodeError, TypeError):
-                    words_coords = []
-                
-                ai_words_coords_str = row["ai_words_coords"] if row["ai_words_coords"] else "[]"
-                try:
-                    ai_words_coords = json.loads(ai_words_coords_str)
-                except (json.JSONDecodeError, TypeError):
-                    ai_words_coords = []
-                    
-                return Entry(
-                    id=row["id"],
-                    app=row["app"],
-                    title=row["title"],
-                    text=row["text"],
-                    timestamp=row["timestamp"],
-                    embedding=embedding,
-                    words_coords=words_coords,
-                    ai_text=row["ai_text"],
-                    ai_words_coords=ai_words_coords
-                )
+                return _row_to_entry(row)
     except sqlite3.Error as e:
         print(f"Database error during entry retrieval: {e}")
     
@@ -0,0 +1,198 @@
+import inspect
+import logging
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Dict, List, Type
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Longest input of all-MiniLM-L6-v2 in tokens (its SentenceTransformer max_seq_length)
+MAX_SEQ_LENGTH: int = 256
+# Sentences per ONNX Runtime call; padding is to the longest sentence of a batch
+ONNX_BATCH_SIZE: int = 32
+# Opset of the exported graph, supported by every onnxruntime release since 1.11
+ONNX_OPSET: int = 14
+
+
+class EmbeddingBackend(ABC):
+    """Runs a sentence embedding model.
+
+    Every backend produces the sentence embeddings of the same
+    SentenceTransformer model, so vectors stored with one backend can be
+    searched with another; they differ only by the numerical error of the
+    quantization or conversion.
+    """
+
+    name: str = ""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def encode(self, sentences: List[str]) -> np.ndarray:
+        """Returns the embeddings of the sentences, as a float32 array of shape (len(sentences), dim)."""
+
+
+class TorchBackend(EmbeddingBackend):
+    """The SentenceTransformer model in PyTorch, as loaded by sentence-transformers."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, sentences: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(sentences, convert_to_numpy=True), dtype=np.float32)
+
+
+class Int8Backend(TorchBackend):
+    """The PyTorch model with its linear layers quantized to int8 (dynamic quantization, CPU only).
+
+    Weights are stored as int8 and activations quantized on the fly, which
+    makes the transformer layers about 4x smaller and faster on CPU.
+    """
+
+    name = "int8"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        import torch
+
+        self.model = torch.quantization.quantize_dynamic(
+            self.model.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+
+
+def export_onnx(model_name: str, folder: str) -> None:
+    """Exports a SentenceTransformer model to `folder`/model.onnx with its tokenizer.
+
+    The graph includes the mean pooling and normalization of the model, so
+    its output is the sentence embedding. Needs PyTorch and
+    sentence-transformers, but only once: the backend then loads the export.
+
+    Raises:
+        ValueError: If the model does not use mean pooling.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = next((module for module in model if isinstance(module, Pooling)), None)
+    # Newer sentence-transformers releases name the mode directly
+    mode = pooling and (getattr(pooling, "pooling_mode", None) or pooling.get_pooling_mode_str())
+    if mode != "mean":
+        raise ValueError(f"Only models with mean pooling can be exported, not {model_name}")
+    normalize = any(isinstance(module, Normalize) for module in model)
+
+    class SentenceEmbedding(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            tokens = self.transformer(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            )[0]
+            mask = attention_mask.unsqueeze(-1).to(tokens.dtype)
+            embedding = (tokens * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            if normalize:
+                embedding = torch.nn.functional.normalize(embedding, p=2, dim=1)
+            return embedding
+
+    partial = folder + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    sample = model.tokenizer(["an example sentence"], return_tensors="pt")
+    dynamic_axes = {0: "batch", 1: "sequence"}
+    # The TorchScript exporter: newer torch defaults to the dynamo one (which needs onnxscript),
+    # while releases before 2.5, such as the 2.2 pinned on Intel macOS, have no `dynamo` keyword
+    options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            SentenceEmbedding(model[0].auto_model).eval(),
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            os.path.join(partial, "model.onnx"),
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["sentence_embedding"],
+            dynamic_axes={
+                "input_ids": dynamic_axes,
+                "attention_mask": dynamic_axes,
+                "token_type_ids": dynamic_axes,
+                "sentence_embedding": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+            **options,
+        )
+    model.tokenizer.save_pretrained(partial)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(partial, folder)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """The model exported to ONNX and run by ONNX Runtime, without loading PyTorch.
+
+    The model is exported to `models_path` on first use, which needs PyTorch
+    once; after that only onnxruntime and tokenizers are imported.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, models_path: str):
+        super().__init__(model_name)
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        folder = os.path.join(models_path, f"{model_name}-onnx")
+        if not os.path.exists(os.path.join(folder, "model.onnx")):
+            logger.info(f"Exporting '{model_name}' to ONNX in {folder}...")
+            export_onnx(model_name, folder)
+        self.tokenizer = Tokenizer.from_file(os.path.join(folder, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(folder, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        dim = self.session.get_outputs()[0].shape[-1]
+        self.dim = dim if isinstance(dim, int) else 0
+
+    def encode(self, sentences: List[str]) -> np.ndarray:
+        if not sentences:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        batches = []
+        for start in range(0, len(sentences), ONNX_BATCH_SIZE):
+            encodings = self.tokenizer.encode_batch(sentences[start:start + ONNX_BATCH_SIZE])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            batches.append(self.session.run(None, feeds)[0].astype(np.float32, copy=False))
+        return np.concatenate(batches)
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    backend.name: backend for backend in (TorchBackend, Int8Backend, OnnxBackend)
+}
+
+
+def create_backend(name: str, model_name: str, models_path: str) -> EmbeddingBackend:
+    """Loads `model_name` with the backend called `name` (see --embedding-backend).
+
+    Raises:
+        ValueError: If there is no backend of that name.
+        ImportError: If the packages the backend needs are not installed.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {name}")
+    if name == OnnxBackend.name:
+        return OnnxBackend(model_name, models_path)
+    return BACKENDS[name](model_name)
@@ -0,0 +1,211 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+import numpy as np
+
+
+class _Flight:
+    """A computation in progress, awaited by the threads that asked for the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache:
+    """Thread-safe LRU cache whose misses are computed once, however many threads ask at once.
+
+    The first thread to miss on a key computes the value; threads asking for
+    the same key meanwhile wait for that result (or its exception) instead of
+    computing it again.
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._pending: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Misses served by another thread's computation
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            flight = self._pending.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._pending[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._items[key] = flight.value
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+            return flight.value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            flight.done.set()
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+            }
+
+
+# Lines whose embeddings are kept on disk (about 1.6 KB each with 384 float32 dimensions)
+LINE_CACHE_MAX_LINES: int = 50000
+# Inserts between two checks of the size bound; eviction then goes down to 90% of it
+LINE_CACHE_EVICT_EVERY: int = 1000
+
+
+class LineEmbeddingCache:
+    """Persistent, content-addressed cache of line -> embedding, bounded with LRU eviction.
+
+    Lines are keyed by a hash of the model name and the text, so the text
+    itself is not stored and a model change never returns stale vectors.
+    Recency is a counter bumped on every lookup batch; when the cache grows
+    past `max_lines`, the least recently used lines are evicted.
+    """
+
+    def __init__(self, path: str, model_name: str, max_lines: int = LINE_CACHE_MAX_LINES):
+        self.path = path
+        self.model_name = model_name
+        self.max_lines = max_lines
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._clock = 0
+        self._inserts = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS line_embeddings (
+                       key BLOB PRIMARY KEY,
+                       embedding BLOB NOT NULL,
+                       last_used INTEGER NOT NULL
+                   ) WITHOUT ROWID"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_line_embeddings_last_used ON line_embeddings (last_used)"
+            )
+            self._clock = conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM line_embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _key(self, line: str) -> bytes:
+        return hashlib.blake2b(f"{self.model_name}\0{line}".encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, lines: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Returns the cached embeddings of the given lines; lines not cached are left out."""
+        keys = {self._key(line): line for line in set(lines)}
+        found: Dict[str, np.ndarray] = {}
+        try:
+            with self._lock:
+                conn = self._connection()
+                self._clock += 1
+                key_list = list(keys)
+                with conn:
+                    for start in range(0, len(key_list), 500):
+                        chunk = key_list[start:start + 500]
+                        placeholders = ",".join("?" * len(chunk))
+                        for key, blob in conn.execute(
+                            f"SELECT key, embedding FROM line_embeddings WHERE key IN ({placeholders})", chunk
+                        ):
+                            found[keys[key]] = np.frombuffer(blob, dtype=np.float32)
+                        conn.execute(
+                            f"UPDATE line_embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                            (self._clock, *chunk),
+                        )
+                self.hits += len(found)
+                self.misses += len(keys) - len(found)
+        except sqlite3.Error as e:
+            print(f"Database error during line cache lookup: {e}")
+        return found
+
+    def put_many(self, embeddings: Dict[str, np.ndarray]) -> None:
+        """Stores newly computed line embeddings, evicting the least recently used lines if needed."""
+        rows = [
+            (self._key(line), np.asarray(vector, dtype=np.float32).tobytes())
+            for line, vector in embeddings.items()
+        ]
+        try:
+            with self._lock:
+                conn = self._connection()
+                self._clock += 1
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO line_embeddings VALUES (?, ?, ?)",
+                        [(key, blob, self._clock) for key, blob in rows],
+                    )
+                self._inserts += len(rows)
+                if self._inserts >= LINE_CACHE_EVICT_EVERY:
+                    self._inserts = 0
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Database error during line cache insertion: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        count = conn.execute("SELECT COUNT(*) FROM line_embeddings").fetchone()[0]
+        if count <= self.max_lines:
+            return
+        with conn:
+            conn.execute(
+                "DELETE FROM line_embeddings WHERE key IN "
+                "(SELECT key FROM line_embeddings ORDER BY last_used ASC LIMIT ?)",
+                (count - int(self.max_lines * 0.9),),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM line_embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,160 @@
+import math
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Formats of --embedding-format. `binary` keeps only sign bits in memory for a first
+# search pass; its vectors are stored as int8 for the re-ranking of the best candidates.
+EMBEDDING_FORMATS: Tuple[str, ...] = ("float32", "float16", "int8", "binary")
+
+# Blob header of the compact formats: format tag and dimension. Plain float32 blobs
+# (every blob written before compact formats existed) have no header; compact blobs are
+# told apart by a length that is never a multiple of 4.
+_HEADER = struct.Struct("<BH")
+_TAGS = {"float16": 1, "int8": 2}
+_FORMATS = {tag: name for name, tag in _TAGS.items()}
+# Largest int8 code; a vector is scaled so that its largest component maps to it
+_INT8_MAX: float = 127.0
+
+
+def storage_format(fmt: str) -> str:
+    """The format of the database blobs for an --embedding-format."""
+    return "int8" if fmt == "binary" else fmt
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantizes rows to int8 codes with one float32 scale per row (row ~= codes * scale)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / _INT8_MAX
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def encode_blob(embedding: np.ndarray, fmt: str) -> bytes:
+    """Serializes an embedding for the `entries.embedding` column.
+
+    Args:
+        embedding: The embedding vector.
+        fmt: An --embedding-format.
+
+    Returns:
+        The blob: raw float32 values, or a header followed by float16 values
+        or by a float32 scale and int8 codes.
+    """
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    fmt = storage_format(fmt)
+    if fmt == "float32":
+        return vector.tobytes()
+    header = _HEADER.pack(_TAGS[fmt], vector.shape[0])
+    if fmt == "float16":
+        return header + vector.astype(np.float16).tobytes()
+    codes, scales = quantize_int8(vector)
+    blob = header + scales.tobytes() + codes.tobytes()
+    # Keep the length off multiples of 4, which identify float32 blobs
+    return blob + b"\0" if len(blob) % 4 == 0 else blob
+
+
+def blob_format(blob: bytes) -> str:
+    """The storage format of an embedding blob written by `encode_blob`."""
+    if len(blob) % 4 == 0:
+        return "float32"
+    return _FORMATS[blob[0]]
+
+
+def decode_blob(blob: bytes) -> np.ndarray:
+    """Deserializes an embedding blob of any storage format into a float32 vector.
+
+    Raises:
+        KeyError: If the blob has an unknown format tag.
+    """
+    fmt = blob_format(blob)
+    if fmt == "float32":
+        return np.frombuffer(blob, dtype=np.float32)
+    dim = _HEADER.unpack_from(blob)[1]
+    if fmt == "float16":
+        return np.frombuffer(blob, dtype=np.float16, count=dim, offset=_HEADER.size).astype(np.float32)
+    scale = np.frombuffer(blob, dtype=np.float32, count=1, offset=_HEADER.size)[0]
+    codes = np.frombuffer(blob, dtype=np.int8, count=dim, offset=_HEADER.size + 4)
+    return codes.astype(np.float32) * scale
+
+
+class VectorCodes:
+    """In-memory encoding of the unit-length rows of the search matrix.
+
+    The rows are held as an array of codes (one row per entry) plus, for
+    int8, one scale per row. `scores` computes cosine similarities with a
+    unit-length query from the codes alone; for binary codes they are
+    estimates (see `exact`).
+    """
+
+    # Rows decoded to float32 at a time, which bounds the temporary memory of a scan
+    CHUNK_ROWS: int = 16384
+
+    def __init__(self, fmt: str, dim: int):
+        if fmt not in EMBEDDING_FORMATS:
+            raise ValueError(f"Unknown embedding format: {fmt}")
+        self.format = fmt
+        self.dim = dim
+        self.exact = fmt != "binary"
+        self.has_scales = fmt == "int8"
+        self.dtype = {"float32": np.float32, "float16": np.float16, "int8": np.int8, "binary": np.uint8}[fmt]
+        self.width = (dim + 7) // 8 if fmt == "binary" else dim
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Returns the (codes, scales) of unit-length float32 rows; scales is None unless int8."""
+        vectors = np.atleast_2d(vectors)
+        if self.format == "int8":
+            return quantize_int8(vectors)
+        if self.format == "binary":
+            return np.packbits(vectors > 0, axis=1), None
+        return vectors.astype(self.dtype), None
+
+    def decode(self, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        """Returns float32 rows approximating the encoded vectors (unit-length sign vectors for binary)."""
+        if self.format == "binary":
+            signs = np.unpackbits(codes, axis=1, count=self.dim).astype(np.float32)
+            return (signs * 2.0 - 1.0) / np.float32(math.sqrt(self.dim))
+        vectors = codes.astype(np.float32)
+        if scales is not None:
+            vectors *= scales[:, None]
+        return vectors
+
+    def scores(self, codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        """Returns the cosine similarity of each encoded row with a unit-length float32 query."""
+        if self.format == "float32":
+            return codes @ query
+        if self.format == "binary":
+            # The angle between two vectors is about pi times the fraction of differing signs
+            query_bits = np.packbits(query > 0)
+            distances = _popcount(codes ^ query_bits)
+            return np.cos(distances * np.float32(math.pi / self.dim)).astype(np.float32)
+        sims = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], self.CHUNK_ROWS):
+            sims[start:start + self.CHUNK_ROWS] = codes[start:start + self.CHUNK_ROWS].astype(np.float32) @ query
+        if scales is not None:
+            sims *= scales
+        return sims
+
+    def nbytes_per_row(self) -> int:
+        """Memory held per row: its codes and its scale."""
+        return self.width * np.dtype(self.dtype).itemsize + (4 if self.has_scales else 0)
+
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    """Number of set bits of each row of a uint8 array (numpy < 2 has no bitwise_count)."""
+    rows, width = bits.shape
+    if width % 8:
+        bits = np.concatenate([bits, np.zeros((rows, 8 - width % 8), dtype=np.uint8)], axis=1)
+    x = np.ascontiguousarray(bits).view(np.uint64)
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return ((x * _H01) >> np.uint64(56)).sum(axis=1)
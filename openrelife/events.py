@@ -0,0 +1,95 @@
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+# Events buffered per subscriber; a client that falls further behind is told to resync
+MAX_PENDING_EVENTS: int = 256
+# Live subscribers at most. Each open /api/events stream holds a server thread, so this
+# stays below the server's thread count; further clients poll /api/sync instead
+MAX_SUBSCRIBERS: int = 3
+
+
+class EventBroker:
+    """Fans out events published by the recorder to every live subscriber.
+
+    Each subscriber gets its own bounded queue. Publishing never blocks: if a
+    subscriber's queue is full (a stalled client), its pending events are
+    replaced by a single 'resync' event, after which the client catches up
+    through /api/sync. Nothing is buffered when there are no subscribers.
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING_EVENTS, max_subscribers: int = MAX_SUBSCRIBERS):
+        self._max_pending = max_pending
+        self._max_subscribers = max_subscribers
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Optional[queue.Queue]:
+        """Returns a new subscriber's queue, or None if there are already `max_subscribers`."""
+        subscription: queue.Queue = queue.Queue(maxsize=self._max_pending)
+        with self._lock:
+            if len(self._subscribers) >= self._max_subscribers:
+                return None
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: queue.Queue) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type: str, data: Any) -> None:
+        with self._lock:
+            for subscription in self._subscribers:
+                self._offer(subscription, event_type, data)
+
+    @staticmethod
+    def _offer(subscription: queue.Queue, event_type: str, data: Any) -> None:
+        try:
+            subscription.put_nowait((event_type, data))
+        except queue.Full:
+            while True:
+                try:
+                    subscription.get_nowait()
+                except queue.Empty:
+                    break
+            subscription.put_nowait(("resync", {}))
+
+
+_broker = EventBroker()
+
+
+def get_broker() -> EventBroker:
+    return _broker
+
+
+def entry_metadata(
+    entry_id: Optional[int], text: str, timestamp: int, words_coords: Optional[List] = None
+) -> Dict[str, Any]:
+    """The metadata of a new entry, in the shape /api/sync and /api/entry return it."""
+    return {
+        'id': entry_id,
+        'text': text,
+        'timestamp': timestamp,
+        'words_coords': words_coords or [],
+        'ai_text': None,
+        'ai_words_coords': [],
+    }
+
+
+def on_entries_inserted(entries: List[Dict[str, Any]]) -> None:
+    """Pushes newly stored entries (see `entry_metadata`) to live clients, newest first."""
+    if not entries or not _broker.subscriber_count():
+        return
+    entries = sorted(entries, key=lambda e: e['timestamp'], reverse=True)
+    _broker.publish(
+        "entries",
+        {
+            'timestamps': [e['timestamp'] for e in entries],
+            'entries': {e['timestamp']: e for e in entries},
+        },
+    )
@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+# Total size of the image bytes kept in memory by the image route
+IMAGE_CACHE_BYTES: int = 64 * 1024 * 1024
+# Files larger than this fraction of the cache are served from disk without being cached
+MAX_ITEM_FRACTION: float = 0.125
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """A strong validator for an immutable file: its modification time and size."""
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def read_file(path: str) -> Tuple[bytes, str]:
+    """Returns the bytes of a file and its `file_etag`."""
+    with open(path, "rb") as f:
+        etag = file_etag(os.fstat(f.fileno()))
+        return f.read(), etag
+
+
+class ImageCache:
+    """Thread-safe LRU cache of image file contents, bounded by their total size.
+
+    Screenshots and their renditions never change once written, so an entry
+    stays valid until the file is deleted; callers discard it at that point.
+    """
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, Tuple[bytes, str]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key: Hashable, data: bytes, etag: str) -> None:
+        if len(data) > self.max_bytes * MAX_ITEM_FRACTION:
+            return
+        with self._lock:
+            self._pop(key)
+            self._items[key] = (data, etag)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def load(self, key: Hashable, loader: Callable[[], Tuple[bytes, str]]) -> Tuple[bytes, str]:
+        """Returns the cached (bytes, ETag) of a key, calling `loader` and caching its result on a miss.
+
+        Raises:
+            OSError: If the loader cannot read the image.
+        """
+        item = self.get(key)
+        if item is not None:
+            return item
+        data, etag = loader()
+        self.put(key, data, etag)
+        return data, etag
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key: Hashable) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= len(item[0])
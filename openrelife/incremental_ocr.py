@@ -0,0 +1,203 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from openrelife.change_detection import Rect, dirty_regions
+from openrelife.ocr import words_to_text
+
+logger = logging.getLogger(__name__)
+
+OCRFunction = Callable[[Sequence[np.ndarray]], List[Tuple[str, List[dict]]]]
+
+# Force a full-frame OCR after this many region-wise updates of a monitor,
+# so words carried forward cannot drift away from the screen indefinitely
+FULL_OCR_EVERY: int = 30
+# Blank space between crops packed into one OCR page
+ATLAS_GUTTER: int = 16
+
+
+def _rect_overlaps(word: dict, rect: Tuple[float, float, float, float]) -> bool:
+    x1, y1, x2, y2 = rect
+    return word['x1'] < x2 and word['x2'] > x1 and word['y1'] < y2 and word['y2'] > y1
+
+
+def expand_regions(regions: List[Rect], words: List[dict], width: int, height: int) -> List[Rect]:
+    """Grows each region to fully contain the previous words it cuts through.
+
+    Those words are re-read as a whole instead of being half carried forward.
+    """
+    expanded = []
+    for x1, y1, x2, y2 in regions:
+        norm = (x1 / width, y1 / height, x2 / width, y2 / height)
+        for word in words:
+            if _rect_overlaps(word, norm):
+                x1 = min(x1, int(word['x1'] * width))
+                y1 = min(y1, int(word['y1'] * height))
+                x2 = max(x2, int(np.ceil(word['x2'] * width)))
+                y2 = max(y2, int(np.ceil(word['y2'] * height)))
+        expanded.append((max(0, x1), max(0, y1), min(width, x2), min(height, y2)))
+    return expanded
+
+
+def pack_regions(image: np.ndarray, regions: List[Rect]) -> Tuple[np.ndarray, List[Tuple[Rect, int, int]]]:
+    """Packs the crops of `image` into one roughly square page (shelf packing).
+
+    The OCR detector resizes every page to a fixed input size, so one page
+    with all dirty crops costs a single detection pass.
+
+    Returns:
+        The atlas image and, per region, (region, atlas x, atlas y).
+    """
+    sizes = [(x2 - x1, y2 - y1) for x1, y1, x2, y2 in regions]
+    total_area = sum((w + ATLAS_GUTTER) * (h + ATLAS_GUTTER) for w, h in sizes)
+    atlas_width = max(max(w for w, _ in sizes) + 2 * ATLAS_GUTTER, int(np.sqrt(total_area)))
+
+    placements = []
+    x = y = ATLAS_GUTTER
+    shelf_height = 0
+    for i in sorted(range(len(regions)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[i]
+        if x + w + ATLAS_GUTTER > atlas_width:
+            x = ATLAS_GUTTER
+            y += shelf_height + ATLAS_GUTTER
+            shelf_height = 0
+        placements.append((regions[i], x, y))
+        x += w + ATLAS_GUTTER
+        shelf_height = max(shelf_height, h)
+
+    atlas = np.full((y + shelf_height + ATLAS_GUTTER, atlas_width, image.shape[2]), 255, dtype=image.dtype)
+    for (x1, y1, x2, y2), ax, ay in placements:
+        atlas[ay : ay + (y2 - y1), ax : ax + (x2 - x1)] = image[y1:y2, x1:x2]
+    return atlas, placements
+
+
+def unpack_words(
+    words: List[dict], atlas_shape: Tuple[int, ...], placements: List[Tuple[Rect, int, int]], width: int, height: int
+) -> List[dict]:
+    """Maps words found on an atlas page back to normalized coordinates of the full frame."""
+    atlas_height, atlas_width = atlas_shape[:2]
+    mapped = []
+    for word in words:
+        cx = (word['x1'] + word['x2']) / 2 * atlas_width
+        cy = (word['y1'] + word['y2']) / 2 * atlas_height
+        for (x1, y1, x2, y2), ax, ay in placements:
+            if ax <= cx < ax + (x2 - x1) and ay <= cy < ay + (y2 - y1):
+                dx, dy = x1 - ax, y1 - ay
+                mapped.append({
+                    'text': word['text'],
+                    'x1': (word['x1'] * atlas_width + dx) / width,
+                    'y1': (word['y1'] * atlas_height + dy) / height,
+                    'x2': (word['x2'] * atlas_width + dx) / width,
+                    'y2': (word['y2'] * atlas_height + dy) / height,
+                })
+                break
+    return mapped
+
+
+class _MonitorState:
+    __slots__ = ("image", "text", "words", "updates")
+
+    def __init__(self, image: np.ndarray, text: str, words: List[dict]):
+        self.image = image
+        self.text = text
+        self.words = words
+        self.updates = 0
+
+
+class IncrementalOCR:
+    """OCR that only re-reads the parts of a monitor that changed.
+
+    For each monitor the last analyzed frame and its words are kept. A new
+    frame is diffed against it; dirty regions are packed into one page and
+    OCRed, words inside them are replaced and all other words are carried
+    forward. Frames with too much change, a new size, due for a periodic
+    refresh, or following an OCRed frame of their monitor in the same call get
+    a full OCR. Every page of one call goes through `ocr_fn`
+    together, so batching across monitors is preserved.
+    """
+
+    def __init__(self, ocr_fn: OCRFunction, full_ocr_every: int = FULL_OCR_EVERY):
+        self._ocr_fn = ocr_fn
+        self._full_ocr_every = full_ocr_every
+        self._states: Dict[int, _MonitorState] = {}
+        self._lock = threading.Lock()
+        self.full_frames: int = 0
+        self.region_frames: int = 0
+        self.unchanged_frames: int = 0
+
+    def reset(self, monitor: Optional[int] = None) -> None:
+        """Forgets the previous frame of `monitor` (or of all monitors)."""
+        with self._lock:
+            if monitor is None:
+                self._states.clear()
+            else:
+                self._states.pop(monitor, None)
+
+    def extract(self, monitors: Sequence[int], images: Sequence[np.ndarray]) -> List[Tuple[str, List[dict]]]:
+        """OCRs one frame per entry of `images`, captured from the matching `monitors` entry.
+
+        Frames must be passed in capture order; a monitor may appear more than once.
+
+        Returns:
+            One (text, words_coords) pair per image, in input order.
+        """
+        with self._lock:
+            pages: List[np.ndarray] = []
+            plans = []
+            # Later frames of a monitor in the same call are diffed against earlier ones
+            previous: Dict[int, np.ndarray] = {m: s.image for m, s in self._states.items()}
+            # Monitors whose words are only known once this call's pages are OCRed: a later
+            # frame of theirs could not grow its regions around them, so it is read in full
+            pending = set()
+            for monitor, image in zip(monitors, images):
+                state = self._states.get(monitor)
+                regions = None
+                if (
+                    state is not None
+                    and monitor not in pending
+                    and state.updates < self._full_ocr_every
+                ):
+                    regions = dirty_regions(previous.get(monitor), image)
+                if regions is None:
+                    plans.append(("full", len(pages), None))
+                    pages.append(image)
+                    pending.add(monitor)
+                elif not regions:
+                    plans.append(("same", None, None))
+                else:
+                    height, width = image.shape[:2]
+                    regions = expand_regions(regions, state.words, width, height)
+                    atlas, placements = pack_regions(image, regions)
+                    plans.append(("regions", len(pages), (atlas.shape, placements, regions)))
+                    pages.append(atlas)
+                    pending.add(monitor)
+                previous[monitor] = image
+
+            results = self._ocr_fn(pages) if pages else []
+
+            output = []
+            for monitor, image, (kind, page, detail) in zip(monitors, images, plans):
+                if kind == "full":
+                    text, words = results[page]
+                    self._states[monitor] = _MonitorState(image, text, words)
+                    self.full_frames += 1
+                else:
+                    state = self._states[monitor]
+                    if kind == "regions":
+                        atlas_shape, placements, regions = detail
+                        height, width = image.shape[:2]
+                        dirty = [(x1 / width, y1 / height, x2 / width, y2 / height) for x1, y1, x2, y2 in regions]
+                        kept = [w for w in state.words if not any(_rect_overlaps(w, r) for r in dirty)]
+                        new_words = unpack_words(results[page][1], atlas_shape, placements, width, height)
+                        state.words = kept + new_words
+                        state.text = words_to_text(state.words)
+                        self.region_frames += 1
+                    else:
+                        self.unchanged_frames += 1
+                    state.image = image
+                    state.updates += 1
+                    text, words = state.text, state.words
+                output.append((text, list(words)))
+            return output
@@ -1,6 +1,10 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import logging
+import threading
+
+from openrelife.config import args, line_cache_path, models_path
+from openrelife.embedding_backends import TorchBackend, create_backend
+from openrelife.embedding_cache import LineEmbeddingCache, SingleFlightCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -9,35 +13,66 @@ logger = logging.getLogger(__name__)
 # Constants
 MODEL_NAME: str = "all-MiniLM-L6-v2"
 EMBEDDING_DIM: int = 384  # Dimension for all-MiniLM-L6-v2
+# Search queries whose embeddings are kept in memory
+QUERY_CACHE_SIZE: int = 512
+
+# How the model runs (--embedding-backend, see embedding_backends.py)
+EMBEDDING_BACKEND: str = args.embedding_backend
 
-# Global model cache
+# Global model cache; the lock makes concurrent first callers (warm-up, recorder, search) wait
+# for a single load
 _model_cache = None
+_model_lock = threading.Lock()
 
 def get_model():
-    """Lazy load the SentenceTransformer model"""
+    """Lazy load the embedding model with the configured backend, falling back to PyTorch"""
     global _model_cache
     if _model_cache is None:
-        try:
-            logger.info(f"Loading SentenceTransformer model '{MODEL_NAME}'...")
-            _model_cache = SentenceTransformer(MODEL_NAME)
-            logger.info(f"SentenceTransformer model '{MODEL_NAME}' loaded successfully.")
-        except Exception as e:
-            logger.error(f"Failed to load SentenceTransformer model '{MODEL_NAME}': {e}")
-            _model_cache = None
-            return None
+        with _model_lock:
+            if _model_cache is None:
+                for backend in dict.fromkeys([EMBEDDING_BACKEND, TorchBackend.name]):
+                    try:
+                        logger.info(f"Loading model '{MODEL_NAME}' with the {backend} backend...")
+                        _model_cache = create_backend(backend, MODEL_NAME, models_path)
+                        logger.info(f"Model '{MODEL_NAME}' loaded successfully with the {backend} backend.")
+                        break
+                    except Exception as e:
+                        logger.error(f"Failed to load model '{MODEL_NAME}' with the {backend} backend: {e}")
     return _model_cache
 
 
-def get_embedding(text: str) -> np.ndarray:
+def warm_up() -> None:
+    """Loads the model and runs it once, so the first frame or search does not wait for it.
+
+    Raises:
+        RuntimeError: If the model could not be loaded.
+    """
+    model = get_model()
+    if model is None:
+        raise RuntimeError(f"Model '{MODEL_NAME}' could not be loaded")
+    model.encode(["warm-up"])
+
+
+# Embeddings of the OCR lines seen so far; consecutive frames share most of their lines.
+# Other backends than torch key their own lines, so the cache never mixes their vectors.
+_line_cache = LineEmbeddingCache(
+    line_cache_path,
+    MODEL_NAME if EMBEDDING_BACKEND == TorchBackend.name else f"{MODEL_NAME}:{EMBEDDING_BACKEND}",
+)
+
+
+def get_embedding(text: str, cache_lines: bool = True) -> np.ndarray:
     """
     Generates a sentence embedding for the given text.
 
     Splits the text into lines, encodes each line using the pre-loaded
-    SentenceTransformer model, and returns the mean of the embeddings.
+    embedding model, and returns the mean of the embeddings.
+    Lines found in the line cache are not encoded again.
     Handles empty input text by returning a zero vector.
 
     Args:
         text: The input string to embed.
+        cache_lines: Whether to look up and store the lines in the line cache.
 
     Returns:
         A numpy array representing the mean embedding of the text lines,
@@ -46,7 +81,7 @@ def get_embedding(text: str) -> np.ndarray:
     """
     model = get_model()
     if model is None:
-        logger.error("SentenceTransformer model is not loaded. Returning zero vector.")
+        logger.error("Embedding model is not loaded. Returning zero vector.")
         return np.zeros(EMBEDDING_DIM, dtype=np.float32)
 
     if not text or text.isspace():
@@ -61,7 +96,16 @@ def get_embedding(text: str) -> np.ndarray:
         return np.zeros(EMBEDDING_DIM, dtype=np.float32)
 
     try:
-        sentence_embeddings = model.encode(sentences)
+        if cache_lines:
+            known = _line_cache.get_many(sentences)
+            missing = list(dict.fromkeys(line for line in sentences if line not in known))
+            if missing:
+                new = dict(zip(missing, model.encode(missing)))
+                _line_cache.put_many(new)
+                known.update(new)
+            sentence_embeddings = np.stack([known[line] for line in sentences])
+        else:
+            sentence_embeddings = model.encode(sentences)
         # Calculate the mean embedding
         mean_embedding = np.mean(sentence_embeddings, axis=0, dtype=np.float32)
         return mean_embedding
@@ -70,6 +114,60 @@ def get_embedding(text: str) -> np.ndarray:
         return np.zeros(EMBEDDING_DIM, dtype=np.float32)
 
 
+def normalize_query(query: str) -> str:
+    """
+    The cache key of a search query: lowercased, with runs of whitespace collapsed.
+
+    The model's tokenizer is uncased and ignores spacing, so queries that
+    differ only in these ways have the same embedding. Line breaks are kept,
+    since `get_embedding` embeds each line separately.
+    """
+    lines = (" ".join(line.split()) for line in query.lower().split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+_query_cache = SingleFlightCache(QUERY_CACHE_SIZE)
+
+
+def get_query_embedding(query: str) -> np.ndarray:
+    """
+    Returns the embedding of a search query, from the query cache when possible.
+
+    Concurrent requests for the same query run the model once. The returned
+    array is shared between callers and read-only.
+
+    Args:
+        query: The search query.
+
+    Returns:
+        The embedding, as `get_embedding` computes it.
+    """
+    key = normalize_query(query)
+    if not key:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+
+    def compute() -> np.ndarray:
+        embedding = get_embedding(key, cache_lines=False)
+        embedding.setflags(write=False)
+        return embedding
+
+    embedding = _query_cache.get(key, compute)
+    if not embedding.any():
+        # The model failed to load or encode; retry on the next request
+        _query_cache.discard(key)
+    return embedding
+
+
+def get_line_cache_stats() -> dict:
+    """Hits, misses and hit rate of the OCR line cache since startup."""
+    return _line_cache.stats()
+
+
+def get_query_cache_stats() -> dict:
+    """Size, hits, misses and shared (single-flight) misses of the query cache."""
+    return _query_cache.stats()
+
+
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     """
     Calculates the cosine similarity between two numpy vectors.
@@ -1,33 +1,88 @@
-from doctr.models import ocr_predictor
+import threading
+from typing import List, Tuple
 
-ocr = ocr_predictor(
-    pretrained=True,
-    det_arch="db_mobilenet_v3_large",
-    reco_arch="crnn_mobilenet_v3_large",
-)
+import numpy as np
 
+# Maximum number of pages sent through the predictor in one call
+OCR_BATCH_SIZE: int = 4
 
-def extract_text_from_image(image):
-    result = ocr([image])
-    text = ""
+# Importing doctr (and torch) and building the predictor takes seconds, so it is done on
+# first use, or by the warm-up thread at startup, instead of when this module is imported
+_predictor = None
+_predictor_lock = threading.Lock()
+
+
+def get_ocr():
+    """Lazy load the doctr OCR predictor; concurrent callers wait for a single load."""
+    global _predictor
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                from doctr.models import ocr_predictor
+
+                _predictor = ocr_predictor(
+                    pretrained=True,
+                    det_arch="db_mobilenet_v3_large",
+                    reco_arch="crnn_mobilenet_v3_large",
+                    det_bs=OCR_BATCH_SIZE,
+                )
+    return _predictor
+
+
+def warm_up() -> None:
+    """Loads the predictor and runs it once on a blank page, so the first frame does not wait for it."""
+    get_ocr()([np.full((64, 64, 3), 255, dtype=np.uint8)])
+
+
+def words_to_text(words: List[dict]) -> str:
+    """Rebuilds OCR text from word boxes: words on one line joined by spaces, one line per row."""
+    lines: List[List[dict]] = []
+    for word in sorted(words, key=lambda w: (w['y1'] + w['y2']) / 2):
+        center = (word['y1'] + word['y2']) / 2
+        if lines and lines[-1][0]['y1'] <= center <= lines[-1][0]['y2']:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return "".join(
+        " ".join(w['text'] for w in sorted(line, key=lambda w: w['x1'])) + " \n" for line in lines
+    )
+
+
+def _page_text_and_coords(page) -> Tuple[str, List[dict]]:
     words_with_coords = []
-    
-    for page in result.pages:
-        page_height, page_width = page.dimensions
-        for block in page.blocks:
-            for line in block.lines:
-                for word in line.words:
-                    text += word.value + " "
-                    # Store word with normalized coordinates (0-1 range)
-                    x1, y1 = word.geometry[0]
-                    x2, y2 = word.geometry[1]
-                    words_with_coords.append({
-                        'text': word.value,
-                        'x1': x1,
-                        'y1': y1,
-                        'x2': x2,
-                        'y2': y2
-                    })
-                text += "\n"
-            text += "\n"
-    return text, words_with_coords
+    for block in page.blocks:
+        for line in block.lines:
+            for word in line.words:
+                # Store word with normalized coordinates (0-1 range)
+                x1, y1 = word.geometry[0]
+                x2, y2 = word.geometry[1]
+                words_with_coords.append({
+                    'text': word.value,
+                    'x1': x1,
+                    'y1': y1,
+                    'x2': x2,
+                    'y2': y2
+                })
+    # Built from the word boxes, like the text of frames read region by region (incremental_ocr.py)
+    return words_to_text(words_with_coords), words_with_coords
+
+
+def extract_text_from_images(images) -> List[Tuple[str, List[dict]]]:
+    """Runs OCR over several images in one predictor call.
+
+    Detection runs on the pages in batches of OCR_BATCH_SIZE and recognition
+    batches the word crops of all pages together, which is cheaper per frame
+    than one call per image.
+
+    Returns:
+        One (text, words_coords) pair per image, in input order.
+    """
+    if not images:
+        return []
+    # Captures arrive as strided views of the BGRA buffer; the model needs contiguous pages
+    result = get_ocr()([np.ascontiguousarray(image) for image in images])
+    return [_page_text_and_coords(page) for page in result.pages]
+
+
+def extract_text_from_image(image):
+    return extract_text_from_images([image])[0]
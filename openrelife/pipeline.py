@@ -0,0 +1,249 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream for a stage worker
+_STOP = object()
+
+
+@dataclass
+class Frame:
+    """A captured screen frame travelling through the recording pipeline."""
+
+    monitor: int
+    timestamp: int
+    image: np.ndarray
+    app: str
+    title: str
+    text: str = ""
+    words_coords: List = field(default_factory=list)
+    embedding: Optional[np.ndarray] = None
+
+
+class CoalescingQueue:
+    """Bounded queue whose producer never blocks.
+
+    `offer` replaces a pending item with the same key (a newer frame of the
+    same monitor supersedes the one still waiting), and when the queue is full
+    it evicts the oldest pending item. Consumers block in `get` as usual.
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = max(1, maxsize)
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self.coalesced: int = 0
+        self.dropped: int = 0
+
+    def offer(self, item: Any, key: Optional[Hashable] = None) -> None:
+        with self._cond:
+            if key is not None:
+                for i, (pending_key, _) in enumerate(self._items):
+                    if pending_key == key:
+                        self._items[i] = (key, item)
+                        self.coalesced += 1
+                        return
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append((key, item))
+            self._cond.notify()
+
+    def put(self, item: Any) -> None:
+        """Enqueues `item` without a key, so it is never coalesced (used for stop markers)."""
+        with self._cond:
+            self._items.append((None, item))
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Removes and returns the oldest item, raising queue.Empty after `timeout` seconds."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._items.popleft()[1]
+
+    def get_nowait(self) -> Any:
+        with self._cond:
+            if not self._items:
+                raise queue.Empty
+            return self._items.popleft()[1]
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class Stage:
+    """A pool of worker threads applying `fn` to items from `inbox`.
+
+    Results are pushed to `outbox` with a blocking put, so a slow downstream
+    stage applies backpressure. `fn` may return None to drop an item; errors
+    are logged and drop only the item (or batch) that caused them.
+
+    With `batch_size` > 1, a worker waits for one item, then takes whatever
+    else is already queued up to `batch_size`, and calls `fn` with the list.
+    `fn` then returns a list of results. By default nothing waits for a
+    batch to fill; with `max_wait` > 0 the worker keeps collecting items for
+    up to that many seconds after the first one (used to group database
+    writes into one transaction).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        inbox: Any,
+        outbox: Optional[Any] = None,
+        workers: int = 1,
+        batch_size: int = 1,
+        max_wait: float = 0.0,
+    ):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.processed: int = 0
+        self.failed: int = 0
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self) -> Tuple[List[Any], bool]:
+        """Returns the next items to process and whether a stop marker was reached."""
+        item = self.inbox.get()
+        if item is _STOP:
+            return [], True
+        items = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self.inbox.get(timeout=remaining)
+                else:
+                    item = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Leave the marker for the next call (or another worker) after this batch
+                self.inbox.put(_STOP)
+                break
+            items.append(item)
+        return items, False
+
+    def _run(self) -> None:
+        while True:
+            items, stopping = self._next_batch()
+            if items:
+                self._process(items)
+            if stopping:
+                return
+
+    def _process(self, items: List[Any]) -> None:
+        try:
+            if self.batch_size > 1:
+                results = self.fn(items)
+            else:
+                results = [self.fn(items[0])]
+        except Exception as e:  # Keep the worker alive; a bad frame must not stop recording
+            self.failed += len(items)
+            logger.exception(f"Pipeline stage '{self.name}' failed: {e}")
+            return
+        self.processed += len(items)
+        if self.outbox is None:
+            return
+        for result in results:
+            if result is not None:
+                self.outbox.put(result)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Lets the workers drain their inbox, then waits for them to exit."""
+        for _ in self._threads:
+            self.inbox.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+class RecordingPipeline:
+    """Chains stages with bounded queues: capture -> analyze -> encode -> store.
+
+    With `analyze_batch_size` > 1, `analyze` receives every frame pending at
+    that moment (up to the batch size) as a list, so OCR can run on them in
+    one forward pass.
+
+    With `store_batch_size` > 1, `store` receives a list of frames: all that
+    reach the store stage within `store_max_wait` seconds of each other, so
+    they can be written in one transaction.
+
+    The capture thread hands frames to `submit`, which never blocks: when the
+    analysis stage falls behind, pending frames of the same monitor are
+    coalesced and the oldest frames are dropped. Later stages use blocking
+    bounded queues, so a stall propagates back to the coalescing queue rather
+    than to the capture loop.
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[Any], Any],
+        encode: Callable[[Frame], Optional[Frame]],
+        store: Callable[[Any], Any],
+        analyze_workers: int = 1,
+        analyze_batch_size: int = 1,
+        encode_workers: int = 2,
+        pending_frames: int = 4,
+        queue_size: int = 4,
+        store_batch_size: int = 1,
+        store_max_wait: float = 0.0,
+    ):
+        self.pending = CoalescingQueue(pending_frames)
+        encode_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        store_queue: queue.Queue = queue.Queue(maxsize=queue_size * 4)
+        self.stages = [
+            Stage("analyze", analyze, self.pending, encode_queue, analyze_workers, analyze_batch_size),
+            Stage("encode", encode, encode_queue, store_queue, encode_workers),
+            Stage("store", store, store_queue, batch_size=store_batch_size, max_wait=store_max_wait),
+        ]
+
+    def start(self) -> None:
+        for stage in self.stages:
+            stage.start()
+
+    def submit(self, frame: Frame) -> None:
+        """Queues a captured frame for processing without ever blocking."""
+        self.pending.offer(frame, key=frame.monitor)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Processes every frame already submitted, then stops all workers.
+
+        This is the flush hook for shutdown: frames still pending in any
+        stage, including a store batch being collected, are written first.
+        """
+        for stage in self.stages:
+            stage.stop(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {
+            "pending": self.pending.qsize(),
+            "coalesced": self.pending.coalesced,
+            "dropped": self.pending.dropped,
+        }
+        for stage in self.stages:
+            stats[f"{stage.name}_processed"] = stage.processed
+            stats[f"{stage.name}_failed"] = stage.failed
+        return stats
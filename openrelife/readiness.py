@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Callable, Dict
+
+# When OpenReLife started loading; app.py imports this module before the rest of the package
+STARTED_AT: float = time.monotonic()
+
+_lock = threading.Lock()
+_components: Dict[str, dict] = {}
+
+
+def _record(name: str, state: str, error: str = "") -> float:
+    seconds = round(time.monotonic() - STARTED_AT, 2)
+    status = {"state": state, "seconds": seconds}
+    if error:
+        status["error"] = error
+    with _lock:
+        _components[name] = status
+    return seconds
+
+
+def mark_loading(name: str) -> None:
+    _record(name, "loading")
+
+
+def mark_ready(name: str) -> None:
+    _record(name, "ready")
+
+
+def load_in_background(name: str, load: Callable[[], None]) -> threading.Thread:
+    """Runs `load` on a daemon thread, recording component `name` as loading, then ready or failed.
+
+    Args:
+        name: The component, as reported by `get_readiness`.
+        load: Loads the component; an exception marks it failed.
+
+    Returns:
+        The started thread.
+    """
+    mark_loading(name)
+
+    def run():
+        try:
+            load()
+        except Exception as e:
+            seconds = _record(name, "failed", str(e))
+            print(f"Error loading {name} after {seconds:.1f} s: {e}")
+        else:
+            seconds = _record(name, "ready")
+            print(f"Loaded {name} in {seconds:.1f} s since startup")
+
+    thread = threading.Thread(target=run, daemon=True, name=f"load-{name}")
+    thread.start()
+    return thread
+
+
+def get_readiness() -> dict:
+    """Whether every component is ready, the seconds since startup, and the state of each component.
+
+    Each component reports its state (loading, ready or failed) and the
+    seconds since startup at which it entered that state.
+    """
+    with _lock:
+        components = {name: dict(status) for name, status in _components.items()}
+    return {
+        "ready": bool(components) and all(status["state"] == "ready" for status in components.values()),
+        "uptime": round(time.monotonic() - STARTED_AT, 2),
+        "components": components,
+    }
@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+from openrelife.database import (
+    delete_entries,
+    enable_incremental_vacuum,
+    get_expired_timestamps,
+    reclaim_free_pages,
+)
+from openrelife.storage import delete_screenshots, prune_empty_shards
+from openrelife.thumbnails import delete_renditions
+
+# Entries (and their screenshots) deleted per transaction, and the pause after each batch
+RETENTION_BATCH_SIZE: int = 200
+RETENTION_BATCH_PAUSE: float = 0.5
+# Pause between incremental_vacuum steps
+VACUUM_STEP_PAUSE: float = 0.1
+# Seconds between two retention passes, unless a settings change wakes the worker earlier
+RETENTION_CHECK_INTERVAL: float = 3600.0
+
+_stop_event = threading.Event()
+_wake_event = threading.Event()
+
+
+def purge_expired(
+    retention_days: int,
+    now: Optional[float] = None,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    pause: float = RETENTION_BATCH_PAUSE,
+    on_deleted: Optional[Callable[[List[int]], None]] = None,
+) -> int:
+    """Deletes the entries and screenshots older than the retention period.
+
+    Works oldest first in small batches, pausing between them, so the
+    recorder and the UI keep getting the database and the disk. Deleting the
+    rows keeps the FTS index and the activity rollups in sync (triggers) and
+    the resident embedding matrix and ANN index (deletion hooks). The freed
+    database pages are then returned to the file system step by step.
+
+    Args:
+        retention_days: Age in days beyond which data is deleted.
+        now: Current time in seconds since the epoch; defaults to time.time().
+        batch_size: Entries deleted per batch.
+        pause: Seconds to wait after each batch.
+        on_deleted: Called with each deleted batch of timestamps.
+
+    Returns:
+        The number of entries deleted.
+    """
+    cutoff = int(((now if now is not None else time.time()) - retention_days * 86400) * 1000000)
+    purged = 0
+    while not _stop_event.is_set():
+        batch = get_expired_timestamps(cutoff, batch_size)
+        if not batch or not delete_entries(batch):
+            break
+        delete_screenshots(batch)
+        for timestamp in batch:
+            delete_renditions(timestamp)
+        prune_empty_shards(batch)
+        if on_deleted is not None:
+            on_deleted(batch)
+        purged += len(batch)
+        _stop_event.wait(pause)
+    if purged:
+        reclaim_free_pages(pause=VACUUM_STEP_PAUSE, stop=_stop_event)
+    return purged
+
+
+def run_retention(
+    get_retention_days: Callable[[], int],
+    on_deleted: Optional[Callable[[List[int]], None]] = None,
+    interval: float = RETENTION_CHECK_INTERVAL,
+) -> None:
+    """Enforces the retention setting until `stop_retention` is called.
+
+    Args:
+        get_retention_days: Returns the current setting; zero or less keeps everything.
+        on_deleted: Passed on to `purge_expired`.
+        interval: Seconds between passes.
+    """
+    while not _stop_event.is_set():
+        _wake_event.clear()
+        retention_days = get_retention_days()
+        if retention_days > 0:
+            try:
+                purged = purge_expired(retention_days, on_deleted=on_deleted)
+                if purged:
+                    print(f"Retention: deleted {purged} entries older than {retention_days} days")
+                # One-time rebuild of databases created before incremental vacuum, which also
+                # returns the pages this pass freed; later passes reclaim them step by step
+                if not _stop_event.is_set() and enable_incremental_vacuum():
+                    print("Database converted to incremental vacuum")
+            except Exception as e:
+                print(f"Error enforcing retention: {e}")
+        _wake_event.wait(interval)
+
+
+def wake_retention() -> None:
+    """Runs a retention pass now, e.g. after the setting changed."""
+    _wake_event.set()
+
+
+def stop_retention() -> None:
+    """Stops the worker after its current batch."""
+    _stop_event.set()
+    _wake_event.set()
@@ -1,15 +1,22 @@
 import os
+import threading
 import time
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import mss
 import numpy as np
 from PIL import Image
 
-from openrelife.config import screenshots_path, args
-from openrelife.database import insert_entry
+from openrelife.capture import rgb_view, to_image
+from openrelife.change_detection import get_change_detector
+from openrelife.config import args
+from openrelife.database import insert_entries
+from openrelife.incremental_ocr import IncrementalOCR
 from openrelife.nlp import get_embedding
-from openrelife.ocr import extract_text_from_image
+from openrelife.ocr import OCR_BATCH_SIZE, extract_text_from_images
+from openrelife.pipeline import Frame, RecordingPipeline
+from openrelife.storage import save_screenshot
+from openrelife.thumbnails import save_renditions
 from openrelife.utils import (
     get_active_app_name,
     get_active_window_title,
@@ -17,53 +24,27 @@ from openrelife.utils import (
 )
 
 
-def mean_structured_similarity_index(
-    img1: np.ndarray, img2: np.ndarray, L: int = 255
-) -> float:
-    """Calculates the Mean Structural Similarity Index (MSSIM) between two images.
-
-    Args:
-        img1: The first image as a NumPy array (RGB).
-        img2: The second image as a NumPy array (RGB).
-        L: The dynamic range of the pixel values (default is 255).
-
-    Returns:
-        The MSSIM value between the two images (float between -1 and 1).
-    """
-    K1, K2 = 0.01, 0.03
-    C1, C2 = (K1 * L) ** 2, (K2 * L) ** 2
-
-    def rgb2gray(img: np.ndarray) -> np.ndarray:
-        """Converts an RGB image to grayscale."""
-        return 0.2989 * img[..., 0] + 0.5870 * img[..., 1] + 0.1140 * img[..., 2]
-
-    img1_gray: np.ndarray = rgb2gray(img1)
-    img2_gray: np.ndarray = rgb2gray(img2)
-    mu1: float = np.mean(img1_gray)
-    mu2: float = np.mean(img2_gray)
-    sigma1_sq = np.var(img1_gray)
-    sigma2_sq = np.var(img2_gray)
-    sigma12 = np.mean((img1_gray - mu1) * (img2_gray - mu2))
-    ssim_index = ((2 * mu1 * mu2 + C1) * (2 * sigma12 + C2)) / (
-        (mu1**2 + mu2**2 + C1) * (sigma1_sq + sigma2_sq + C2)
-    )
-    return ssim_index
+# Decides whether a monitor changed enough since its last recorded frame to record a new one
+_change_detector = get_change_detector(args.change_detector)
 
 
 def is_similar(
-    img1: np.ndarray, img2: np.ndarray, similarity_threshold: float = 0.9
+    img1: np.ndarray, img2: np.ndarray, similarity_threshold: Optional[float] = None
 ) -> bool:
-    """Checks if two images are similar based on MSSIM.
+    """Checks if two images are similar using the configured change detector.
 
     Args:
         img1: The first image as a NumPy array.
         img2: The second image as a NumPy array.
-        similarity_threshold: The threshold above which images are considered similar.
+        similarity_threshold: The threshold above which images are considered similar
+            (the detector's own threshold if None).
 
     Returns:
         True if the images are similar, False otherwise.
     """
-    similarity: float = mean_structured_similarity_index(img1, img2)
+    if similarity_threshold is None:
+        return _change_detector.is_similar(img1, img2)
+    similarity: float = _change_detector.similarity(img1, img2)
     return similarity >= similarity_threshold
 
 
@@ -75,6 +56,8 @@ def take_screenshots() -> List[np.ndarray]:
 
     Returns:
         A list of screenshots, where each screenshot is a NumPy array (RGB).
+        The arrays are views of the captured BGRA buffers, see
+        `openrelife.capture.rgb_view`.
     """
     screenshots: List[np.ndarray] = []
     with mss.mss() as sct:
@@ -92,8 +75,8 @@ def take_screenshots() -> List[np.ndarray]:
                 monitor_info = sct.monitors[i]
                 # Grab the screen
                 sct_img = sct.grab(monitor_info)
-                # Convert to numpy array and change BGRA to RGB
-                screenshot = np.array(sct_img)[:, :, [2, 1, 0]]
+                # RGB view of the BGRA buffer; nothing is copied until a frame is saved
+                screenshot = rgb_view(sct_img.raw, sct_img.width, sct_img.height)
                 screenshots.append(screenshot)
             else:
                 # Handle case where primary_monitor_only is True but only one monitor exists (all monitors view)
@@ -138,32 +121,134 @@ def get_screenshot_quality() -> str:
     return screenshot_quality
 
 
+def encode_screenshot(image: Image.Image, quality: str) -> Tuple[Image.Image, dict]:
+    """Applies the quality preset to a screenshot before it is written as WebP.
+
+    Args:
+        image: The full-resolution screenshot.
+        quality: One of 'low', 'medium' or 'high'.
+
+    Returns:
+        The (possibly resized) image and the keyword arguments for `Image.save`.
+    """
+    width, height = image.size
+    if quality == 'high':
+        # No resize, lossless
+        return image, {'lossless': True}
+    if quality == 'medium':
+        # 95% resize, 95 quality
+        image = image.resize((int(width * 0.95), int(height * 0.95)), Image.LANCZOS)
+        return image, {'lossless': False, 'quality': 95}
+    # low: 80% resize, 80 quality (default behavior)
+    image = image.resize((int(width * 0.8), int(height * 0.8)), Image.LANCZOS)
+    return image, {'lossless': False, 'quality': 80}
+
+
+# Re-reads only the changed screen areas of each monitor (the analyze stage has one worker)
+_incremental_ocr = IncrementalOCR(extract_text_from_images)
+
+
+def analyze_frames(frames: List[Frame]) -> List[Frame]:
+    """Pipeline stage: OCR on the full-resolution frames, then the text embeddings.
+
+    All frames pending at once (one per changed monitor, or a backlog) go
+    through the OCR model in a single batch. Only the regions that changed
+    since the monitor's previous frame are OCRed; other words carry over.
+    """
+    results = _incremental_ocr.extract(
+        [frame.monitor for frame in frames], [frame.image for frame in frames]
+    )
+    for frame, (text, words_coords) in zip(frames, results):
+        frame.text, frame.words_coords = text, words_coords
+        # Zero embedding if no text
+        frame.embedding = get_embedding(text) if text.strip() else np.zeros(384)
+    return frames
+
+
+def encode_frame(frame: Frame) -> Frame:
+    """Pipeline stage: resize and write the screenshot (always saved, regardless of text)
+    and its downscaled renditions for the timeline and search results."""
+    full_image = to_image(frame.image)
+    image, save_kwargs = encode_screenshot(full_image, screenshot_quality)
+    save_screenshot(image, save_kwargs, frame.timestamp, frame.monitor)
+    # Packed screenshots get their renditions on demand (see thumbnails.read_rendition)
+    if args.storage_engine != "segments":
+        save_renditions(full_image, frame.timestamp)
+    # The pixels are no longer needed; free them before the frame waits for the writer
+    frame.image = None
+    return frame
+
+
+# Frames written per transaction, and how long the writer waits for more after the first
+STORE_BATCH_SIZE: int = 32
+STORE_MAX_WAIT: float = 0.25
+
+
+def store_frames(frames: List[Frame]) -> None:
+    """Pipeline stage: create the DB entries (even if text is empty) in one transaction."""
+    insert_entries(
+        [
+            (frame.text, frame.timestamp, frame.embedding, frame.app, frame.title, frame.words_coords)
+            for frame in frames
+        ]
+    )
+
+
+_last_timestamp = 0
+
+
+def _next_timestamp() -> int:
+    """Returns the current time in microseconds, strictly increasing across calls."""
+    global _last_timestamp
+    _last_timestamp = max(int(time.time() * 1000000), _last_timestamp + 1)
+    return _last_timestamp
+
+
+# Set by `stop_recording`; the recorder loop exits and flushes its pipeline
+_stop_event = threading.Event()
+
+
+def stop_recording() -> None:
+    """Asks the recorder thread to stop; it writes every frame already captured before exiting."""
+    _stop_event.set()
+
+
 def record_screenshots_thread():
     # TODO: fix the error from huggingface tokenizers
     import os
 
     os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+    # Capture runs here; OCR/embedding, encoding and DB writes run on pipeline workers,
+    # so a slow OCR call never delays the next capture.
+    pipeline = RecordingPipeline(
+        analyze_frames,
+        encode_frame,
+        store_frames,
+        analyze_batch_size=OCR_BATCH_SIZE,
+        store_batch_size=STORE_BATCH_SIZE,
+        store_max_wait=STORE_MAX_WAIT,
+    )
+    pipeline.start()
+
     last_screenshots = take_screenshots()
 
-    while True:
+    while not _stop_event.is_set():
         # Check if recording is manually paused
         if is_recording_paused:
-            time.sleep(1)
+            _stop_event.wait(1)
             continue
 
         # Avoid recording the recorder (OpenReLife itself)
         active_title = get_active_window_title()
         if active_title and "OpenReLife" in active_title:
-            time.sleep(1)
+            _stop_event.wait(1)
             continue
 
         if not is_user_active():
-            time.sleep(3)
+            _stop_event.wait(3)
             continue
 
-        from datetime import datetime
-        #print(f"[{datetime.now().strftime('%H:%M:%S.%f')}] Acquiring screenshot (interval: {screenshot_interval}s)...")
         screenshots = take_screenshots()
 
         for i, screenshot in enumerate(screenshots):
@@ -171,46 +256,18 @@ def record_screenshots_thread():
             last_screenshot = last_screenshots[i]
 
             if not is_similar(screenshot, last_screenshot):
-                #print(f"[{datetime.now().strftime('%H:%M:%S.%f')}] Change detected! Saving screenshot {i}...")
                 last_screenshots[i] = screenshot
-                
-                # 1. Run OCR on full resolution image
-                text, words_coords = extract_text_from_image(screenshot)
-                
-                # 2. Resize and save image (Always save, regardless of text)
-                image = Image.fromarray(screenshot)
-                width, height = image.size
-                
-                # Quality Settings
-                if screenshot_quality == 'high':
-                    # No resize, lossless
-                    save_kwargs = {'lossless': True}
-                elif screenshot_quality == 'medium':
-                    # 95% resize, 95 quality
-                    image = image.resize((int(width * 0.95), int(height * 0.95)), Image.LANCZOS)
-                    save_kwargs = {'lossless': False, 'quality': 95}
-                else: # low
-                    # 80% resize, 80 quality (default behavior)
-                    image = image.resize((int(width * 0.8), int(height * 0.8)), Image.LANCZOS)
-                    save_kwargs = {'lossless': False, 'quality': 80}
-                
-                timestamp = int(time.time() * 1000000)  # microseconds
-                filename = f"{timestamp}.webp"
-                
-                image.save(
-                    os.path.join(screenshots_path, filename),
-                    format="webp",
-                    **save_kwargs
-                )
-                
-                # 3. Create DB entry (even if text is empty)
-                embedding: np.ndarray = get_embedding(text) if text.strip() else np.zeros(384) # Zero embedding if no text
-                active_app_name: str = get_active_app_name() or "Unknown App"
-                active_window_title: str = get_active_window_title() or "Unknown Title"
-                
-                insert_entry(
-                    text, timestamp, embedding, active_app_name, active_window_title, words_coords
+                pipeline.submit(
+                    Frame(
+                        monitor=i,
+                        timestamp=_next_timestamp(),
+                        image=screenshot,
+                        app=get_active_app_name() or "Unknown App",
+                        title=get_active_window_title() or "Unknown Title",
+                    )
                 )
 
-        time.sleep(screenshot_interval) # Wait before taking the next screenshot
+        _stop_event.wait(screenshot_interval) # Wait before taking the next screenshot
 
+    # Flush: analyze, save and store every frame already captured
+    pipeline.stop()
@@ -0,0 +1,136 @@
+from typing import Dict, List
+
+import numpy as np
+
+from openrelife.ann_index import DEFAULT_NPROBE, get_ann_index
+from openrelife.database import get_entries_by_timestamps, search_text
+from openrelife.vector_index import EmbeddingMatrix, get_embedding_matrix, top_k_indices
+
+# Keyword boosts added on top of the semantic score
+EXACT_PHRASE_BOOST: float = 0.5
+PARTIAL_WORDS_BOOST: float = 0.3
+# Recency bias divisor applied to the raw timestamp
+RECENCY_DIVISOR: float = 1e10
+# Maximum number of BM25-ranked full-text candidates scored per query; matches past it
+# get no keyword boost
+KEYWORD_CANDIDATES: int = 2000
+# Best semantic candidates whose estimated similarity (binary codes) is recomputed
+# from the stored vectors
+RERANK_CANDIDATES: int = 1000
+
+
+def keyword_boost(query_lower: str, text_lower: str) -> float:
+    """Returns the keyword boost of a text for an already lowercased query.
+
+    An exact phrase match gets the highest boost; otherwise the boost is
+    proportional to the fraction of query words found in the text.
+    """
+    if query_lower in text_lower:
+        return EXACT_PHRASE_BOOST
+    query_words = query_lower.split()
+    if not query_words:
+        return 0.0
+    matched = sum(1 for word in query_words if word in text_lower)
+    if matched > 0:
+        return PARTIAL_WORDS_BOOST * (matched / len(query_words))
+    return 0.0
+
+
+def _keyword_boosts(query: str) -> Dict[int, float]:
+    """Maps the timestamp of each full-text candidate matching `query` to its boost.
+
+    Candidates come from the FTS index, so only they are lowercased and scanned.
+    """
+    query_lower = query.lower()
+    boosts: Dict[int, float] = {}
+    for timestamp, text, ai_text in search_text(query, KEYWORD_CANDIDATES):
+        boost = keyword_boost(query_lower, f"{text}\n{ai_text}".lower())
+        if boost > 0:
+            boosts[timestamp] = boost
+    return boosts
+
+
+def rerank(query_embedding: np.ndarray, timestamps: np.ndarray, sims: np.ndarray, rows: np.ndarray) -> None:
+    """Replaces the similarities of the given rows with those of their stored vectors, in place.
+
+    Used when the resident matrix only holds estimates (binary codes).
+    """
+    if not rows.shape[0]:
+        return
+    entries = get_entries_by_timestamps(timestamps[rows].tolist(), columns=("embedding",))
+    if not entries:
+        return
+    query = EmbeddingMatrix._normalize(np.asarray(query_embedding, dtype=np.float32).ravel())
+    found = np.fromiter((entry.timestamp for entry in entries), dtype=np.int64, count=len(entries))
+    vectors = EmbeddingMatrix._normalize(np.vstack([entry.embedding for entry in entries]))
+    # `timestamps` is sorted, so the rows of the entries can be located by binary search
+    pos = np.searchsorted(timestamps, found)
+    sims[pos] = np.clip(vectors @ query, -1.0, 1.0)
+
+
+def hybrid_search(
+    query: str, query_embedding: np.ndarray, limit: int, nprobe: int = DEFAULT_NPROBE
+) -> List[int]:
+    """Ranks entries by semantic similarity, keyword boost and recency.
+
+    Entries with a keyword match always rank before entries without one, and
+    each group is ordered by its combined score. Semantic candidates come from
+    the ANN index once it is trained, otherwise from an exact scan of the
+    resident embedding matrix; keyword matches are always scored. When the
+    matrix holds binary codes, the best candidates and the keyword matches
+    are re-ranked with their stored vectors.
+
+    Only the KEYWORD_CANDIDATES best full-text matches (by BM25) are boosted,
+    which bounds the cost of queries made of very common words. Further
+    matches rank among the semantic results, as if they had no keyword.
+
+    Args:
+        query: The raw query text.
+        query_embedding: The embedding of `query`.
+        limit: Maximum number of results.
+        nprobe: Number of ANN lists to probe. Higher is slower but closer to
+            exact search; 0 forces an exact scan.
+
+    Returns:
+        List[int]: Timestamps of the best matching entries, best first.
+    """
+    matrix = get_embedding_matrix()
+    index = get_ann_index(matrix)
+    boosts = _keyword_boosts(query)
+    boosted_ts = np.fromiter(boosts.keys(), dtype=np.int64, count=len(boosts))
+    boost_values = np.fromiter(boosts.values(), dtype=np.float64, count=len(boosts))
+
+    if nprobe > 0 and index.is_trained:
+        timestamps, sims = index.search(matrix, query_embedding, nprobe)
+        # Keyword matches outside the probed lists still need a semantic score
+        missing = boosted_ts[~np.isin(boosted_ts, timestamps)]
+        extra_ts, extra_sims = matrix.similarities_for(query_embedding, missing)
+        timestamps = np.concatenate([timestamps, extra_ts])
+        sims = np.concatenate([sims, extra_sims])
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, sims = timestamps[order], sims[order]
+    else:
+        timestamps, sims = matrix.similarities(query_embedding)
+
+    has_keyword = np.zeros(timestamps.shape[0], dtype=bool)
+    if boosts and timestamps.shape[0]:
+        # The snapshot is sorted by timestamp, so rows can be located by binary search
+        pos = np.minimum(np.searchsorted(timestamps, boosted_ts), timestamps.shape[0] - 1)
+        found = timestamps[pos] == boosted_ts
+        pos, boost_values = pos[found], boost_values[found]
+        has_keyword[pos] = True
+    if not matrix.exact:
+        candidates = top_k_indices(np.where(has_keyword, -np.inf, sims), RERANK_CANDIDATES)
+        rerank(query_embedding, timestamps, sims, np.union1d(candidates, np.flatnonzero(has_keyword)))
+
+    scores = sims.astype(np.float64) + timestamps / RECENCY_DIVISOR
+    if has_keyword.any():
+        scores[pos] += boost_values
+
+    keyword_idx = np.flatnonzero(has_keyword)
+    ranked = keyword_idx[top_k_indices(scores[keyword_idx], limit)]
+    remaining = min(limit - ranked.shape[0], timestamps.shape[0] - keyword_idx.shape[0])
+    if remaining > 0:
+        semantic_scores = np.where(has_keyword, -np.inf, scores)
+        ranked = np.concatenate([ranked, top_k_indices(semantic_scores, remaining)])
+    return [int(ts) for ts in timestamps[ranked]]
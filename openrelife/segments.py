@@ -0,0 +1,266 @@
+import io
+import os
+import struct
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from openrelife.change_detection import Rect, dirty_regions
+from openrelife.config import segments_path
+from openrelife.database import (
+    delete_frame_segments,
+    get_frame_segment,
+    get_segment_offsets,
+    insert_frame_segment,
+)
+
+# A new segment file is started once the current one grows past this size
+SEGMENT_MAX_BYTES: int = 64 * 1024 * 1024
+# Delta frames stored against one keyframe before a new keyframe is forced
+KEYFRAME_INTERVAL: int = 120
+# A frame whose tiles differ from its keyframe on more than this fraction is stored as a keyframe
+MAX_DELTA_FRACTION: float = 0.4
+# ... as is a frame whose delta would be larger than this fraction of the keyframe
+MAX_DELTA_RATIO: float = 0.5
+# Decoded keyframes kept to rebuild delta frames (scrubbing reads many deltas of one keyframe)
+KEYFRAME_CACHE_SIZE: int = 4
+# Rebuilt delta frames are served as JPEG of this quality (several times faster to encode than WebP)
+SERVE_QUALITY: int = 90
+
+# A delta record is its patch count, then each patch's position and length followed by its WebP bytes
+_DELTA_HEADER = struct.Struct("<H")
+_PATCH_HEADER = struct.Struct("<HHI")
+
+
+def _encode(image: Image.Image, save_kwargs: dict) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="webp", **save_kwargs)
+    return buffer.getvalue()
+
+
+def _encode_delta(image: Image.Image, regions: List[Rect], save_kwargs: dict) -> bytes:
+    parts = [_DELTA_HEADER.pack(len(regions))]
+    for x1, y1, x2, y2 in regions:
+        patch = _encode(image.crop((x1, y1, x2, y2)), save_kwargs)
+        parts.append(_PATCH_HEADER.pack(x1, y1, len(patch)))
+        parts.append(patch)
+    return b"".join(parts)
+
+
+def _decode(data: bytes) -> Image.Image:
+    with Image.open(io.BytesIO(data)) as image:
+        return image.convert("RGB")
+
+
+def _apply_delta(keyframe: Image.Image, data: bytes) -> Image.Image:
+    image = keyframe.copy()
+    (count,) = _DELTA_HEADER.unpack_from(data)
+    position = _DELTA_HEADER.size
+    for _ in range(count):
+        x, y, length = _PATCH_HEADER.unpack_from(data, position)
+        position += _PATCH_HEADER.size
+        image.paste(_decode(data[position:position + length]), (x, y))
+        position += length
+    return image
+
+
+class SegmentWriter:
+    """Packs the recorder's screenshots into append-only segment files.
+
+    Each monitor's frames are stored as a keyframe (a whole WebP) followed by
+    deltas: the rectangles where a frame differs from that keyframe, as WebP
+    patches. Every delta refers to its keyframe directly, so any frame is
+    rebuilt from at most two records. A segment is never reopened; a new one
+    (starting with new keyframes) begins after a restart or once it is full.
+    """
+
+    def __init__(self, root: str = segments_path, max_bytes: int = SEGMENT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.segment: Optional[str] = None
+        self._file = None
+        # monitor -> (keyframe pixels, keyframe offset, keyframe length, deltas since the keyframe)
+        self._keyframes: Dict[int, Tuple[np.ndarray, int, int, int]] = {}
+        # Held by deletions too, so a record is never erased while a delta is written against it
+        self.lock = threading.Lock()
+
+    def append(self, monitor: int, timestamp: int, image: Image.Image, save_kwargs: dict) -> None:
+        """Stores a screenshot of a monitor, as a delta when it is close enough to the last keyframe.
+
+        The image is encoded without holding `lock`, so the encode workers run
+        in parallel; only the write and its index row are serialized.
+        """
+        pixels = np.asarray(image)
+        while True:
+            with self.lock:
+                segment, keyframe = self.segment, self._keyframes.get(monitor)
+            delta = None
+            if keyframe is not None and keyframe[3] < KEYFRAME_INTERVAL:
+                regions = dirty_regions(keyframe[0], pixels, max_fraction=MAX_DELTA_FRACTION)
+                if regions is not None:
+                    delta = _encode_delta(image, regions, save_kwargs)
+                    if len(delta) > keyframe[2] * MAX_DELTA_RATIO:
+                        delta = None
+            data = _encode(image, save_kwargs) if delta is None else delta
+            with self.lock:
+                if self._file is None or self._file.tell() >= self.max_bytes:
+                    self._start_segment(timestamp)
+                if delta is None:
+                    offset, length = self._write(data)
+                    self._keyframes[monitor] = (pixels, offset, length, 0)
+                    insert_frame_segment(timestamp, self.segment, offset, length)
+                    return
+                current = self._keyframes.get(monitor)
+                if self.segment == segment and current is not None and current[1] == keyframe[1]:
+                    key_pixels, base_offset, base_length, deltas = current
+                    offset, length = self._write(data)
+                    self._keyframes[monitor] = (key_pixels, base_offset, base_length, deltas + 1)
+                    insert_frame_segment(timestamp, self.segment, offset, length, base_offset, base_length)
+                    return
+            # The keyframe was replaced, deleted or left in a full segment meanwhile: encode again
+
+    def forget(self, segment: str, offsets: Set[int]) -> None:
+        """Stops writing deltas against the given keyframes (deleted frames). Call with `lock` held."""
+        if segment != self.segment:
+            return
+        for monitor, keyframe in list(self._keyframes.items()):
+            if keyframe[1] in offsets:
+                del self._keyframes[monitor]
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.segment = None
+            self._keyframes.clear()
+
+    def _start_segment(self, timestamp: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.root, exist_ok=True)
+        self.segment = f"{timestamp}.seg"
+        self._file = open(os.path.join(self.root, self.segment), "xb")
+        self._keyframes.clear()
+
+    def _write(self, data: bytes) -> Tuple[int, int]:
+        offset = self._file.tell()
+        self._file.write(data)
+        # Readers open the segment separately, so the record must reach the OS before it is indexed
+        self._file.flush()
+        return offset, len(data)
+
+
+_writer: Optional[SegmentWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> SegmentWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SegmentWriter()
+        return _writer
+
+
+def close_writer() -> None:
+    """Closes the segment being written; called on shutdown, once the recorder has stopped."""
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+
+
+_keyframes: "OrderedDict[Tuple[str, int], Image.Image]" = OrderedDict()
+_keyframes_lock = threading.Lock()
+
+
+def _read(segment: str, offset: int, length: int) -> bytes:
+    with open(os.path.join(segments_path, segment), "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _keyframe(segment: str, offset: int, length: int) -> Image.Image:
+    key = (segment, offset)
+    with _keyframes_lock:
+        image = _keyframes.get(key)
+        if image is not None:
+            _keyframes.move_to_end(key)
+            return image
+    image = _decode(_read(segment, offset, length))
+    with _keyframes_lock:
+        _keyframes[key] = image
+        while len(_keyframes) > KEYFRAME_CACHE_SIZE:
+            _keyframes.popitem(last=False)
+    return image
+
+
+def load_frame(timestamp: int) -> Optional[Image.Image]:
+    """Rebuilds a packed screenshot, or returns None if it is not in a segment."""
+    row = get_frame_segment(timestamp)
+    if row is None:
+        return None
+    segment, offset, length, base_offset, base_length = row
+    if base_offset is None:
+        return _decode(_read(segment, offset, length))
+    return _apply_delta(_keyframe(segment, base_offset, base_length), _read(segment, offset, length))
+
+
+def read_frame(timestamp: int) -> Tuple[bytes, str]:
+    """Returns the encoded image and a strong ETag of a packed screenshot.
+
+    Keyframes are returned as stored (WebP); delta frames are rebuilt and
+    encoded as JPEG.
+
+    Raises:
+        FileNotFoundError: If the screenshot is not in a segment.
+    """
+    row = get_frame_segment(timestamp)
+    if row is None:
+        raise FileNotFoundError(f"No packed screenshot for {timestamp}")
+    segment, offset, length, base_offset, _ = row
+    etag = f"{os.path.splitext(segment)[0]}-{offset:x}"
+    if base_offset is None:
+        return _read(segment, offset, length), etag
+    buffer = io.BytesIO()
+    load_frame(timestamp).save(buffer, format="jpeg", quality=SERVE_QUALITY)
+    return buffer.getvalue(), etag
+
+
+def delete_frames(timestamps: List[int]) -> None:
+    """Removes packed screenshots.
+
+    A segment no longer used by any frame is deleted. In a segment still in
+    use, the records of the deleted frames (and keyframes no frame needs any
+    more) are overwritten with zeros; a deleted keyframe that remaining delta
+    frames are rebuilt from is kept until they are deleted too. No new delta
+    is written against the keyframe of a deleted frame.
+    """
+    writer = get_writer()
+    with writer.lock:
+        records: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for segment, offset, length, base_offset, base_length in delete_frame_segments(timestamps):
+            records[segment][offset] = length
+            if base_offset is not None:
+                records[segment][base_offset] = base_length
+        for segment, segment_records in records.items():
+            writer.forget(segment, set(segment_records))
+            path = os.path.join(segments_path, segment)
+            in_use = get_segment_offsets(segment)
+            try:
+                if not in_use and segment != writer.segment:
+                    os.remove(path)
+                    continue
+                with open(path, "r+b") as f:
+                    for offset, length in segment_records.items():
+                        if offset not in in_use:
+                            f.seek(offset)
+                            f.write(bytes(length))
+            except FileNotFoundError:
+                continue
+    with _keyframes_lock:
+        for key in [key for key in _keyframes if key[0] in records]:
+            del _keyframes[key]
@@ -0,0 +1,146 @@
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+from openrelife import segments
+from openrelife.config import args, screenshots_path, thumbnails_path
+from openrelife.image_cache import read_file
+
+# Screenshots are stored under one directory per hour (UTC, so DST and time zone changes never move them)
+SHARD_FORMAT: str = "%Y/%m/%d/%H"
+# Files moved by the migration before it pauses, and for how long, so a running recorder is not starved of IO
+MIGRATION_BATCH_SIZE: int = 1000
+MIGRATION_PAUSE: float = 0.05
+
+
+def shard_dir(timestamp: int) -> str:
+    """The sub-directory, relative to a storage root, of the file for a timestamp (µs)."""
+    moment = datetime.fromtimestamp(timestamp / 1000000, tz=timezone.utc)
+    return os.path.join(*moment.strftime(SHARD_FORMAT).split("/"))
+
+
+def sharded_path(root: str, timestamp: int) -> str:
+    return os.path.join(root, shard_dir(timestamp), f"{timestamp}.webp")
+
+
+def screenshot_path(timestamp: int) -> str:
+    """Where the screenshot of a timestamp is written (its parent directory may not exist yet)."""
+    return sharded_path(screenshots_path, timestamp)
+
+
+def find_screenshot(timestamp: int) -> Optional[str]:
+    """Returns the path of an existing screenshot, in the sharded or the legacy flat layout.
+
+    The sharded location is checked again last, so a file moved by a
+    concurrent migration between the two other checks is still found.
+    """
+    sharded = screenshot_path(timestamp)
+    legacy = os.path.join(screenshots_path, f"{timestamp}.webp")
+    for path in (sharded, legacy, sharded):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def save_screenshot(image: Image.Image, save_kwargs: dict, timestamp: int, monitor: int) -> None:
+    """Stores a screenshot with the configured storage engine (--storage-engine)."""
+    if args.storage_engine == "segments":
+        segments.get_writer().append(monitor, timestamp, image, save_kwargs)
+        return
+    path = screenshot_path(timestamp)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image.save(path, format="webp", **save_kwargs)
+
+
+def open_screenshot(timestamp: int) -> Optional[Image.Image]:
+    """Loads a screenshot from whichever engine stored it, or returns None if there is none."""
+    path = find_screenshot(timestamp)
+    if path is None:
+        return segments.load_frame(timestamp)
+    with Image.open(path) as image:
+        image.load()
+        return image.copy() if image.mode == "RGB" else image.convert("RGB")
+
+
+def read_screenshot(timestamp: int) -> Tuple[bytes, str]:
+    """Returns the encoded image (WebP, or JPEG for a packed delta frame) and a strong ETag.
+
+    Raises:
+        FileNotFoundError: If there is no screenshot for the timestamp.
+    """
+    path = find_screenshot(timestamp)
+    if path is None:
+        return segments.read_frame(timestamp)
+    return read_file(path)
+
+
+def delete_screenshots(timestamps: List[int]) -> None:
+    """Deletes the screenshots of the given timestamps, whichever engine stored them."""
+    for timestamp in timestamps:
+        path = find_screenshot(timestamp)
+        if path is not None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    segments.delete_frames(timestamps)
+
+
+def _shard_roots() -> List[str]:
+    """The screenshot folder and every rendition size folder, which share the sharded layout."""
+    roots = [screenshots_path]
+    if os.path.isdir(thumbnails_path):
+        roots.extend(os.path.join(thumbnails_path, size) for size in sorted(os.listdir(thumbnails_path)))
+    return roots
+
+
+def prune_empty_shards(timestamps: List[int]) -> None:
+    """Removes the hour, day, month and year folders of the given timestamps once they are empty."""
+    folders = {shard_dir(timestamp) for timestamp in timestamps}
+    for root in _shard_roots():
+        for folder in folders:
+            # Deepest first; os.rmdir fails on the first folder that still has files
+            parts = folder.split(os.sep)
+            for depth in range(len(parts), 0, -1):
+                try:
+                    os.rmdir(os.path.join(root, *parts[:depth]))
+                except OSError:
+                    break
+
+
+def _migrate_root(root: str) -> int:
+    moved = 0
+    if not os.path.isdir(root):
+        return 0
+    with os.scandir(root) as entries:
+        names = [entry.name for entry in entries if entry.is_file()]
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        if extension != ".webp" or not stem.isdigit():
+            continue
+        target = sharded_path(root, int(stem))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.replace(os.path.join(root, name), target)
+        except FileNotFoundError:
+            continue  # Deleted while migrating
+        moved += 1
+        if moved % MIGRATION_BATCH_SIZE == 0:
+            time.sleep(MIGRATION_PAUSE)
+    return moved
+
+
+def migrate_to_sharded_layout() -> int:
+    """Moves screenshots and renditions stored flat into the sharded layout.
+
+    Safe to run while OpenReLife is recording and serving: every reader looks
+    in both layouts, and each file is moved with a single atomic rename.
+    Running it again only moves what is still flat.
+
+    Returns:
+        The number of files moved.
+    """
+    return sum(_migrate_root(root) for root in _shard_roots())
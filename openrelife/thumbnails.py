@@ -0,0 +1,109 @@
+import io
+import os
+import threading
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from openrelife import segments
+from openrelife.config import thumbnails_path
+from openrelife.image_cache import read_file
+from openrelife.storage import find_screenshot, open_screenshot, sharded_path
+
+# Renditions served by /static/<timestamp>.webp?size=<name>, by their longest side in pixels
+RENDITION_SIZES = {"small": 320, "medium": 1280}
+# Lossy quality of the renditions; they are only shown while scrubbing and in result lists
+RENDITION_QUALITY: int = 70
+
+
+def rendition_path(timestamp: int, size: str) -> str:
+    return sharded_path(os.path.join(thumbnails_path, size), timestamp)
+
+
+def _downscale(image: Image.Image, max_side: int) -> Image.Image:
+    """Returns a copy of the image whose longest side is at most `max_side`."""
+    scale = max_side / max(image.size)
+    if scale >= 1:
+        return image.copy()
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # reducing_gap lets Pillow box-reduce first, so a 4K frame is not fully resampled
+    return image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+
+def _write(image: Image.Image, path: str) -> None:
+    """Writes atomically, so a concurrent reader never serves a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    image.save(tmp_path, format="webp", quality=RENDITION_QUALITY)
+    os.replace(tmp_path, path)
+
+
+def save_renditions(image: Image.Image, timestamp: int) -> None:
+    """Writes every rendition of a screenshot; called when the screenshot is saved.
+
+    Args:
+        image: The screenshot, at any resolution at least as large as the renditions.
+        timestamp: The timestamp of the screenshot's entry.
+    """
+    # Largest first: each smaller rendition is derived from the previous one
+    for size, max_side in sorted(RENDITION_SIZES.items(), key=lambda item: -item[1]):
+        image = _downscale(image, max_side)
+        _write(image, rendition_path(timestamp, size))
+
+
+def get_rendition(timestamp: int, size: str) -> Optional[str]:
+    """Returns the path of a rendition, generating it on first use.
+
+    Frames recorded before renditions existed are downscaled from the full
+    screenshot the first time they are requested.
+
+    Args:
+        timestamp: The timestamp of the screenshot.
+        size: A key of RENDITION_SIZES.
+
+    Returns:
+        The rendition's path, or None if there is no screenshot for the timestamp.
+    """
+    path = rendition_path(timestamp, size)
+    if os.path.exists(path):
+        return path
+    image = open_screenshot(timestamp)
+    if image is None:
+        return None
+    _write(_downscale(image, RENDITION_SIZES[size]), path)
+    return path
+
+
+def read_rendition(timestamp: int, size: str) -> Tuple[bytes, str]:
+    """Returns the encoded rendition of a screenshot and a strong ETag.
+
+    Screenshots packed into segments have no rendition files (that would
+    undo the point of packing them): their renditions are downscaled from
+    the rebuilt frame on each request, and kept by the caller's image cache.
+
+    Args:
+        timestamp: The timestamp of the screenshot.
+        size: A key of RENDITION_SIZES.
+
+    Raises:
+        FileNotFoundError: If there is no screenshot for the timestamp.
+    """
+    path = rendition_path(timestamp, size)
+    if not os.path.exists(path) and find_screenshot(timestamp) is None:
+        image = segments.load_frame(timestamp)
+        if image is None:
+            raise FileNotFoundError(f"No screenshot for {timestamp}")
+        buffer = io.BytesIO()
+        _downscale(image, RENDITION_SIZES[size]).save(buffer, format="webp", quality=RENDITION_QUALITY)
+        return buffer.getvalue(), f"{timestamp:x}-{size}"
+    path = get_rendition(timestamp, size)
+    if path is None:
+        raise FileNotFoundError(f"No screenshot for {timestamp}")
+    return read_file(path)
+
+
+def delete_renditions(timestamp: int) -> None:
+    for size in RENDITION_SIZES:
+        path = rendition_path(timestamp, size)
+        if os.path.exists(path):
+            os.remove(path)
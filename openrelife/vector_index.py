@@ -0,0 +1,346 @@
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from openrelife.embedding_format import VectorCodes, decode_blob
+
+logger = logging.getLogger(__name__)
+
+# Initial row capacity of the matrix; grows geometrically on append
+_INITIAL_CAPACITY: int = 1024
+
+
+class EmbeddingMatrix:
+    """Resident matrix of L2-normalized entry embeddings.
+
+    Rows are kept sorted by timestamp so that a timestamp can be mapped to its
+    row with a binary search. Cosine similarity against every stored entry is
+    then a single matrix-vector product.
+
+    The rows are held in the given --embedding-format (see VectorCodes):
+    float32, or float16 / int8 / binary codes for 2x / 4x / 32x less memory.
+    Binary similarities are estimates (`exact` is False), which callers
+    refine for their best candidates.
+    """
+
+    def __init__(self, dim: Optional[int] = None, fmt: str = "float32"):
+        self._lock = threading.RLock()
+        self._format: str = fmt
+        self._dim: Optional[int] = None
+        self._codec: Optional[VectorCodes] = None
+        self._size: int = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._timestamps: np.ndarray = np.empty(0, dtype=np.int64)
+        if dim is not None:
+            self._set_dim(dim)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    @property
+    def format(self) -> str:
+        return self._format
+
+    @property
+    def exact(self) -> bool:
+        """Whether `similarities` returns exact cosine similarities rather than estimates."""
+        return self._format != "binary"
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stored rows."""
+        return 0 if self._codec is None else self._size * self._codec.nbytes_per_row()
+
+    def _set_dim(self, dim: int) -> None:
+        self._dim = dim
+        self._codec = VectorCodes(self._format, dim)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Returns a float32 copy of `vectors` with unit-length rows (zero rows stay zero)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, capacity: int) -> None:
+        """Grows the backing buffers to hold at least `capacity` rows."""
+        current = 0 if self._vectors is None else self._vectors.shape[0]
+        if capacity <= current:
+            return
+        new_capacity = max(capacity, _INITIAL_CAPACITY, current * 2)
+        vectors = np.zeros((new_capacity, self._codec.width), dtype=self._codec.dtype)
+        scales = np.zeros(new_capacity, dtype=np.float32) if self._codec.has_scales else None
+        timestamps = np.zeros(new_capacity, dtype=np.int64)
+        if self._size:
+            vectors[: self._size] = self._vectors[: self._size]
+            timestamps[: self._size] = self._timestamps[: self._size]
+            if scales is not None:
+                scales[: self._size] = self._scales[: self._size]
+        self._vectors = vectors
+        self._scales = scales
+        self._timestamps = timestamps
+
+    def _rows(self, pos) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """The (codes, scales) of the rows at `pos` (an index array or slice)."""
+        return self._vectors[pos], None if self._scales is None else self._scales[pos]
+
+    def load(self, rows: Iterable[Tuple[int, bytes]]) -> None:
+        """Replaces the matrix contents with the given (timestamp, embedding blob) rows.
+
+        Blobs are decoded and encoded a chunk at a time, so loading needs
+        little more memory than the encoded rows.
+
+        Args:
+            rows: Iterable of (timestamp, embedding blob) pairs, in any format of `decode_blob`.
+        """
+        timestamps = []
+        codes = []
+        scales = []
+        chunk = []
+
+        def flush():
+            encoded, chunk_scales = self._codec.encode(self._normalize(np.vstack(chunk)))
+            codes.append(encoded)
+            if chunk_scales is not None:
+                scales.append(chunk_scales)
+            chunk.clear()
+
+        for timestamp, blob in rows:
+            if not blob:
+                continue
+            vector = decode_blob(blob)
+            if self._dim is None:
+                self._set_dim(vector.shape[0])
+            if vector.shape[0] != self._dim:
+                continue
+            timestamps.append(timestamp)
+            chunk.append(vector)
+            if len(chunk) == VectorCodes.CHUNK_ROWS:
+                flush()
+        if chunk:
+            flush()
+
+        with self._lock:
+            self._size = 0
+            if self._dim is None:
+                return
+            self._reserve(len(timestamps))
+            if not timestamps:
+                return
+            order = np.argsort(np.asarray(timestamps, dtype=np.int64), kind="stable")
+            self._vectors[: len(timestamps)] = np.concatenate(codes)[order]
+            if self._scales is not None:
+                self._scales[: len(timestamps)] = np.concatenate(scales)[order]
+            self._timestamps[: len(timestamps)] = np.asarray(timestamps, dtype=np.int64)[order]
+            self._size = len(timestamps)
+        logger.info(f"Loaded {self._size} embeddings into the search matrix ({self._format}).")
+
+    def add(self, timestamp: int, embedding: np.ndarray) -> bool:
+        """Adds (or replaces) the embedding for `timestamp`.
+
+        Returns:
+            True if the vector was stored, False if its dimension does not match.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            if self._dim is None:
+                self._set_dim(embedding.shape[0])
+            if embedding.shape[0] != self._dim:
+                return False
+            codes, scales = self._codec.encode(self._normalize(embedding))
+            pos = self.position(timestamp)
+            if pos is None:
+                self._reserve(self._size + 1)
+                pos = int(np.searchsorted(self._timestamps[: self._size], timestamp))
+                if pos < self._size:
+                    # Out-of-order insert (rare): shift the tail down by one row
+                    self._vectors[pos + 1 : self._size + 1] = self._vectors[pos : self._size]
+                    self._timestamps[pos + 1 : self._size + 1] = self._timestamps[pos : self._size]
+                    if self._scales is not None:
+                        self._scales[pos + 1 : self._size + 1] = self._scales[pos : self._size]
+                self._timestamps[pos] = timestamp
+                self._size += 1
+            self._vectors[pos] = codes[0]
+            if self._scales is not None:
+                self._scales[pos] = scales[0]
+            return True
+
+    def remove(self, timestamps: Iterable[int]) -> int:
+        """Removes the rows for the given timestamps.
+
+        Returns:
+            The number of rows removed.
+        """
+        targets = np.asarray(list(timestamps), dtype=np.int64)
+        with self._lock:
+            if not self._size or not targets.size:
+                return 0
+            keep = ~np.isin(self._timestamps[: self._size], targets)
+            kept = int(keep.sum())
+            removed = self._size - kept
+            if removed:
+                self._vectors[:kept] = self._vectors[: self._size][keep]
+                if self._scales is not None:
+                    self._scales[:kept] = self._scales[: self._size][keep]
+                self._timestamps[:kept] = self._timestamps[: self._size][keep]
+                self._size = kept
+            return removed
+
+    def position(self, timestamp: int) -> Optional[int]:
+        """Returns the row index holding `timestamp`, or None if it is not stored."""
+        pos = int(np.searchsorted(self._timestamps[: self._size], timestamp))
+        if pos < self._size and self._timestamps[pos] == timestamp:
+            return pos
+        return None
+
+    def similarities(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Computes the cosine similarity of `query` against every stored row.
+
+        Args:
+            query: The query embedding (need not be normalized).
+
+        Returns:
+            A (timestamps, similarities) pair of equally sized arrays, sorted by
+            timestamp ascending. Both are copies and safe to use without the lock.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        with self._lock:
+            timestamps = self._timestamps[: self._size].copy()
+            if not self._size or query.shape[0] != self._dim:
+                return timestamps, np.zeros(self._size, dtype=np.float32)
+            sims = self._codec.scores(*self._rows(slice(0, self._size)), self._normalize(query))
+        return timestamps, np.clip(sims, -1.0, 1.0)
+
+    def timestamps(self) -> np.ndarray:
+        """Returns a copy of the stored timestamps, sorted ascending."""
+        with self._lock:
+            return self._timestamps[: self._size].copy()
+
+    def _positions(self, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Maps timestamps to row indices, returning (found timestamps, positions)."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if not self._size or not timestamps.size:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.intp)
+        stored = self._timestamps[: self._size]
+        pos = np.minimum(np.searchsorted(stored, timestamps), self._size - 1)
+        found = stored[pos] == timestamps
+        return timestamps[found], pos[found]
+
+    def vectors_for(self, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (found timestamps, normalized vectors) for the given timestamps.
+
+        The vectors are decoded from the stored format, so they are approximate unless it is float32.
+        """
+        with self._lock:
+            found, pos = self._positions(timestamps)
+            if self._vectors is None:
+                return found, np.empty((0, self._dim or 0), dtype=np.float32)
+            return found, self._codec.decode(*self._rows(pos))
+
+    def similarities_for(
+        self, query: np.ndarray, timestamps: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Computes the cosine similarity of `query` against the given rows only.
+
+        Returns:
+            A (timestamps, similarities) pair for the timestamps that are stored.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        with self._lock:
+            found, pos = self._positions(timestamps)
+            if not found.size or query.shape[0] != self._dim:
+                return found, np.zeros(found.shape[0], dtype=np.float32)
+            sims = self._codec.scores(*self._rows(pos), self._normalize(query))
+        return found, np.clip(sims, -1.0, 1.0)
+
+    def top_k(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the `k` most similar rows as (timestamps, similarities), best first."""
+        timestamps, sims = self.similarities(query)
+        order = top_k_indices(sims, k)
+        return timestamps[order], sims[order]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Returns the indices of the `k` largest scores, ordered best first.
+
+    Uses `argpartition` so only the selected candidates are fully sorted.
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+# Global matrix cache, loaded from the database on first use
+_matrix_cache: Optional[EmbeddingMatrix] = None
+_matrix_lock = threading.Lock()
+# Insertions and deletions that happen while the matrix loads, replayed once it has
+_pending: Optional[List[Tuple[str, object]]] = None
+_pending_lock = threading.Lock()
+
+
+def get_embedding_matrix() -> EmbeddingMatrix:
+    """Lazy load the embedding matrix from the database.
+
+    Entries inserted or deleted while the matrix is loading are applied to
+    it before it is returned, so none is missed until the next restart.
+    """
+    global _matrix_cache, _pending
+    if _matrix_cache is None:
+        with _matrix_lock:
+            if _matrix_cache is None:
+                from openrelife.config import args
+                from openrelife.database import iter_embeddings
+
+                with _pending_lock:
+                    _pending = []
+                matrix = EmbeddingMatrix(fmt=args.embedding_format)
+                try:
+                    matrix.load(iter_embeddings())
+                except BaseException:
+                    with _pending_lock:
+                        _pending = None
+                    raise
+                with _pending_lock:
+                    # Events the load already saw are harmless: add replaces, remove skips missing rows
+                    for event, value in _pending:
+                        if event == "insert":
+                            matrix.add(*value)
+                        else:
+                            matrix.remove(value)
+                    _pending = None
+                    _matrix_cache = matrix
+    return _matrix_cache
+
+
+def on_entry_inserted(timestamp: int, embedding: np.ndarray) -> None:
+    """Keeps the resident matrix in sync with a newly inserted entry."""
+    with _pending_lock:
+        if _pending is not None:
+            _pending.append(("insert", (timestamp, embedding)))
+            return
+    if _matrix_cache is not None:
+        _matrix_cache.add(timestamp, embedding)
+
+
+def on_entries_deleted(timestamps: Iterable[int]) -> None:
+    """Keeps the resident matrix in sync with deleted entries."""
+    timestamps = list(timestamps)
+    with _pending_lock:
+        if _pending is not None:
+            _pending.append(("delete", timestamps))
+            return
+    if _matrix_cache is not None:
+        _matrix_cache.remove(timestamps)
@@ -25,6 +25,7 @@ extras_require = {
     "windows": ["pywin32", "psutil"],
     "macos": ["pyobjc==10.3"],
     "linux": [],
+    "onnx": ["onnxruntime"],
     "python-doctr": [
         "python-doctr @ git+https://github.com/koenvaneijk/doctr.git@af711bc04eb8876a7189923fb51ec44481ee18cd"
     ],
@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from openrelife import database, segments, storage, thumbnails
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An empty local store in `tmp_path`: database, screenshots, renditions and segments."""
+    database.close_connection()
+    monkeypatch.setattr(database, "db_path", str(tmp_path / "recall.db"))
+    monkeypatch.setattr(storage, "screenshots_path", str(tmp_path / "screenshots"))
+    monkeypatch.setattr(storage, "thumbnails_path", str(tmp_path / "thumbnails"))
+    monkeypatch.setattr(thumbnails, "thumbnails_path", str(tmp_path / "thumbnails"))
+    monkeypatch.setattr(segments, "segments_path", str(tmp_path / "segments"))
+    monkeypatch.setattr(storage.args, "storage_engine", "files")
+    writer = segments.SegmentWriter(root=segments.segments_path)
+    monkeypatch.setattr(segments, "_writer", writer)
+    segments._keyframes.clear()
+    os.makedirs(storage.screenshots_path)
+    database.create_db()
+    yield tmp_path
+    writer.close()
+    database.close_connection()
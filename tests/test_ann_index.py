@@ -0,0 +1,112 @@
+import threading
+
+import numpy as np
+import pytest
+
+from openrelife import ann_index
+from openrelife.ann_index import IVFIndex
+from openrelife.vector_index import EmbeddingMatrix
+
+
+@pytest.fixture
+def matrix(monkeypatch):
+    monkeypatch.setattr(ann_index, "MIN_TRAIN_ROWS", 100)
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(20, 16))
+    vectors = centers[rng.integers(0, 20, 2000)] + 0.05 * rng.normal(size=(2000, 16))
+    m = EmbeddingMatrix()
+    m.load((ts, vec.astype(np.float32).tobytes()) for ts, vec in enumerate(vectors))
+    return m
+
+
+def test_untrained_below_threshold(monkeypatch):
+    m = EmbeddingMatrix()
+    m.add(1, np.ones(4))
+    index = IVFIndex()
+    index.build(m)
+    assert not index.is_trained
+
+
+def test_build_and_recall(matrix):
+    index = IVFIndex()
+    index.build(matrix)
+    assert index.is_trained
+    assert len(index) == len(matrix)
+
+    query = matrix.vectors_for(np.array([42]))[1][0]
+    timestamps, sims = index.search(matrix, query, nprobe=4)
+    assert 42 in timestamps
+    assert len(timestamps) < len(matrix)
+    exact_ts, _ = matrix.top_k(query, 10)
+    ann_ts = timestamps[np.argsort(-sims)[:10]]
+    assert len(set(exact_ts) & set(ann_ts)) >= 9
+
+
+def test_add_and_remove(matrix):
+    index = IVFIndex()
+    index.build(matrix)
+    vector = np.ones(16)
+    matrix.add(5000, vector)
+    index.add(5000, vector)
+    assert 5000 in index.search(matrix, vector, nprobe=1)[0]
+
+    index.remove([5000, 42])
+    matrix.remove([5000, 42])
+    assert len(index) == len(matrix)
+    assert 5000 not in index.candidates(vector, nprobe=index.nlist)
+
+
+def test_save_load_and_sync(matrix, tmp_path):
+    path = str(tmp_path / "ann.npz")
+    index = IVFIndex(path)
+    index.build(matrix)
+
+    # Rows changed while the index was not loaded are reconciled by sync()
+    matrix.remove([0, 1])
+    matrix.add(9999, np.ones(16))
+    restored = IVFIndex(path)
+    assert restored.load()
+    assert restored.nlist == index.nlist
+    restored.sync(matrix)
+    assert len(restored) == len(matrix)
+    assert 9999 in restored.candidates(np.ones(16), nprobe=restored.nlist)
+    assert 0 not in restored.candidates(np.ones(16), nprobe=restored.nlist)
+
+
+def test_load_missing_or_corrupt(tmp_path):
+    assert not IVFIndex(str(tmp_path / "missing.npz")).load()
+    corrupt = tmp_path / "corrupt.npz"
+    corrupt.write_bytes(b"not an npz")
+    assert not IVFIndex(str(corrupt)).load()
+
+
+def test_add_keeps_timestamps_sorted(matrix):
+    index = IVFIndex()
+    index.build(matrix)
+    for timestamp in (6000, 6001, 5500, 6001, 7000):
+        index.add(timestamp, np.ones(16))
+    timestamps = index.candidates(np.ones(16), nprobe=index.nlist)
+    assert np.array_equal(timestamps, np.sort(timestamps))
+    assert len(index) == len(matrix) + 4
+
+
+def test_concurrent_saves_leave_a_valid_file(matrix, tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, "SAVE_EVERY", 1)
+    path = str(tmp_path / "ann.npz")
+    index = IVFIndex(path)
+    index.build(matrix)
+
+    def record(start):
+        for timestamp in range(start, start + 20):
+            index.add(timestamp, np.ones(16))
+            index.remove([timestamp - 10000])
+
+    threads = [threading.Thread(target=record, args=(10000 + i * 100,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    index.save()
+    restored = IVFIndex(path)
+    assert restored.load()
+    assert len(restored) == len(index)
@@ -0,0 +1,34 @@
+import numpy as np
+
+from openrelife.capture import rgb_view, to_image
+
+
+def _bgra(width=7, height=5):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+
+
+def test_rgb_view_does_not_copy():
+    bgra = _bgra()
+    raw = bytearray(bgra.tobytes())
+    view = rgb_view(raw, 7, 5)
+    assert view.shape == (5, 7, 3)
+    assert np.array_equal(view, bgra[..., [2, 1, 0]])
+    raw[2] = (raw[2] + 1) % 256
+    assert view[0, 0, 0] == raw[2]
+
+
+def test_to_image_decodes_bgrx_buffer():
+    bgra = _bgra()
+    view = rgb_view(bytearray(bgra.tobytes()), 7, 5)
+    image = to_image(view)
+    assert image.mode == "RGB"
+    assert np.array_equal(np.asarray(image), bgra[..., [2, 1, 0]])
+
+
+def test_to_image_accepts_plain_arrays():
+    rgb = np.ascontiguousarray(_bgra()[..., :3])
+    assert np.array_equal(np.asarray(to_image(rgb)), rgb)
+    # A slice of a view is not the whole buffer and goes through fromarray
+    view = rgb_view(bytearray(_bgra().tobytes()), 7, 5)[1:3]
+    assert np.array_equal(np.asarray(to_image(view)), view)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from openrelife.change_detection import (
+    ChangeDetector,
+    FastChangeDetector,
+    MSSIMDetector,
+    difference_hash,
+    get_change_detector,
+    gray_thumbnail,
+    mean_structured_similarity_index,
+)
+
+
+def _text_screen(seed, shape=(540, 960)):
+    rng = np.random.default_rng(seed)
+    image = np.full(shape + (3,), 245, dtype=np.uint8)
+    for y in range(20, shape[0] - 20, 24):
+        for x in range(20, shape[1] - 80, 90):
+            if rng.random() < 0.7:
+                image[y : y + 10, x : x + int(rng.integers(30, 80))] = 20
+    return image
+
+
+def test_gray_thumbnail_is_small_and_float32():
+    thumb = gray_thumbnail(np.zeros((2160, 3840, 3), dtype=np.uint8), max_side=256)
+    assert thumb.dtype == np.float32
+    assert max(thumb.shape) <= 256
+
+
+def test_difference_hash_is_stable_and_discriminative():
+    a = gray_thumbnail(_text_screen(0))
+    assert np.array_equal(difference_hash(a), difference_hash(a.copy()))
+    assert difference_hash(a).shape == (64,)
+    b = gray_thumbnail(255 - _text_screen(1))
+    assert np.count_nonzero(difference_hash(a) != difference_hash(b)) > 0
+
+
+@pytest.mark.parametrize("name", ["fast", "mssim"])
+def test_detectors_agree_on_clear_cases(name):
+    detector = get_change_detector(name)
+    screen = _text_screen(0)
+    assert detector.is_similar(screen, screen.copy())
+
+    typed = screen.copy()
+    typed[500:510, 20:60] = 20
+    assert detector.is_similar(screen, typed)
+
+    assert not detector.is_similar(screen, 255 - _text_screen(1))
+    assert not detector.is_similar(screen, np.roll(screen, 12, axis=0))
+
+
+def test_fast_detector_handles_shape_change_and_caches_thumbnails():
+    detector = FastChangeDetector()
+    screen = _text_screen(0)
+    assert detector.similarity(screen, np.zeros((10, 10, 3), dtype=np.uint8)) == 0.0
+    detector.similarity(screen, screen.copy())
+    assert id(screen) in detector._thumbnails
+    del screen
+    detector.similarity(_text_screen(2), _text_screen(3))
+    # Thumbnails of frames that no longer exist are dropped
+    assert len(detector._thumbnails) == 0
+
+
+def test_mssim_detector_matches_function():
+    a, b = _text_screen(0), _text_screen(1)
+    assert MSSIMDetector().similarity(a, b) == mean_structured_similarity_index(a, b)
+
+
+def test_unknown_detector():
+    with pytest.raises(ValueError):
+        get_change_detector("nope")
+
+
+def test_detectors_must_implement_similarity():
+    class Incomplete(ChangeDetector):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -1,3 +1,4 @@
+import datetime
 import unittest
 import sqlite3
 import os
@@ -20,8 +21,17 @@ with patch('openrelife.config.db_path', mock_db_path):
     from openrelife.database import (
         create_db,
         insert_entry,
+        insert_entries,
         get_all_entries,
         get_timestamps,
+        get_timestamps_page,
+        get_timeline_summary,
+        search_text,
+        update_ai_ocr,
+        delete_entries,
+        get_entry_by_timestamp,
+        close_connection,
+        migrate_embeddings,
         Entry,
     )
     # Also patch db_path within the database module itself if it was imported directly there
@@ -48,7 +58,10 @@ class TestDatabase(unittest.TestCase):
                 cls.conn.close()
         except Exception:
             pass # Ignore errors during cleanup
-        os.remove(cls.db_path)
+        close_connection()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(cls.db_path + suffix):
+                os.remove(cls.db_path + suffix)
         # Clean up sys.path modification
         sys.path.pop(0)
 
@@ -126,6 +139,26 @@ class TestDatabase(unittest.TestCase):
         text = cursor.fetchone()[0]
         self.assertEqual(text, "First text") # Ensure the first one was kept
 
+    def test_insert_entries_batch(self):
+        """Test batch insertion, skipping duplicates in the table and in the batch."""
+        ts = int(time.time())
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        insert_entry("Existing", ts, emb, "App", "Title")
+
+        inserted = insert_entries([
+            ("Duplicate of existing", ts, emb, "App", "Title", None),
+            ("New 1", ts + 1, emb, "App", "Title", [{'text': 'New', 'x1': 0, 'y1': 0, 'x2': 1, 'y2': 1}]),
+            ("New 2", ts + 2, emb, "App", "Title", []),
+            ("Duplicate in batch", ts + 2, emb, "App", "Title", []),
+        ])
+        self.assertEqual(inserted, 2)
+        self.assertEqual(insert_entries([]), 0)
+
+        entries = {e.timestamp: e for e in get_all_entries()}
+        self.assertEqual(entries[ts].text, "Existing")
+        self.assertEqual(entries[ts + 1].words_coords[0]['text'], "New")
+        self.assertEqual(entries[ts + 2].text, "New 2")
+
     def test_get_all_entries_empty(self):
         """Test getting entries from an empty database."""
         entries = get_all_entries()
@@ -163,6 +196,15 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(entries[2].text, "Text 3")
         np.testing.assert_array_almost_equal(entries[2].embedding, emb3)
 
+    def test_get_all_entries_range(self):
+        """Test fetching a bounded range of entries, newest first."""
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        insert_entries([("T", ts, emb, "A", "T", None) for ts in range(10, 20)])
+        entries = get_all_entries(min_timestamp=12, max_timestamp=17, columns=('timestamp', 'text'))
+        self.assertEqual([e.timestamp for e in entries], [16, 15, 14, 13])
+        entries = get_all_entries(limit=2, max_timestamp=17, columns=('timestamp',))
+        self.assertEqual([e.timestamp for e in entries], [16, 15])
+
     def test_get_timestamps_empty(self):
         """Test getting timestamps from an empty database."""
         timestamps = get_timestamps()
@@ -184,6 +226,245 @@ class TestDatabase(unittest.TestCase):
         # Timestamps should be ordered DESC
         self.assertEqual(timestamps, [ts2, ts1, ts3])
 
+    def test_inserts_are_pushed_to_live_clients(self):
+        """Test that stored entries are published to event subscribers with their ids."""
+        from openrelife.events import get_broker
+
+        subscription = get_broker().subscribe()
+        try:
+            emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+            insert_entries([("One", 500, emb, "A", "T", None), ("Two", 501, emb, "A", "T", None)])
+            insert_entry("Three", 502, emb, "A", "T")
+            _, batch = subscription.get(timeout=1)
+            _, single = subscription.get(timeout=1)
+        finally:
+            get_broker().unsubscribe(subscription)
+        self.assertEqual(batch['timestamps'], [501, 500])
+        self.assertEqual(batch['entries'][500]['text'], "One")
+        ids = {e.timestamp: e.id for e in get_all_entries(columns=('id', 'timestamp'))}
+        self.assertEqual(batch['entries'][501]['id'], ids[501])
+        self.assertEqual(single['timestamps'], [502])
+
+    def test_get_timestamps_page(self):
+        """Test keyset pagination in both directions."""
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        insert_entries([("T", ts, emb, "A", "T", None) for ts in range(100, 110)])
+
+        self.assertEqual(get_timestamps_page(limit=3), [109, 108, 107])
+        self.assertEqual(get_timestamps_page(before=107, limit=3), [106, 105, 104])
+        self.assertEqual(get_timestamps_page(after=101, limit=3), [104, 103, 102])
+        self.assertEqual(get_timestamps_page(before=105, after=101, limit=10), [104, 103, 102])
+        self.assertEqual(get_timestamps_page(before=100, limit=3), [])
+
+    def test_get_timeline_summary(self):
+        """Test the per-day and per-hour rollups, kept up to date on insert and delete."""
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        day = datetime.datetime(2024, 5, 1, 9, 30)
+        stamps = [
+            int(day.timestamp() * 1000000),
+            int((day + datetime.timedelta(minutes=10)).timestamp() * 1000000),
+            int((day + datetime.timedelta(hours=2)).timestamp() * 1000000),
+            int((day + datetime.timedelta(days=1)).timestamp() * 1000000),
+        ]
+        apps = ["Editor", "Browser", "Editor", "Mail"]
+        insert_entries([("T", ts, emb, app, "T", None) for ts, app in zip(stamps, apps)])
+
+        days = get_timeline_summary()
+        self.assertEqual([d['period'] for d in days], ["2024-05-02", "2024-05-01"])
+        self.assertEqual(days[1], {
+            'period': "2024-05-01", 'count': 3, 'first': stamps[0], 'last': stamps[2],
+            'apps': [{'app': "Editor", 'count': 2}, {'app': "Browser", 'count': 1}],
+        })
+        self.assertEqual(get_timeline_summary(top_apps=1)[1]['apps'], [{'app': "Editor", 'count': 2}])
+        hours = get_timeline_summary("hour")
+        self.assertEqual([h['count'] for h in hours], [1, 1, 2])
+        self.assertEqual(hours[-1]['period'], "2024-05-01 09:00")
+        with self.assertRaises(ValueError):
+            get_timeline_summary("week")
+
+        # Deleting a day's first and last frames moves its bounds; deleting all of a day drops it
+        delete_entries([stamps[0], stamps[2], stamps[3]])
+        days = get_timeline_summary()
+        self.assertEqual(days, [{
+            'period': "2024-05-01", 'count': 1, 'first': stamps[1], 'last': stamps[1],
+            'apps': [{'app': "Browser", 'count': 1}],
+        }])
+        self.assertEqual([h['count'] for h in get_timeline_summary("hour")], [1])
+
+    def test_activity_rollup_backfill(self):
+        """Test that existing entries are rolled up when the rollup tables are created."""
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        base = int(datetime.datetime(2024, 6, 1, 12).timestamp() * 1000000)
+        insert_entries([("T", base + i, emb, "App", "T", None) for i in range(5)])
+        expected = get_timeline_summary()
+
+        cursor = self.conn.cursor()
+        cursor.execute("DROP TABLE activity_offsets")
+        for table in ("activity_days", "activity_hours", "activity_day_apps"):
+            cursor.execute(f"DROP TABLE {table}")
+            for op in ("insert", "delete"):
+                cursor.execute(f"DROP TRIGGER {table}_{op}")
+        self.conn.commit()
+        create_db()
+        self.assertEqual(get_timeline_summary(), expected)
+        self.assertEqual(expected[0]['count'], 5)
+
+    def test_activity_rollup_keeps_periods_across_time_zone_changes(self):
+        """Test that frames stay in the periods they were recorded in when the time zone changes."""
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        ts = int(datetime.datetime(2024, 5, 1, 23, 30, tzinfo=datetime.timezone.utc).timestamp() * 1000000)
+        try:
+            with patch.dict(os.environ, {"TZ": "UTC"}):
+                time.tzset()
+                insert_entries([("T", ts + i, emb, "App", "T", None) for i in range(2)])
+            with patch.dict(os.environ, {"TZ": "Asia/Kolkata"}):
+                time.tzset()
+                insert_entries([("T", ts + 2, emb, "App", "T", None)])
+                self.assertEqual(
+                    [(d['period'], d['count']) for d in get_timeline_summary()],
+                    [("2024-05-02", 1), ("2024-05-01", 2)],
+                )
+                # Recorded before the first two: they keep their periods
+                insert_entries([("T", ts - 1, emb, "App", "T", None)])
+                self.assertEqual([h['period'] for h in get_timeline_summary("hour")][-1], "2024-05-01 23:00")
+                delete_entries([ts - 1, ts, ts + 1])
+                self.assertEqual(
+                    [(d['period'], d['count']) for d in get_timeline_summary()], [("2024-05-02", 1)]
+                )
+                self.assertEqual([h['period'] for h in get_timeline_summary("hour")], ["2024-05-02 05:00"])
+        finally:
+            time.tzset()
+
+    def test_duplicate_insert_keeps_activity_offsets(self):
+        """Test that re-inserting a stored frame after a time zone change records no offset."""
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        ts = int(datetime.datetime(2024, 6, 1, 23, 30, tzinfo=datetime.timezone.utc).timestamp() * 1000000)
+        offsets = "SELECT since, utc_offset FROM activity_offsets ORDER BY since"
+        try:
+            with patch.dict(os.environ, {"TZ": "UTC"}):
+                time.tzset()
+                insert_entries([("T", ts + i, emb, "App", "T", None) for i in range(2)])
+            expected = self.conn.execute(offsets).fetchall()
+            with patch.dict(os.environ, {"TZ": "Asia/Kolkata"}):
+                time.tzset()
+                insert_entries([("T", ts + 1, emb, "App", "T", None)])
+                insert_entry("T", ts, emb, "App", "T")
+                self.assertEqual(self.conn.execute(offsets).fetchall(), expected)
+                self.assertEqual(
+                    [(d['period'], d['count']) for d in get_timeline_summary()], [("2024-06-01", 2)]
+                )
+        finally:
+            time.tzset()
+
+    def test_search_text_fts(self):
+        """Test full-text candidates, including sync through the FTS triggers."""
+        ts = int(time.time())
+        emb = np.array([0.1] * 5, dtype=np.float32)
+        insert_entry("Quarterly budget review", ts, emb, "A1", "T1")
+        insert_entry("Holiday photos", ts + 1, emb, "A2", "T2")
+        insert_entry("Budgeting spreadsheet", ts + 2, emb, "A3", "T3")
+
+        found = {row[0] for row in search_text("budget", 10)}
+        self.assertEqual(found, {ts, ts + 2})
+
+        # Substring matches behave like the previous `word in text` keyword check
+        self.assertEqual({row[0] for row in search_text("liday", 10)}, {ts + 1})
+
+        # AI OCR text is indexed through the update trigger
+        update_ai_ocr(ts + 1, "Beach budget receipt", [])
+        found = {row[0] for row in search_text("receipt", 10)}
+        self.assertEqual(found, {ts + 1})
+
+        # Deleted entries disappear from the index
+        delete_entries([ts])
+        found = {row[0] for row in search_text("budget", 10)}
+        self.assertEqual(found, {ts + 1, ts + 2})
+
+    def test_search_text_short_words(self):
+        """Test that words shorter than a trigram still match via the LIKE fallback."""
+        ts = int(time.time())
+        emb = np.array([0.1] * 5, dtype=np.float32)
+        insert_entry("Go to PR 42", ts, emb, "A1", "T1")
+        insert_entry("Nothing here", ts + 1, emb, "A2", "T2")
+
+        self.assertEqual([row[0] for row in search_text("pr", 10)], [ts])
+        self.assertEqual(search_text("   ", 10), [])
+
+    def test_search_text_looks_up_fts_once(self):
+        """Test that the FTS table is looked up once per connection, not on every search."""
+        search_text("budget", 10)
+        statements = []
+        conn = openrelife.database.get_connection()
+        conn.set_trace_callback(statements.append)
+        try:
+            search_text("budget", 10)
+            search_text("holiday", 10)
+        finally:
+            conn.set_trace_callback(None)
+        self.assertFalse([sql for sql in statements if "sqlite_master" in sql])
+        self.assertTrue([sql for sql in statements if "entries_fts MATCH" in sql])
+
+    def test_column_projection_and_lazy_decoding(self):
+        """Test that projected entries only carry the selected columns, decoded on access."""
+        ts = int(time.time())
+        emb = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        coords = [{'text': 'hi', 'x1': 0.1, 'y1': 0.1, 'x2': 0.2, 'y2': 0.2}]
+        insert_entry("hi", ts, emb, "App", "Title", coords)
+
+        entry = get_all_entries(columns=("timestamp", "text"))[0]
+        self.assertEqual(entry.text, "hi")
+        self.assertIsNone(entry.embedding)
+        self.assertIsNone(entry.app)
+        self.assertEqual(entry.words_coords, [])
+
+        entry = get_entry_by_timestamp(ts)
+        self.assertIsInstance(entry._words_coords, str)
+        self.assertEqual(entry.words_coords, coords)
+        self.assertIsInstance(entry._words_coords, list)
+        np.testing.assert_array_almost_equal(entry.embedding, emb)
+        self.assertEqual(entry.ai_words_coords, [])
+
+        with self.assertRaises(ValueError):
+            get_all_entries(columns=("timestamp", "1; DROP TABLE entries"))
+
+    def test_entry_invalid_coords(self):
+        """Test that corrupt coordinate JSON decodes to an empty list."""
+        entry = Entry(timestamp=1, words_coords="{not json", ai_words_coords=None)
+        self.assertEqual(entry.words_coords, [])
+        self.assertEqual(entry.ai_words_coords, [])
+
+    def test_connection_reuse_and_wal(self):
+        """Test that each thread reuses one WAL-mode connection."""
+        import threading
+        from openrelife.database import get_connection
+
+        conn = get_connection()
+        self.assertIs(conn, get_connection())
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+
+    def test_migrate_embeddings(self):
+        """Test converting stored embeddings between formats."""
+        from openrelife.embedding_format import blob_format
+
+        embedding = np.linspace(-1, 1, 384, dtype=np.float32)
+        for ts in range(1, 6):
+            insert_entry(f"text {ts}", ts, embedding * ts, "App", "Title")
+        self.assertEqual(migrate_embeddings("int8", batch_size=2, pause=0), 5)
+        self.assertEqual(migrate_embeddings("binary", batch_size=2, pause=0), 0)
+        cursor = self.conn.cursor()
+        blobs = [row[0] for row in cursor.execute("SELECT embedding FROM entries")]
+        self.assertEqual({blob_format(blob) for blob in blobs}, {"int8"})
+        self.assertLess(max(len(blob) for blob in blobs), 400)
+        np.testing.assert_allclose(get_entry_by_timestamp(3).embedding, embedding * 3, atol=0.03)
+        self.assertEqual(migrate_embeddings("float32", batch_size=2, pause=0), 5)
+        self.assertEqual(len(get_entry_by_timestamp(3).embedding), 384)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
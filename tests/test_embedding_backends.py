@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from openrelife import embedding_backends
+from openrelife.embedding_backends import ONNX_BATCH_SIZE, OnnxBackend, create_backend
+
+
+def test_create_backend_rejects_unknown_names(tmp_path):
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        create_backend("tensorflow", "all-MiniLM-L6-v2", str(tmp_path))
+
+
+def test_backends_are_registered_by_name():
+    assert set(embedding_backends.BACKENDS) == {"torch", "int8", "onnx"}
+
+
+class FakeTokenizer:
+    def encode_batch(self, sentences):
+        width = max(len(s.split()) for s in sentences)
+        return [
+            SimpleNamespace(
+                ids=[len(w) for w in s.split()] + [0] * (width - len(s.split())),
+                attention_mask=[1] * len(s.split()) + [0] * (width - len(s.split())),
+                type_ids=[0] * width,
+            )
+            for s in sentences
+        ]
+
+
+class FakeSession:
+    def __init__(self):
+        self.batches = []
+
+    def run(self, outputs, feeds):
+        self.batches.append(len(feeds["input_ids"]))
+        ids, mask = feeds["input_ids"], feeds["attention_mask"]
+        return [np.stack([(ids * mask).sum(1), mask.sum(1)], axis=1).astype(np.float64)]
+
+
+def test_onnx_backend_encodes_in_batches():
+    backend = object.__new__(OnnxBackend)
+    backend.tokenizer, backend.session, backend.dim = FakeTokenizer(), FakeSession(), 2
+    sentences = [f"line {'x' * (i + 1)} end" for i in range(ONNX_BATCH_SIZE + 3)]
+    embeddings = backend.encode(sentences)
+    assert backend.session.batches == [ONNX_BATCH_SIZE, 3]
+    assert embeddings.dtype == np.float32
+    assert embeddings.tolist() == [[4 + i + 1 + 3, 3] for i in range(len(sentences))]
+    assert backend.encode([]).shape == (0, 2)
+
+
+def test_backends_must_implement_encode():
+    class Incomplete(embedding_backends.EmbeddingBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete("all-MiniLM-L6-v2")
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from openrelife import embedding_cache
+from openrelife.embedding_cache import LineEmbeddingCache, SingleFlightCache
+
+
+def test_hits_misses_and_eviction():
+    cache = SingleFlightCache(max_items=2)
+    assert cache.get("a", lambda: 1) == 1
+    assert cache.get("a", lambda: 2) == 1
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: 0)  # "b" is now the least recently used
+    cache.get("c", lambda: 3)
+    assert cache.get("b", lambda: 4) == 4
+    assert cache.stats() == {'size': 2, 'hits': 2, 'misses': 4, 'shared': 0}
+
+
+def test_concurrent_misses_compute_once():
+    cache = SingleFlightCache(max_items=8)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get("q", compute)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(cache.get("q", compute))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_errors_are_not_cached():
+    cache = SingleFlightCache(max_items=8)
+
+    def fail():
+        raise RuntimeError("model not loaded")
+
+    with pytest.raises(RuntimeError):
+        cache.get("q", fail)
+    assert cache.get("q", lambda: "value") == "value"
+
+
+def test_discard():
+    cache = SingleFlightCache(max_items=8)
+    cache.get("q", lambda: 1)
+    cache.discard("q")
+    cache.discard("q")
+    assert len(cache) == 0
+
+
+def _vector(seed):
+    return np.random.default_rng(seed).random(8, dtype=np.float32)
+
+
+def test_line_cache_round_trip_and_persistence(tmp_path):
+    path = str(tmp_path / "lines.db")
+    cache = LineEmbeddingCache(path, "model")
+    assert cache.get_many(["File  Edit  View"]) == {}
+    cache.put_many({"File  Edit  View": _vector(0), "Untitled": _vector(1)})
+    found = cache.get_many(["File  Edit  View", "Untitled", "new line"])
+    assert set(found) == {"File  Edit  View", "Untitled"}
+    assert np.array_equal(found["Untitled"], _vector(1))
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'hit_rate': 0.5}
+    cache.close()
+
+    reopened = LineEmbeddingCache(path, "model")
+    assert set(reopened.get_many(["Untitled"])) == {"Untitled"}
+    # Another model never sees these vectors
+    assert LineEmbeddingCache(path, "other-model").get_many(["Untitled"]) == {}
+
+
+def test_line_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "LINE_CACHE_EVICT_EVERY", 1)
+    cache = LineEmbeddingCache(str(tmp_path / "lines.db"), "model", max_lines=7)
+    cache.put_many({f"old {i}": _vector(i) for i in range(5)})
+    cache.get_many(["old 0"])
+    cache.put_many({f"new {i}": _vector(i) for i in range(3)})
+    # 8 lines are over the bound: the two least recently used go, down to 90% of it
+    assert len(cache) == 6
+    assert set(cache.get_many([f"new {i}" for i in range(3)])) == {"new 0", "new 1", "new 2"}
+    old = cache.get_many([f"old {i}" for i in range(5)])
+    assert "old 0" in old and len(old) == 3
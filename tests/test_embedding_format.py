@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from openrelife.embedding_format import (
+    VectorCodes,
+    _popcount,
+    blob_format,
+    decode_blob,
+    encode_blob,
+    quantize_int8,
+)
+
+
+def _unit(rng, rows, dim):
+    vectors = rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_float32_blobs_are_raw_values():
+    vector = np.array([0.5, -1.0, 2.0], dtype=np.float32)
+    blob = encode_blob(vector, "float32")
+    assert blob == vector.tobytes()
+    assert blob_format(blob) == "float32"
+    assert decode_blob(blob).tolist() == vector.tolist()
+
+
+@pytest.mark.parametrize("dim", [383, 384, 385, 386, 387])
+@pytest.mark.parametrize("fmt, size, tolerance", [("float16", 2, 1e-3), ("int8", 1, 1e-2), ("binary", 1, 1e-2)])
+def test_compact_blobs_round_trip(dim, fmt, size, tolerance):
+    vector = np.random.default_rng(dim).normal(size=dim).astype(np.float32)
+    blob = encode_blob(vector, fmt)
+    assert len(blob) % 4 != 0
+    assert len(blob) <= dim * size + 8
+    assert blob_format(blob) == ("int8" if fmt == "binary" else fmt)
+    decoded = decode_blob(blob)
+    assert decoded.dtype == np.float32
+    assert np.abs(decoded - vector).max() <= tolerance * np.abs(vector).max()
+
+
+def test_quantize_int8_uses_the_full_range():
+    codes, scales = quantize_int8(np.array([[0.5, -0.25, 0.0], [0.0, 0.0, 0.0]]))
+    assert codes.tolist() == [[127, -64, 0], [0, 0, 0]]
+    assert scales[0] == pytest.approx(0.5 / 127)
+    assert scales[1] == 1.0
+
+
+def test_popcount_matches_python():
+    bits = np.random.default_rng(0).integers(0, 256, size=(20, 13), dtype=np.uint8)
+    expected = [sum(bin(b).count("1") for b in row) for row in bits.tolist()]
+    assert _popcount(bits).tolist() == expected
+
+
+@pytest.mark.parametrize("fmt, error", [("float32", 1e-6), ("float16", 2e-3), ("int8", 2e-2), ("binary", 0.3)])
+def test_scores_approximate_cosine_similarity(fmt, error):
+    rng = np.random.default_rng(1)
+    vectors = _unit(rng, 2000, 384)
+    query = _unit(rng, 1, 384)[0]
+    codec = VectorCodes(fmt, 384)
+    codes, scales = codec.encode(vectors)
+    assert codes.shape == (2000, codec.width)
+    assert codes.nbytes + (scales.nbytes if scales is not None else 0) == 2000 * codec.nbytes_per_row()
+    sims = codec.scores(codes, scales, query)
+    assert np.abs(sims - vectors @ query).max() < error
+    assert codec.exact == (fmt != "binary")
+    decoded = codec.decode(codes, scales)
+    assert decoded.shape == vectors.shape
+    assert np.allclose(np.linalg.norm(decoded, axis=1), 1.0, atol=0.05)
+
+
+def test_binary_codes_keep_the_nearest_neighbours_among_candidates():
+    rng = np.random.default_rng(2)
+    centers = _unit(rng, 20, 384)
+    vectors = centers[rng.integers(0, 20, size=5000)] + 0.05 * rng.normal(size=(5000, 384))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    query = vectors[0]
+    codec = VectorCodes("binary", 384)
+    codes, scales = codec.encode(vectors)
+    candidates = np.argsort(-codec.scores(codes, scales, query))[:500]
+    exact = np.argsort(-(vectors @ query))[:10]
+    assert set(exact) <= set(candidates)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        VectorCodes("float8", 384)
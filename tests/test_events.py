@@ -0,0 +1,94 @@
+import http.client
+import queue
+import threading
+
+import pytest
+
+from openrelife import events
+from openrelife.events import EventBroker, entry_metadata
+
+
+def test_publish_reaches_every_subscriber():
+    broker = EventBroker()
+    a, b = broker.subscribe(), broker.subscribe()
+    broker.publish("entries", {"n": 1})
+    assert a.get_nowait() == ("entries", {"n": 1})
+    assert b.get_nowait() == ("entries", {"n": 1})
+    broker.unsubscribe(a)
+    broker.publish("entries", {"n": 2})
+    assert a.empty()
+    assert b.get_nowait() == ("entries", {"n": 2})
+
+
+def test_stalled_subscriber_gets_resync():
+    broker = EventBroker(max_pending=2)
+    subscription = broker.subscribe()
+    for n in range(5):
+        broker.publish("entries", {"n": n})
+    assert subscription.get_nowait() == ("resync", {})
+    broker.publish("entries", {"n": 5})
+    assert subscription.get_nowait() == ("entries", {"n": 5})
+
+
+def test_on_entries_inserted_orders_newest_first():
+    broker = events.get_broker()
+    subscription = broker.subscribe()
+    try:
+        events.on_entries_inserted([entry_metadata(1, "a", 10), entry_metadata(2, "b", 20)])
+        event_type, data = subscription.get(timeout=1)
+        assert event_type == "entries"
+        assert data["timestamps"] == [20, 10]
+        assert data["entries"][20] == {
+            "id": 2, "text": "b", "timestamp": 20, "words_coords": [], "ai_text": None, "ai_words_coords": []
+        }
+        events.on_entries_inserted([])
+        try:
+            subscription.get_nowait()
+            assert False, "empty inserts must not publish"
+        except queue.Empty:
+            pass
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def test_subscribers_are_capped():
+    broker = EventBroker(max_subscribers=2)
+    a, b = broker.subscribe(), broker.subscribe()
+    assert broker.subscribe() is None
+    broker.unsubscribe(a)
+    assert broker.subscribe() is not None
+    assert b is not None
+
+
+def test_open_streams_leave_the_server_responsive(monkeypatch):
+    app_module = pytest.importorskip("openrelife.app")
+    waitress = pytest.importorskip("waitress")
+    monkeypatch.setattr(events, "_broker", EventBroker())
+    # Streams notice their closed clients at the next keep-alive
+    monkeypatch.setattr(app_module, "EVENTS_KEEPALIVE", 0.1)
+    server = waitress.create_server(app_module.app, host="127.0.0.1", port=0, threads=app_module.SERVER_THREADS)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    port = server.effective_port
+    streams = []
+    try:
+        statuses = []
+        for _ in range(app_module.SERVER_THREADS + 2):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api/events")
+            statuses.append(conn.getresponse().status)
+            streams.append(conn)
+        assert statuses.count(200) == events.MAX_SUBSCRIBERS
+        assert statuses.count(503) == len(statuses) - events.MAX_SUBSCRIBERS
+
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", "/api/recording-status")
+        assert conn.getresponse().status == 200
+    finally:
+        for conn in streams:
+            conn.close()
+        # The server loop returns once every channel, the listening socket included, is closed
+        server.task_dispatcher.shutdown()
+        for channel in list(server._map.values()):
+            channel.close()
+        thread.join(timeout=5)
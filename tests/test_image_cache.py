@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from openrelife.image_cache import ImageCache, file_etag, read_file
+
+
+def test_lru_eviction_by_size():
+    cache = ImageCache(max_bytes=100)
+    cache.put("a", b"x" * 10, "ea")
+    cache.put("b", b"x" * 10, "eb")
+    assert cache.get("a") == (b"x" * 10, "ea")  # "a" is now the most recent
+    for key in "cdefghijk":
+        cache.put(key, b"x" * 10, key)
+    assert cache.size <= 100
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_large_items_are_not_cached():
+    cache = ImageCache(max_bytes=100)
+    cache.put("big", b"x" * 50, "e")
+    assert cache.get("big") is None and cache.size == 0
+
+
+def test_put_replaces_and_discard_frees():
+    cache = ImageCache(max_bytes=100)
+    cache.put("a", b"12", "e1")
+    cache.put("a", b"1234", "e2")
+    assert cache.get("a") == (b"1234", "e2") and cache.size == 4
+    cache.discard("a")
+    cache.discard("a")
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_load_reads_once(tmp_path):
+    path = tmp_path / "1.webp"
+    path.write_bytes(b"image")
+    cache = ImageCache()
+    data, etag = cache.load(1, lambda: read_file(str(path)))
+    assert data == b"image" and etag == file_etag(os.stat(path))
+    path.unlink()
+    assert cache.load(1, lambda: read_file(str(path))) == (data, etag)
+    with pytest.raises(OSError):
+        cache.load(2, lambda: read_file(str(path)))
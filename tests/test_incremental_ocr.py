@@ -0,0 +1,149 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from openrelife import ocr as ocr_module
+from openrelife.change_detection import _components, dirty_regions
+from openrelife.incremental_ocr import IncrementalOCR, pack_regions, unpack_words
+from openrelife.ocr import words_to_text
+
+
+def _screen(blocks, shape=(200, 320)):
+    """A white screen with solid dark blocks standing in for words: {value: (x1, y1, x2, y2)}."""
+    image = np.full(shape + (3,), 255, dtype=np.uint8)
+    for value, (x1, y1, x2, y2) in blocks.items():
+        image[y1:y2, x1:x2] = value
+    return image
+
+
+def _read_words(page):
+    height, width = page.shape[:2]
+    return [
+        {'text': str(page[r1, c1, 0]), 'x1': c1 / width, 'y1': r1 / height, 'x2': c2 / width, 'y2': r2 / height}
+        for r1, c1, r2, c2 in _components(page[..., 0] < 255)
+    ]
+
+
+class FakeOCR:
+    """Reads every dark block of a page as a word whose text is the block's pixel value."""
+
+    def __init__(self):
+        self.pages = []
+
+    def __call__(self, pages):
+        self.pages.extend(pages)
+        results = []
+        for page in pages:
+            words = _read_words(page)
+            results.append((words_to_text(words), words))
+        return results
+
+
+def _fake_predictor(pages):
+    """Reads pages like FakeOCR, in doctr's result layout with one block per word."""
+    return SimpleNamespace(pages=[
+        SimpleNamespace(blocks=[
+            SimpleNamespace(lines=[SimpleNamespace(words=[
+                SimpleNamespace(value=w['text'], geometry=((w['x1'], w['y1']), (w['x2'], w['y2'])))
+            ])])
+            for w in _read_words(page)
+        ])
+        for page in pages
+    ])
+
+
+def _boxes(words, shape=(200, 320)):
+    height, width = shape
+    return {
+        w['text']: tuple(round(v) for v in (w['x1'] * width, w['y1'] * height, w['x2'] * width, w['y2'] * height))
+        for w in words
+    }
+
+
+def test_dirty_regions():
+    a = _screen({10: (10, 10, 50, 20)})
+    assert dirty_regions(a, a.copy()) == []
+    b = _screen({10: (10, 10, 50, 20), 20: (200, 150, 240, 160)})
+    regions = dirty_regions(a, b)
+    assert len(regions) == 1
+    x1, y1, x2, y2 = regions[0]
+    assert x1 <= 200 and y1 <= 150 and x2 >= 240 and y2 >= 160
+    assert dirty_regions(a, np.zeros((100, 100, 3), dtype=np.uint8)) is None
+    assert dirty_regions(a, 255 - a) is None
+
+
+def test_words_to_text_orders_lines_and_words():
+    words = [
+        {'text': 'world', 'x1': 0.5, 'y1': 0.1, 'x2': 0.6, 'y2': 0.2},
+        {'text': 'second', 'x1': 0.1, 'y1': 0.5, 'x2': 0.2, 'y2': 0.6},
+        {'text': 'hello', 'x1': 0.1, 'y1': 0.11, 'x2': 0.2, 'y2': 0.19},
+    ]
+    assert words_to_text(words) == "hello world \nsecond \n"
+
+
+def test_pack_and_unpack_round_trip():
+    image = _screen({10: (10, 10, 50, 20), 20: (200, 150, 240, 160)})
+    regions = [(0, 0, 64, 32), (192, 128, 256, 192)]
+    atlas, placements = pack_regions(image, regions)
+    assert atlas.shape[0] * atlas.shape[1] < image.shape[0] * image.shape[1]
+    words = FakeOCR()([atlas])[0][1]
+    mapped = unpack_words(words, atlas.shape, placements, 320, 200)
+    assert _boxes(mapped) == {'10': (10, 10, 50, 20), '20': (200, 150, 240, 160)}
+
+
+def test_incremental_ocr_rereads_only_changed_regions():
+    ocr = FakeOCR()
+    incremental = IncrementalOCR(ocr)
+    first = _screen({10: (10, 10, 50, 20), 20: (200, 150, 240, 160)})
+    text, words = incremental.extract([0], [first])[0]
+    assert _boxes(words) == {'10': (10, 10, 50, 20), '20': (200, 150, 240, 160)}
+    assert len(ocr.pages) == 1
+
+    # Only the lower word changes: it is re-read, the other is carried forward
+    second = _screen({10: (10, 10, 50, 20), 30: (200, 150, 240, 160)})
+    text, words = incremental.extract([0], [second])[0]
+    assert _boxes(words) == {'10': (10, 10, 50, 20), '30': (200, 150, 240, 160)}
+    assert text == "10 \n30 \n"
+    atlas = ocr.pages[-1]
+    assert atlas.shape[0] * atlas.shape[1] < first.shape[0] * first.shape[1] / 2
+
+    # An identical frame needs no OCR at all
+    pages_before = len(ocr.pages)
+    assert incremental.extract([0], [second.copy()])[0][0] == text
+    assert len(ocr.pages) == pages_before
+    assert (incremental.full_frames, incremental.region_frames, incremental.unchanged_frames) == (1, 1, 1)
+
+
+def test_incremental_ocr_batches_monitors_and_refreshes_periodically():
+    ocr = FakeOCR()
+    incremental = IncrementalOCR(ocr, full_ocr_every=1)
+    a = _screen({10: (10, 10, 50, 20)})
+    b = _screen({20: (10, 10, 50, 20)})
+    results = incremental.extract([0, 1], [a, b])
+    assert [r[0] for r in results] == ["10 \n", "20 \n"]
+    assert len(ocr.pages) == 2
+
+    changed = _screen({10: (10, 10, 50, 20), 40: (100, 100, 140, 110)})
+    incremental.extract([0], [changed])
+    assert incremental.region_frames == 1
+    # The refresh limit is reached: the next change triggers a full-frame OCR
+    incremental.extract([0], [a])
+    assert incremental.full_frames == 3
+    assert ocr.pages[-1].shape == a.shape
+
+
+def test_incremental_text_matches_full_frame_text(monkeypatch):
+    monkeypatch.setattr(ocr_module, "get_ocr", lambda: _fake_predictor)
+    incremental = IncrementalOCR(ocr_module.extract_text_from_images)
+    first = _screen({10: (10, 10, 50, 20), 20: (200, 150, 240, 160)})
+    second = _screen({10: (10, 10, 50, 20), 30: (200, 150, 240, 160), 40: (20, 60, 300, 70)})
+    # The right end of the new word 40 changes in the next frame of the same call
+    third = second.copy()
+    third[60:70, 260:300] = 50
+    incremental.extract([0], [first])
+    results = incremental.extract([0, 0], [second, third])
+    assert incremental.region_frames == 1
+    for image, (text, words) in zip((second, third), results):
+        full_text, full_words = ocr_module.extract_text_from_images([image])[0]
+        assert text == full_text
+        assert _boxes(words) == _boxes(full_words)
@@ -1,6 +1,13 @@
 import pytest
 import numpy as np
-from openrelife.nlp import cosine_similarity
+from openrelife import nlp
+from openrelife.nlp import (
+    EMBEDDING_DIM,
+    cosine_similarity,
+    get_embedding,
+    get_query_embedding,
+    normalize_query,
+)
 
 
 def test_cosine_similarity_identical_vectors():
@@ -41,3 +48,65 @@ def test_cosine_similarity_zero_vector():
     assert np.isnan(
         result
     ), "Expected result to be NaN when one of the vectors is a zero vector"
+
+
+def test_normalize_query():
+    assert normalize_query("  Invoice   PDF ") == "invoice pdf"
+    assert normalize_query("first\n\n  Second line ") == "first\nsecond line"
+    assert normalize_query(" \n ") == ""
+
+
+def test_get_query_embedding_is_cached(monkeypatch):
+    calls = []
+
+    def fake_embedding(text, cache_lines=True):
+        calls.append(text)
+        return np.ones(EMBEDDING_DIM, dtype=np.float32)
+
+    monkeypatch.setattr(nlp, "get_embedding", fake_embedding)
+    monkeypatch.setattr(nlp, "_query_cache", nlp.SingleFlightCache(8))
+    first = get_query_embedding("Meeting notes")
+    assert get_query_embedding("meeting  notes ") is first
+    assert calls == ["meeting notes"]
+    assert not first.flags.writeable
+    assert not get_query_embedding("   ").any()
+
+
+def test_get_embedding_encodes_new_lines_only(monkeypatch, tmp_path):
+    encoded = []
+
+    class FakeModel:
+        def encode(self, lines):
+            encoded.extend(lines)
+            return np.array([[len(line), 1.0] for line in lines], dtype=np.float32)
+
+    monkeypatch.setattr(nlp, "_model_cache", FakeModel())
+    monkeypatch.setattr(nlp, "_line_cache", nlp.LineEmbeddingCache(str(tmp_path / "lines.db"), "m"))
+    first = get_embedding("menu\ntitle\nmenu")
+    second = get_embedding("menu\nbody text")
+    assert encoded == ["menu", "title", "body text"]
+    assert np.allclose(first, [(4 + 5 + 4) / 3, 1.0])
+    assert np.allclose(second, [(4 + 9) / 2, 1.0])
+
+
+def test_get_model_falls_back_to_torch(monkeypatch):
+    loaded = []
+
+    def fake_create_backend(name, model_name, models_path):
+        if name == "onnx":
+            raise ImportError("No module named 'onnxruntime'")
+        loaded.append(name)
+        return name
+
+    monkeypatch.setattr(nlp, "EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setattr(nlp, "create_backend", fake_create_backend)
+    monkeypatch.setattr(nlp, "_model_cache", None)
+    assert nlp.get_model() == "torch"
+    assert nlp.get_model() == "torch"
+    assert loaded == ["torch"]
+
+
+def test_warm_up_fails_without_a_model(monkeypatch):
+    monkeypatch.setattr(nlp, "get_model", lambda: None)
+    with pytest.raises(RuntimeError):
+        nlp.warm_up()
@@ -0,0 +1,139 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from openrelife.pipeline import CoalescingQueue, Frame, RecordingPipeline
+
+
+def _frame(monitor, timestamp):
+    return Frame(monitor=monitor, timestamp=timestamp, image=np.zeros((2, 2, 3)), app="App", title="Title")
+
+
+def test_coalescing_queue_replaces_pending_item_with_same_key():
+    q = CoalescingQueue(4)
+    q.offer("a1", key=1)
+    q.offer("b1", key=2)
+    q.offer("a2", key=1)
+    assert q.coalesced == 1
+    assert [q.get(), q.get()] == ["a2", "b1"]
+
+
+def test_coalescing_queue_drops_oldest_when_full():
+    q = CoalescingQueue(2)
+    for i in range(4):
+        q.offer(i)
+    assert q.dropped == 2
+    assert [q.get(), q.get()] == [2, 3]
+
+
+def test_pipeline_processes_frames_in_stage_order():
+    stored = []
+    pipeline = RecordingPipeline(
+        analyze=lambda f: setattr(f, "text", f"text {f.timestamp}") or f,
+        encode=lambda f: f,
+        store=stored.append,
+        pending_frames=16,
+    )
+    pipeline.start()
+    for ts in range(5):
+        pipeline.submit(_frame(ts, ts))
+    pipeline.stop(timeout=5)
+    assert sorted(f.timestamp for f in stored) == list(range(5))
+    assert all(f.text == f"text {f.timestamp}" for f in stored)
+    assert pipeline.stats()["store_processed"] == 5
+
+
+def test_pipeline_stall_never_blocks_submit():
+    release = threading.Event()
+    stored = []
+
+    def slow_analyze(frame):
+        release.wait(5)
+        return frame
+
+    pipeline = RecordingPipeline(slow_analyze, lambda f: f, stored.append, pending_frames=2)
+    pipeline.start()
+    # The analysis worker is stuck; submitting many frames must return immediately
+    for ts in range(50):
+        pipeline.submit(_frame(ts % 2, ts))
+    stats = pipeline.stats()
+    assert stats["pending"] <= 2
+    assert stats["coalesced"] + stats["dropped"] >= 47
+    release.set()
+    pipeline.stop(timeout=5)
+    assert len(stored) <= 3
+
+
+def test_pipeline_stage_errors_drop_only_that_frame():
+    stored = []
+
+    def analyze(frame):
+        if frame.timestamp == 1:
+            raise RuntimeError("bad frame")
+        return frame
+
+    pipeline = RecordingPipeline(analyze, lambda f: f, stored.append, pending_frames=8)
+    pipeline.start()
+    for ts in range(3):
+        pipeline.submit(_frame(ts, ts))
+    pipeline.stop(timeout=5)
+    assert sorted(f.timestamp for f in stored) == [0, 2]
+    assert pipeline.stats()["analyze_failed"] == 1
+
+
+def test_pipeline_batches_pending_frames():
+    release = threading.Event()
+    batches = []
+
+    def analyze(frames):
+        release.wait(5)
+        batches.append([f.timestamp for f in frames])
+        return frames
+
+    stored = []
+    pipeline = RecordingPipeline(
+        analyze, lambda f: f, stored.append, analyze_batch_size=3, pending_frames=8
+    )
+    pipeline.start()
+    pipeline.submit(_frame(0, 0))
+    # Wait for the worker to pick up the first frame alone, then queue a backlog
+    while pipeline.pending.qsize():
+        pass
+    for ts in range(1, 6):
+        pipeline.submit(_frame(ts, ts))
+    release.set()
+    pipeline.stop(timeout=5)
+    assert batches == [[0], [1, 2, 3], [4, 5]]
+    assert len(stored) == 6
+
+
+def test_pipeline_store_stage_groups_frames_within_max_wait():
+    batches = []
+    pipeline = RecordingPipeline(
+        lambda f: f,
+        lambda f: f,
+        lambda frames: batches.append([f.timestamp for f in frames]),
+        pending_frames=8,
+        store_batch_size=16,
+        store_max_wait=5,
+    )
+    pipeline.start()
+    for ts in range(3):
+        pipeline.submit(_frame(ts, ts))
+    # The store batch is still collecting; stopping flushes it without waiting for max_wait
+    t0 = time.monotonic()
+    pipeline.stop(timeout=10)
+    assert time.monotonic() - t0 < 5
+    assert sorted(ts for batch in batches for ts in batch) == [0, 1, 2]
+    assert len(batches) == 1
+
+
+def test_coalescing_queue_get_timeout():
+    q = CoalescingQueue(2)
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.01)
+    q.offer("a")
+    assert q.get(timeout=0.01) == "a"
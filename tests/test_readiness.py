@@ -0,0 +1,72 @@
+import sys
+import threading
+import types
+
+import pytest
+
+from openrelife import ocr, readiness
+
+
+@pytest.fixture(autouse=True)
+def components(monkeypatch):
+    monkeypatch.setattr(readiness, "_components", {})
+
+
+def test_ready_once_every_component_loaded():
+    assert not readiness.get_readiness()["ready"]
+    readiness.mark_ready("database")
+    release = threading.Event()
+    thread = readiness.load_in_background("model", release.wait)
+    status = readiness.get_readiness()
+    assert not status["ready"]
+    assert status["components"]["model"]["state"] == "loading"
+    release.set()
+    thread.join()
+    status = readiness.get_readiness()
+    assert status["ready"]
+    assert status["components"]["model"]["state"] == "ready"
+    assert status["uptime"] >= status["components"]["model"]["seconds"]
+
+
+def test_failed_component():
+    def fail():
+        raise RuntimeError("no weights")
+
+    readiness.load_in_background("ocr", fail).join()
+    status = readiness.get_readiness()
+    assert not status["ready"]
+    assert status["components"]["ocr"] == {
+        "state": "failed",
+        "seconds": status["components"]["ocr"]["seconds"],
+        "error": "no weights",
+    }
+
+
+def test_ocr_predictor_is_built_once_on_first_use(monkeypatch):
+    built = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def ocr_predictor(**kwargs):
+        started.set()
+        release.wait()
+        built.append(kwargs)
+        return lambda pages: pages
+
+    doctr = types.ModuleType("doctr")
+    models = types.ModuleType("doctr.models")
+    models.ocr_predictor = ocr_predictor
+    monkeypatch.setitem(sys.modules, "doctr", doctr)
+    monkeypatch.setitem(sys.modules, "doctr.models", models)
+    monkeypatch.setattr(ocr, "_predictor", None)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ocr.get_ocr())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1
+    assert len(set(map(id, results))) == 1
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from openrelife import database, retention, storage, thumbnails
+
+DAY = 86400
+NOW = 1709618828.0
+
+
+def _record(timestamps):
+    image = Image.new("RGB", (64, 32), (200, 200, 200))
+    for timestamp in timestamps:
+        storage.save_screenshot(image, {"quality": 80}, timestamp, 1)
+        thumbnails.save_renditions(image, timestamp)
+    database.insert_entries(
+        [(f"note {t}", t, np.ones(8, dtype=np.float32), "editor", "doc", []) for t in timestamps]
+    )
+
+
+def test_purge_expired_deletes_old_entries_and_files(store):
+    old = [int((NOW - 40 * DAY) * 1000000) + i for i in range(5)]
+    recent = [int((NOW - DAY) * 1000000) + i for i in range(3)]
+    _record(old + recent)
+    deleted = []
+
+    purged = retention.purge_expired(30, now=NOW, batch_size=2, pause=0, on_deleted=deleted.extend)
+
+    assert purged == 5 and deleted == old
+    assert database.get_timestamps() == sorted(recent, reverse=True)
+    assert all(storage.find_screenshot(t) is None for t in old)
+    assert all(storage.find_screenshot(t) is not None for t in recent)
+    assert not os.path.exists(os.path.dirname(storage.screenshot_path(old[0])))
+    assert not os.path.exists(os.path.dirname(thumbnails.rendition_path(old[0], "small")))
+    assert database.search_text("note", 10) and all(
+        row[0] in recent for row in database.search_text("note", 10)
+    )
+    assert sum(day["count"] for day in database.get_timeline_summary()) == 3
+    assert retention.purge_expired(30, now=NOW, pause=0) == 0
+
+
+def test_free_pages_are_returned(store):
+    timestamps = [int((NOW - 40 * DAY) * 1000000) + i for i in range(300)]
+    database.insert_entries(
+        [("x" * 2000, t, np.ones(384, dtype=np.float32), "editor", "doc", []) for t in timestamps]
+    )
+    conn = database.get_connection()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size_before = os.path.getsize(database.db_path)
+
+    assert retention.purge_expired(30, now=NOW, batch_size=100, pause=0) == 300
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert os.path.getsize(database.db_path) < size_before / 2
+
+
+def test_run_retention_stops(store, monkeypatch):
+    monkeypatch.setattr(retention, "_stop_event", retention.threading.Event())
+    monkeypatch.setattr(retention, "_wake_event", retention.threading.Event())
+    calls = []
+
+    def retention_days():
+        calls.append(1)
+        retention.stop_retention()
+        return -1
+
+    retention.run_retention(retention_days, interval=60)
+    assert calls == [1]
+
+
+def test_run_retention_converts_legacy_databases(store, monkeypatch):
+    monkeypatch.setattr(retention, "_stop_event", retention.threading.Event())
+    monkeypatch.setattr(retention, "_wake_event", retention.threading.Event())
+    conn = database.get_connection()
+    conn.execute("PRAGMA auto_vacuum=NONE")
+    conn.execute("VACUUM")
+    timestamps = [int((NOW - 40 * DAY) * 1000000) + i for i in range(50)]
+    database.insert_entries(
+        [("x" * 2000, t, np.ones(8, dtype=np.float32), "editor", "doc", []) for t in timestamps]
+    )
+    database.delete_entries(timestamps[:25])
+    # No incremental vacuum until the database is converted
+    assert database.reclaim_free_pages() == 0
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+    calls = []
+
+    def retention_days():
+        calls.append(1)
+        if len(calls) > 1:
+            retention.stop_retention()
+        return 30
+
+    retention.run_retention(retention_days, interval=0)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert database.get_timestamps() == []
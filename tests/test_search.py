@@ -0,0 +1,58 @@
+import numpy as np
+
+from openrelife import database, search
+from openrelife.ann_index import IVFIndex
+from openrelife.database import Entry
+from openrelife.vector_index import EmbeddingMatrix
+
+
+def test_binary_matrix_is_reranked_with_stored_vectors(monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(3000, 64)).astype(np.float32)
+    query = vectors[7] + 0.8 * rng.normal(size=64).astype(np.float32)
+    matrix = EmbeddingMatrix(fmt="binary")
+    matrix.load((ts, vec.tobytes()) for ts, vec in enumerate(vectors))
+    requested = []
+
+    def entries(timestamps, columns):
+        requested.extend(timestamps)
+        return [Entry(timestamp=ts, embedding=vectors[ts].tobytes()) for ts in timestamps]
+
+    monkeypatch.setattr(search, "get_embedding_matrix", lambda: matrix)
+    monkeypatch.setattr(search, "get_ann_index", lambda m: IVFIndex())
+    monkeypatch.setattr(search, "search_text", lambda query, limit: [(42, "meeting notes", "")])
+    monkeypatch.setattr(search, "get_entries_by_timestamps", entries)
+    monkeypatch.setattr(search, "RECENCY_DIVISOR", 1e30)
+    monkeypatch.setattr(search, "RERANK_CANDIDATES", 300)
+
+    results = search.hybrid_search("meeting notes", query, limit=5)
+    exact = np.argsort(-(vectors @ query / np.linalg.norm(vectors, axis=1)))
+    assert results[0] == 42
+    assert results[1:] == [int(ts) for ts in exact if ts != 42][:4]
+    assert 42 in requested and len(requested) <= 301
+
+
+def test_keyword_matches_past_the_candidate_cap_are_not_boosted(store, monkeypatch):
+    # Shorter texts rank higher under BM25, so the first two matches are the capped candidates
+    texts = [
+        "invoice",
+        "invoice paid",
+        "invoice paid by bank transfer",
+        "invoice paid by bank transfer in march",
+        "agenda",
+    ]
+    vectors = np.eye(len(texts), dtype=np.float32)
+    for ts, text in enumerate(texts):
+        database.insert_entry(text, ts, vectors[ts], "App", "Title")
+    matrix = EmbeddingMatrix()
+    matrix.load((ts, vec.tobytes()) for ts, vec in enumerate(vectors))
+    query = np.array([0.0, 0.0, 0.1, 0.2, 0.3], dtype=np.float32)
+
+    monkeypatch.setattr(search, "get_embedding_matrix", lambda: matrix)
+    monkeypatch.setattr(search, "get_ann_index", lambda m: IVFIndex())
+    monkeypatch.setattr(search, "KEYWORD_CANDIDATES", 2)
+
+    results = search.hybrid_search("invoice", query, limit=5)
+    assert sorted(results[:2]) == [0, 1]
+    # Past the cap, matches 2 and 3 are ordered by similarity alongside the non-matching entry 4
+    assert results[2:] == [4, 3, 2]
@@ -0,0 +1,128 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from openrelife import database, segments
+
+LOSSLESS = {"lossless": True}
+
+
+@pytest.fixture
+def writer(store):
+    return segments._writer
+
+
+def _screen(seed=0, width=320, height=192):
+    rng = np.random.default_rng(seed)
+    pixels = np.full((height, width, 3), 230, dtype=np.uint8)
+    pixels[::8] = rng.integers(0, 256, size=(height // 8, width, 3), dtype=np.uint8)
+    return pixels
+
+
+def _record(writer, timestamp, pixels, monitor=1):
+    writer.append(monitor, timestamp, Image.fromarray(pixels), LOSSLESS)
+
+
+def test_keyframes_and_deltas_round_trip(writer):
+    first = _screen()
+    typed = first.copy()
+    typed[40:56, 100:180] = 0
+    scrolled = _screen(seed=1)
+    for timestamp, pixels in ((1, first), (2, typed), (3, scrolled)):
+        _record(writer, timestamp, pixels)
+
+    assert database.get_frame_segment(1)["base_offset"] is None
+    assert database.get_frame_segment(2)["base_offset"] == database.get_frame_segment(1)["offset"]
+    assert database.get_frame_segment(3)["base_offset"] is None
+    assert database.get_frame_segment(2)["length"] < database.get_frame_segment(1)["length"] / 4
+    for timestamp, pixels in ((1, first), (2, typed), (3, scrolled)):
+        assert np.array_equal(np.asarray(segments.load_frame(timestamp)), pixels)
+    assert segments.load_frame(4) is None
+
+
+def test_read_frame_encodes_images(writer):
+    first = _screen()
+    changed = first.copy()
+    changed[:16] = 0
+    _record(writer, 1, first)
+    _record(writer, 2, changed)
+    keyframe, key_etag = segments.read_frame(1)
+    assert keyframe[8:12] == b"WEBP"
+    delta, delta_etag = segments.read_frame(2)
+    assert delta[:2] == b"\xff\xd8"  # Rebuilt frames are served as JPEG
+    assert key_etag and delta_etag and key_etag != delta_etag
+    with pytest.raises(FileNotFoundError):
+        segments.read_frame(3)
+
+
+def test_monitors_have_their_own_keyframes(writer):
+    _record(writer, 1, _screen(), monitor=1)
+    _record(writer, 2, _screen(seed=5), monitor=2)
+    _record(writer, 3, _screen(), monitor=1)
+    assert database.get_frame_segment(3)["base_offset"] == database.get_frame_segment(1)["offset"]
+
+
+def test_delete_keeps_keyframes_of_remaining_deltas(writer):
+    first = _screen()
+    changed = first.copy()
+    changed[:16] = 0
+    _record(writer, 1, first)
+    _record(writer, 2, changed)
+    _record(writer, 3, changed)
+    path = os.path.join(segments.segments_path, writer.segment)
+
+    segments.delete_frames([1, 3])
+    assert segments.load_frame(1) is None
+    assert np.array_equal(np.asarray(segments.load_frame(2)), changed)
+    row = database.get_frame_segment(2)
+    with open(path, "rb") as f:
+        f.seek(row["offset"] + row["length"])
+        assert not any(f.read())  # The record of frame 3 was erased
+
+    # No frame needs the keyframe any more: it is erased, and the next frame starts a new one
+    segments.delete_frames([2])
+    with open(path, "rb") as f:
+        assert not any(f.read())
+    _record(writer, 4, changed)
+    assert database.get_frame_segment(4)["base_offset"] is None
+
+
+def test_no_new_deltas_against_a_deleted_keyframe(writer):
+    first = _screen()
+    changed = first.copy()
+    changed[:16] = 0
+    _record(writer, 1, first)
+    segments.delete_frames([1])
+    _record(writer, 2, changed)
+    assert database.get_frame_segment(2)["base_offset"] is None
+
+
+def test_unused_segments_are_removed(writer):
+    _record(writer, 1, _screen())
+    path = os.path.join(segments.segments_path, writer.segment)
+    writer.close()
+    segments.delete_frames([1])
+    assert not os.path.exists(path)
+
+
+def test_concurrent_appends(writer):
+    screens = {monitor: _screen(seed=monitor) for monitor in (1, 2)}
+    frames = []
+    for monitor, pixels in screens.items():
+        for index in range(6):
+            changed = pixels.copy()
+            changed[16 * index:16 * index + 16, :64] = 0
+            frames.append((monitor, monitor * 100 + index, changed))
+    threads = [
+        threading.Thread(target=_record, args=(writer, timestamp, pixels, monitor))
+        for monitor, timestamp, pixels in frames
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for _, timestamp, pixels in frames:
+        assert np.array_equal(np.asarray(segments.load_frame(timestamp)), pixels)
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from openrelife import storage, thumbnails
+
+# 2024-03-05 06:07:08 UTC, in microseconds
+TIMESTAMP = 1709618828000000
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"webp")
+
+
+def test_shard_dir_is_utc_hour():
+    assert storage.shard_dir(TIMESTAMP) == os.path.join("2024", "03", "05", "06")
+
+
+def test_find_screenshot_in_either_layout(store):
+    assert storage.find_screenshot(TIMESTAMP) is None
+    legacy = os.path.join(storage.screenshots_path, f"{TIMESTAMP}.webp")
+    _touch(legacy)
+    assert storage.find_screenshot(TIMESTAMP) == legacy
+    _touch(storage.screenshot_path(TIMESTAMP))
+    assert storage.find_screenshot(TIMESTAMP) == storage.screenshot_path(TIMESTAMP)
+
+
+def test_migrate_to_sharded_layout(store):
+    later = TIMESTAMP + 3600 * 1000000
+    for timestamp in (TIMESTAMP, later):
+        _touch(os.path.join(storage.screenshots_path, f"{timestamp}.webp"))
+    _touch(os.path.join(storage.thumbnails_path, "small", f"{TIMESTAMP}.webp"))
+    _touch(os.path.join(storage.screenshots_path, "notes.txt"))
+
+    assert storage.migrate_to_sharded_layout() == 3
+    assert storage.find_screenshot(TIMESTAMP) == storage.screenshot_path(TIMESTAMP)
+    assert storage.find_screenshot(later) == storage.screenshot_path(later)
+    assert os.path.exists(
+        storage.sharded_path(os.path.join(storage.thumbnails_path, "small"), TIMESTAMP)
+    )
+    assert os.path.exists(os.path.join(storage.screenshots_path, "notes.txt"))
+    assert storage.migrate_to_sharded_layout() == 0
+
+
+@pytest.mark.parametrize("engine", ["files", "segments"])
+def test_storage_engines(store, monkeypatch, engine):
+    monkeypatch.setattr(storage.args, "storage_engine", engine)
+    pixels = np.full((48, 64, 3), 200, dtype=np.uint8)
+    pixels[10:20, 10:40] = 0
+    storage.save_screenshot(Image.fromarray(pixels), {"lossless": True}, TIMESTAMP, 1)
+
+    assert (storage.find_screenshot(TIMESTAMP) is not None) == (engine == "files")
+    assert np.array_equal(np.asarray(storage.open_screenshot(TIMESTAMP)), pixels)
+    data, etag = storage.read_screenshot(TIMESTAMP)
+    assert data[8:12] == b"WEBP" and etag
+
+    storage.delete_screenshots([TIMESTAMP])
+    assert storage.open_screenshot(TIMESTAMP) is None
+    with pytest.raises(FileNotFoundError):
+        storage.read_screenshot(TIMESTAMP)
+
+
+def test_packed_screenshots_have_renditions_on_demand(store, monkeypatch):
+    monkeypatch.setattr(storage.args, "storage_engine", "segments")
+    storage.save_screenshot(Image.new("RGB", (640, 320), (200, 200, 200)), {"quality": 80}, TIMESTAMP, 1)
+
+    data, etag = thumbnails.read_rendition(TIMESTAMP, "small")
+    assert data[8:12] == b"WEBP" and etag
+    assert not os.path.exists(thumbnails.rendition_path(TIMESTAMP, "small"))
+    with pytest.raises(FileNotFoundError):
+        thumbnails.read_rendition(TIMESTAMP + 1, "small")
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from openrelife import storage, thumbnails
+
+
+def _screenshot(width=2000, height=1000):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8))
+
+
+def test_save_renditions_writes_every_size(store):
+    thumbnails.save_renditions(_screenshot(), 42)
+    for size, max_side in thumbnails.RENDITION_SIZES.items():
+        with Image.open(thumbnails.rendition_path(42, size)) as image:
+            assert max(image.size) == max_side
+            assert image.size[0] == 2 * image.size[1]
+
+
+def test_small_images_are_not_upscaled(store):
+    thumbnails.save_renditions(_screenshot(100, 50), 1)
+    with Image.open(thumbnails.rendition_path(1, "medium")) as image:
+        assert image.size == (100, 50)
+
+
+def test_get_rendition_generates_missing_renditions(store):
+    path = storage.screenshot_path(7)
+    os.makedirs(os.path.dirname(path))
+    _screenshot().save(path, format="webp")
+    path = thumbnails.get_rendition(7, "small")
+    assert path == thumbnails.rendition_path(7, "small")
+    with Image.open(path) as image:
+        assert max(image.size) == thumbnails.RENDITION_SIZES["small"]
+    assert not os.path.exists(thumbnails.rendition_path(7, "medium"))
+    assert thumbnails.get_rendition(8, "small") is None
+
+
+def test_delete_renditions(store):
+    thumbnails.save_renditions(_screenshot(), 3)
+    thumbnails.delete_renditions(3)
+    thumbnails.delete_renditions(3)
+    for size in thumbnails.RENDITION_SIZES:
+        assert not os.path.exists(thumbnails.rendition_path(3, size))
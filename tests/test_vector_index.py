@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from openrelife import database, vector_index
+from openrelife.vector_index import EmbeddingMatrix, top_k_indices
+
+
+def _blob(values):
+    return np.asarray(values, dtype=np.float32).tobytes()
+
+
+def test_load_sorts_by_timestamp_and_normalizes():
+    matrix = EmbeddingMatrix()
+    matrix.load([(30, _blob([0, 2, 0])), (10, _blob([3, 0, 0])), (20, _blob([0, 0, 0]))])
+    timestamps, sims = matrix.similarities(np.array([1, 0, 0]))
+    assert timestamps.tolist() == [10, 20, 30]
+    assert sims.tolist() == pytest.approx([1.0, 0.0, 0.0])
+
+
+def test_load_skips_mismatched_dimensions():
+    matrix = EmbeddingMatrix()
+    matrix.load([(1, _blob([1, 0, 0])), (2, _blob([1, 0])), (3, b"")])
+    assert len(matrix) == 1
+
+
+def test_add_keeps_timestamp_order_and_replaces_duplicates():
+    matrix = EmbeddingMatrix()
+    matrix.add(20, np.array([1, 0, 0]))
+    matrix.add(10, np.array([0, 1, 0]))
+    matrix.add(30, np.array([0, 0, 1]))
+    matrix.add(10, np.array([1, 0, 0]))
+    timestamps, sims = matrix.similarities(np.array([1, 0, 0]))
+    assert timestamps.tolist() == [10, 20, 30]
+    assert sims.tolist() == pytest.approx([1.0, 1.0, 0.0])
+    assert not matrix.add(40, np.array([1, 0]))
+
+
+def test_add_grows_past_initial_capacity():
+    matrix = EmbeddingMatrix()
+    for ts in range(3000):
+        matrix.add(ts, np.array([1.0, float(ts)]))
+    assert len(matrix) == 3000
+    assert matrix.position(2999) == 2999
+
+
+def test_remove():
+    matrix = EmbeddingMatrix()
+    for ts in (1, 2, 3, 4):
+        matrix.add(ts, np.array([ts, 1.0]))
+    assert matrix.remove([2, 4, 99]) == 2
+    timestamps, _ = matrix.similarities(np.array([1.0, 0.0]))
+    assert timestamps.tolist() == [1, 3]
+    assert matrix.position(2) is None
+
+
+def test_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    matrix = EmbeddingMatrix()
+    vectors = rng.normal(size=(500, 8)).astype(np.float32)
+    matrix.load((ts, vec.tobytes()) for ts, vec in enumerate(vectors))
+    query = rng.normal(size=8)
+    timestamps, sims = matrix.top_k(query, 10)
+    expected = [
+        np.dot(v, query) / (np.linalg.norm(v) * np.linalg.norm(query)) for v in vectors
+    ]
+    assert timestamps.tolist() == list(np.argsort(expected)[::-1][:10])
+    assert sims[0] == pytest.approx(max(expected), abs=1e-5)
+
+
+def test_top_k_indices_edge_cases():
+    scores = np.array([0.1, 0.9, 0.5])
+    assert top_k_indices(scores, 0).tolist() == []
+    assert top_k_indices(scores, 10).tolist() == [1, 2, 0]
+    assert top_k_indices(np.array([]), 3).tolist() == []
+
+
+@pytest.mark.parametrize("fmt", ["float16", "int8", "binary"])
+def test_compact_formats(fmt):
+    from openrelife.embedding_format import encode_blob
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 64)).astype(np.float32)
+    matrix = EmbeddingMatrix(fmt=fmt)
+    # Blobs of any storage format can be loaded
+    matrix.load((ts, encode_blob(vec, "int8" if ts % 2 else "float32")) for ts, vec in enumerate(vectors))
+    matrix.add(1000, vectors[0])
+    matrix.add(-1, vectors[1])
+    assert matrix.remove([5, 6]) == 2
+    assert len(matrix) == 300
+    assert matrix.nbytes < 300 * 64 * 4
+    assert matrix.exact == (fmt != "binary")
+    timestamps, sims = matrix.similarities(vectors[0])
+    assert timestamps[0] == -1 and timestamps[-1] == 1000
+    assert sims[-1] == pytest.approx(1.0, abs=1e-2)
+    expected = vectors[10] @ vectors[0] / (np.linalg.norm(vectors[10]) * np.linalg.norm(vectors[0]))
+    found, some = matrix.similarities_for(vectors[0], np.array([10, 5]))
+    assert found.tolist() == [10]
+    assert some[0] == pytest.approx(expected, abs=0.05 if fmt != "binary" else 0.4)
+    found, decoded = matrix.vectors_for(np.array([10]))
+    assert decoded.shape == (1, 64)
+
+
+def test_changes_during_load_are_replayed(monkeypatch):
+    monkeypatch.setattr(vector_index, "_matrix_cache", None)
+
+    def iter_embeddings():
+        yield 1, np.ones(4, dtype=np.float32).tobytes()
+        # Recorded and deleted while the matrix loads
+        vector_index.on_entry_inserted(3, np.ones(4))
+        vector_index.on_entries_deleted([1])
+        yield 2, np.ones(4, dtype=np.float32).tobytes()
+
+    monkeypatch.setattr(database, "iter_embeddings", iter_embeddings)
+    matrix = vector_index.get_embedding_matrix()
+    assert list(matrix.timestamps()) == [2, 3]
+    vector_index.on_entry_inserted(4, np.ones(4))
+    assert list(matrix.timestamps()) == [2, 3, 4]